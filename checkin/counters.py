@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .models import Session
+
+LIVE_KEY = "attendance:live:{}"
+PENDING_KEY = "attendance:pending:{}"
+FLUSH_KEY = "attendance:flushed:{}"
+
+FLUSH_INTERVAL = getattr(settings, "ATTENDANCE_FLUSH_INTERVAL", 30)
+LIVE_TIMEOUT = getattr(settings, "ATTENDANCE_LIVE_TIMEOUT", 300)
+
+
+def _incr(key, delta):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def record_attendance(session_id, delta):
+    """
+    Adds newly marked attendees to a session's live headcount and to the delta
+    waiting to be flushed to Session.attendance_count.
+
+    Both counters live in the cache so that scanners posting at once only do
+    increments, atomic on every CACHE_BACKEND profile; the counts are shared
+    between workers as long as the configured cache backend is. The first call
+    after each FLUSH_INTERVAL also flushes the session's pending delta to the
+    database.
+    """
+    if delta <= 0:
+        return live_headcount(session_id)
+    _incr(PENDING_KEY.format(session_id), delta)
+    if cache.add(FLUSH_KEY.format(session_id), 1, timeout=FLUSH_INTERVAL):
+        flush_session_counter(session_id)
+    live_key = LIVE_KEY.format(session_id)
+    if cache.get(live_key) is None:
+        return live_headcount(session_id)
+    return _incr(live_key, delta)
+
+
+def live_headcount(session_id):
+    """
+    Returns the live headcount for a session, seeding the cached figure from the
+    last flushed count plus any unflushed delta when it is missing. The figure
+    expires LIVE_TIMEOUT seconds after it was seeded, so an increment lost to an
+    eviction is only off until then, or until the next reconcile for the flushed count.
+    """
+    live_key = LIVE_KEY.format(session_id)
+    count = cache.get(live_key)
+    if count is not None:
+        return count
+    flushed = (
+        Session.objects.filter(pk=session_id)
+        .values_list("attendance_count", flat=True)
+        .first()
+    )
+    if flushed is None:
+        return None
+    count = flushed + (cache.get(PENDING_KEY.format(session_id)) or 0)
+    cache.add(live_key, count, timeout=LIVE_TIMEOUT)
+    return cache.get(live_key, count)
+
+
+def flush_session_counter(session_id):
+    """
+    Writes a session's unflushed attendance delta to Session.attendance_count.
+
+    The delta is claimed with an atomic decrement before it is written, so two
+    flushes running at once cannot write the same delta twice, and increments
+    that land during the flush are kept for the next one. A flush that claims
+    more than was left, because another flush got there first, gives the excess
+    back and writes only what it claimed.
+
+    Returns:
+        int: The delta written.
+    """
+    pending_key = PENDING_KEY.format(session_id)
+    delta = cache.get(pending_key) or 0
+    if delta <= 0:
+        return 0
+    try:
+        remaining = cache.decr(pending_key, delta)
+    except ValueError:
+        # The key was evicted since get(); there is nothing left to claim.
+        return 0
+    if remaining < 0:
+        cache.incr(pending_key, -remaining)
+        delta += remaining
+    if delta <= 0:
+        return 0
+    try:
+        Session.objects.filter(pk=session_id).update(
+            attendance_count=F("attendance_count") + delta
+        )
+    except Exception:
+        _incr(pending_key, delta)
+        raise
+    return delta
+
+
+def flush_attendance_counters():
+    """
+    Flushes the pending attendance delta of every session. Scheduled every minute
+    in CRONJOBS, so the deltas of sessions no one is marking any more are written too.
+
+    Returns:
+        int: The number of sessions updated.
+    """
+    return sum(
+        1
+        for session_id in Session.objects.values_list("pk", flat=True)
+        if flush_session_counter(session_id)
+    )
+
+
+def reconcile_attendance_counters():
+    """
+    Recounts attendance rows for every session and resets the counters to match.
+
+    Bulk marking can overcount when two scanners submit the same attendee at the
+    same moment, and a delta is lost when the cache evicts its key; this is the
+    slow, exact correction for both, scheduled every 15 minutes in CRONJOBS, not a
+    per-request path.
+    """
+    counts = Session.objects.annotate(total=Count("attendances")).values_list("pk", "total")
+    for session_id, total in counts:
+        Session.objects.filter(pk=session_id).update(attendance_count=total)
+        cache.set(PENDING_KEY.format(session_id), 0, timeout=None)
+        cache.set(LIVE_KEY.format(session_id), total, timeout=LIVE_TIMEOUT)
+    return len(counts)
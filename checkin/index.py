@@ -0,0 +1,152 @@
+import logging
+import threading
+from collections import namedtuple
+
+from django.db import DatabaseError
+
+from registration.models import Attendee
+
+logger = logging.getLogger(__name__)
+
+IndexEntry = namedtuple(
+    "IndexEntry",
+    ["attendee_id", "dawrah_id", "first_name", "last_name", "level", "hall", "paid"],
+)
+
+INDEX_FIELDS = (
+    "id",
+    "dawrah_id",
+    "first_name",
+    "last_name",
+    "level",
+    "hall_off_residence",
+    "paid",
+)
+
+
+def normalize_dawrah_id(dawrah_id):
+    return dawrah_id.strip().upper()
+
+
+class AttendeeIndex:
+    """
+    In-process dawrah_id -> attendee lookup table used by the check-in desks.
+
+    The index is warmed by the first lookup in each worker and kept current by the
+    Attendee signals in checkin.signals. Lookups that miss fall through to a single
+    query on the unique dawrah_id index, so attendees who paid after another worker
+    was warmed are still found.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._warm_lock = threading.Lock()
+        self.warmed = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def warm(self):
+        rows = Attendee.objects.filter(dawrah_id__isnull=False).values_list(*INDEX_FIELDS)
+        entries = {normalize_dawrah_id(row[1]): IndexEntry(*row) for row in rows}
+        with self._lock:
+            self._entries = entries
+            self.warmed = True
+        return len(entries)
+
+    def ensure_warm(self):
+        """
+        Warms the index unless it is already. A missing or unmigrated database only
+        leaves it cold; lookups then fill it on demand and the next one tries again.
+        """
+        if self.warmed:
+            return
+        with self._warm_lock:
+            if self.warmed:
+                return
+            try:
+                count = self.warm()
+            except DatabaseError as e:
+                logger.warning("Attendee index not warmed: %s", e)
+                return
+        logger.info("Attendee index warmed with %s entries", count)
+
+    def get(self, dawrah_id):
+        self.ensure_warm()
+        key = normalize_dawrah_id(dawrah_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        # Dawrah IDs are stored upper case, so the exact match can use the unique index.
+        row = (
+            Attendee.objects.filter(dawrah_id=key)
+            .values_list(*INDEX_FIELDS)
+            .first()
+        )
+        if row is None:
+            return None
+        entry = IndexEntry(*row)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def get_many(self, dawrah_ids):
+        """
+        Resolves several Dawrah IDs at once, with one query for any the index misses.
+
+        Returns:
+            dict: Normalized Dawrah ID -> IndexEntry for every ID that exists.
+        """
+        self.ensure_warm()
+        found = {}
+        missing = set()
+        for dawrah_id in dawrah_ids:
+            key = normalize_dawrah_id(dawrah_id)
+            entry = self._entries.get(key)
+            if entry is None:
+                missing.add(key)
+            else:
+                found[key] = entry
+        if missing:
+            rows = list(
+                Attendee.objects.filter(dawrah_id__in=missing).values_list(*INDEX_FIELDS)
+            )
+            with self._lock:
+                for row in rows:
+                    entry = IndexEntry(*row)
+                    key = normalize_dawrah_id(entry.dawrah_id)
+                    self._entries[key] = entry
+                    found[key] = entry
+        return found
+
+    def update(self, attendee):
+        if not attendee.dawrah_id:
+            return
+        entry = IndexEntry(
+            attendee.id,
+            attendee.dawrah_id,
+            attendee.first_name,
+            attendee.last_name,
+            attendee.level,
+            attendee.hall_off_residence,
+            attendee.paid,
+        )
+        with self._lock:
+            self._entries[normalize_dawrah_id(attendee.dawrah_id)] = entry
+
+    def discard(self, dawrah_id):
+        if not dawrah_id:
+            return
+        with self._lock:
+            self._entries.pop(normalize_dawrah_id(dawrah_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self.warmed = False
+
+
+attendee_index = AttendeeIndex()
+
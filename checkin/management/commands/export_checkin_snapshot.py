@@ -0,0 +1,33 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from checkin.snapshot import build_snapshot, snapshot_filename
+from core.db_router import use_replica
+
+
+class Command(BaseCommand):
+    help = "Export a standalone SQLite snapshot of paid attendees for offline check-in desks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-o",
+            "--output",
+            help="Path of the snapshot file. Defaults to a timestamped file in the current directory.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"] or snapshot_filename()
+
+        start = time.perf_counter()
+        with use_replica():
+            count = build_snapshot(path)
+        elapsed = time.perf_counter() - start
+
+        size_kb = os.path.getsize(path) / 1024
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Exported {count} attendees to {path} ({size_kb:.0f} KB) in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from checkin.counters import flush_attendance_counters, reconcile_attendance_counters
+
+
+class Command(BaseCommand):
+    help = "Flush the cached per-session attendance counters to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Recount attendance rows and reset the counters instead of flushing deltas.",
+        )
+
+    def handle(self, *args, **options):
+        if options["reconcile"]:
+            count = reconcile_attendance_counters()
+            self.stdout.write(self.style.SUCCESS(f"{count} sessions reconciled!"))
+        else:
+            count = flush_attendance_counters()
+            self.stdout.write(self.style.SUCCESS(f"{count} sessions flushed!"))
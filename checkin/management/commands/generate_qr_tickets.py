@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from checkin.tickets import CONTENT_TYPES, pregenerate_tickets
+from core.cache import is_shared_cache
+from registration.models import Attendee
+
+
+class Command(BaseCommand):
+    help = "Pre-generate QR tickets for all paid attendees into the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            dest="image_format",
+            choices=sorted(CONTENT_TYPES),
+            default="png",
+            help="Ticket image format.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes. Defaults to the number of CPUs.",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render tickets that are already cached.",
+        )
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            raise CommandError(
+                "The cache is private to this process, so the tickets would be gone when "
+                "the command exits. Set CACHE_BACKEND to a shared backend (file or redis)."
+            )
+        dawrah_ids = Attendee.objects.filter(
+            paid=True, dawrah_id__isnull=False
+        ).values_list("dawrah_id", flat=True)
+
+        start = time.perf_counter()
+        count = pregenerate_tickets(
+            dawrah_ids,
+            image_format=options["image_format"],
+            workers=options["workers"],
+            force=options["force"],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(f"{count} tickets generated in {elapsed:.2f}s!")
+        )
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ("registration", "0003_attendee_hall_off_residence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CheckIn",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("dawrah_id", models.CharField(max_length=100)),
+                ("session", models.CharField(default="collection", max_length=100)),
+                ("desk", models.CharField(blank=True, max_length=50)),
+                (
+                    "checked_in_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "attendee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="checkins",
+                        to="registration.attendee",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-checked_in_at"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="checkin",
+            constraint=models.UniqueConstraint(
+                fields=("dawrah_id", "session"), name="unique_checkin_per_session"
+            ),
+        ),
+    ]
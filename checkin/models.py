@@ -0,0 +1,76 @@
+from django.db import models
+from django.utils import timezone
+
+from registration.models import Attendee
+
+
+class CheckIn(models.Model):
+    """
+    A single collection scan at a check-in desk, e.g. booklet and meal-ticket collection.
+
+    The dawrah_id is stored alongside the attendee so that the (dawrah_id, session)
+    pair can be enforced as unique by the database, which is what rejects duplicate scans.
+    """
+
+    DEFAULT_SESSION = "collection"
+
+    attendee = models.ForeignKey(
+        Attendee, on_delete=models.CASCADE, related_name="checkins"
+    )
+    dawrah_id = models.CharField(max_length=100)
+    session = models.CharField(max_length=100, default=DEFAULT_SESSION)
+    desk = models.CharField(max_length=50, blank=True)
+    checked_in_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.dawrah_id} - {self.session}"
+
+    class Meta:
+        ordering = ["-checked_in_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dawrah_id", "session"], name="unique_checkin_per_session"
+            ),
+        ]
+
+
+class Session(models.Model):
+    """
+    A lecture session on the Dawrah timetable.
+
+    attendance_count is the flushed headcount. The live figure is kept in the cache
+    by checkin.counters and written back here periodically, so it can lag by up to
+    one flush interval.
+    """
+
+    title = models.CharField(max_length=255)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(null=True, blank=True)
+    attendance_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        ordering = ["starts_at"]
+
+
+class Attendance(models.Model):
+    session = models.ForeignKey(
+        Session, on_delete=models.CASCADE, related_name="attendances"
+    )
+    attendee = models.ForeignKey(
+        Attendee, on_delete=models.CASCADE, related_name="attendances"
+    )
+    dawrah_id = models.CharField(max_length=100)
+    marked_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.dawrah_id} - {self.session}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session", "attendee"], name="unique_attendance_per_session"
+            ),
+        ]
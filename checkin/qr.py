@@ -0,0 +1,415 @@
+"""
+A small pure-Python QR code encoder for Dawrah tickets.
+
+Only byte mode and versions 1-10 are supported, which covers Dawrah IDs and short
+URLs at every error correction level. This module deliberately has no Django
+imports so that it can be used from worker processes without setting Django up.
+"""
+
+import struct
+import zlib
+
+# Format bits and block structure per error correction level.
+ECC_FORMAT_BITS = {"L": 1, "M": 0, "Q": 3, "H": 2}
+
+# (ec codewords per block, [(number of blocks, data codewords per block), ...])
+ECC_BLOCKS = {
+    1: {"L": (7, [(1, 19)]), "M": (10, [(1, 16)]), "Q": (13, [(1, 13)]), "H": (17, [(1, 9)])},
+    2: {"L": (10, [(1, 34)]), "M": (16, [(1, 28)]), "Q": (22, [(1, 22)]), "H": (28, [(1, 16)])},
+    3: {"L": (15, [(1, 55)]), "M": (26, [(1, 44)]), "Q": (18, [(2, 17)]), "H": (22, [(2, 13)])},
+    4: {"L": (20, [(1, 80)]), "M": (18, [(2, 32)]), "Q": (26, [(2, 24)]), "H": (16, [(4, 9)])},
+    5: {
+        "L": (26, [(1, 108)]),
+        "M": (24, [(2, 43)]),
+        "Q": (18, [(2, 15), (2, 16)]),
+        "H": (22, [(2, 11), (2, 12)]),
+    },
+    6: {"L": (18, [(2, 68)]), "M": (16, [(4, 27)]), "Q": (24, [(4, 19)]), "H": (28, [(4, 15)])},
+    7: {
+        "L": (20, [(2, 78)]),
+        "M": (18, [(4, 31)]),
+        "Q": (18, [(2, 14), (4, 15)]),
+        "H": (26, [(4, 13), (1, 14)]),
+    },
+    8: {
+        "L": (24, [(2, 97)]),
+        "M": (22, [(2, 38), (2, 39)]),
+        "Q": (22, [(4, 18), (2, 19)]),
+        "H": (26, [(4, 14), (2, 15)]),
+    },
+    9: {
+        "L": (30, [(2, 116)]),
+        "M": (22, [(3, 36), (2, 37)]),
+        "Q": (20, [(4, 16), (4, 17)]),
+        "H": (24, [(4, 12), (4, 13)]),
+    },
+    10: {
+        "L": (18, [(2, 68), (2, 69)]),
+        "M": (26, [(4, 43), (1, 44)]),
+        "Q": (24, [(6, 19), (2, 20)]),
+        "H": (28, [(6, 15), (2, 16)]),
+    },
+}
+
+MAX_VERSION = max(ECC_BLOCKS)
+QUIET_ZONE = 4
+
+# GF(256) arithmetic with the QR reducing polynomial x^8 + x^4 + x^3 + x^2 + 1.
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _i in range(255):
+    _EXP[_i] = _value
+    _LOG[_value] = _i
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+
+def _gf_mul(x, y):
+    if x == 0 or y == 0:
+        return 0
+    return _EXP[_LOG[x] + _LOG[y]]
+
+
+def _rs_generator(degree):
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = _gf_mul(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = _gf_mul(root, 0x02)
+    return result
+
+
+def _rs_remainder(data, generator):
+    result = [0] * len(generator)
+    for byte in data:
+        factor = byte ^ result.pop(0)
+        result.append(0)
+        for i, coefficient in enumerate(generator):
+            result[i] ^= _gf_mul(coefficient, factor)
+    return result
+
+
+def _data_capacity(version, ecc):
+    _, groups = ECC_BLOCKS[version][ecc]
+    return sum(count * length for count, length in groups)
+
+
+def _alignment_positions(version):
+    if version == 1:
+        return []
+    size = version * 4 + 17
+    count = version // 7 + 2
+    step = (version * 8 + count * 3 + 5) // (count * 4 - 4) * 2
+    return [6] + sorted(size - 7 - i * step for i in range(count - 1))
+
+
+def _encode_codewords(data, version, ecc):
+    count_bits = 8 if version < 10 else 16
+    capacity = _data_capacity(version, ecc) * 8
+
+    bits = []
+
+    def append(value, length):
+        bits.extend((value >> i) & 1 for i in range(length - 1, -1, -1))
+
+    append(0b0100, 4)
+    append(len(data), count_bits)
+    for byte in data:
+        append(byte, 8)
+    append(0, min(4, capacity - len(bits)))
+    append(0, -len(bits) % 8)
+    pad = 0xEC
+    while len(bits) < capacity:
+        append(pad, 8)
+        pad ^= 0xEC ^ 0x11
+
+    codewords = [
+        int("".join(map(str, bits[i : i + 8])), 2) for i in range(0, len(bits), 8)
+    ]
+
+    ecc_length, groups = ECC_BLOCKS[version][ecc]
+    generator = _rs_generator(ecc_length)
+    data_blocks = []
+    ecc_blocks = []
+    offset = 0
+    for count, length in groups:
+        for _ in range(count):
+            block = codewords[offset : offset + length]
+            offset += length
+            data_blocks.append(block)
+            ecc_blocks.append(_rs_remainder(block, generator))
+
+    result = []
+    for i in range(max(len(block) for block in data_blocks)):
+        result.extend(block[i] for block in data_blocks if i < len(block))
+    for i in range(ecc_length):
+        result.extend(block[i] for block in ecc_blocks)
+    return result
+
+
+class QRCode:
+    """
+    The module matrix of an encoded QR code.
+
+    Attributes:
+        version (int): The QR version, 1 to 10.
+        size (int): The number of modules per side, without the quiet zone.
+        modules (list[list[bool]]): Rows of modules, True for dark.
+    """
+
+    def __init__(self, data, ecc="M"):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if ecc not in ECC_FORMAT_BITS:
+            raise ValueError(f"Unknown error correction level: {ecc}")
+
+        for version in range(1, MAX_VERSION + 1):
+            count_bits = 8 if version < 10 else 16
+            if 4 + count_bits + len(data) * 8 <= _data_capacity(version, ecc) * 8:
+                break
+        else:
+            raise ValueError("Data too long for a version 10 QR code.")
+
+        self.version = version
+        self.ecc = ecc
+        self.size = version * 4 + 17
+        self.modules = [[False] * self.size for _ in range(self.size)]
+        self._function = [[False] * self.size for _ in range(self.size)]
+
+        self._draw_function_patterns()
+        self._draw_codewords(_encode_codewords(data, version, ecc))
+
+        best_mask, best_penalty = 0, None
+        for mask in range(8):
+            self._apply_mask(mask)
+            self._draw_format_bits(mask)
+            penalty = self._penalty()
+            if best_penalty is None or penalty < best_penalty:
+                best_mask, best_penalty = mask, penalty
+            self._apply_mask(mask)  # Masks are their own inverse.
+        self.mask = best_mask
+        self._apply_mask(best_mask)
+        self._draw_format_bits(best_mask)
+        del self._function
+
+    def _set_function(self, x, y, dark):
+        self.modules[y][x] = dark
+        self._function[y][x] = True
+
+    def _draw_function_patterns(self):
+        size = self.size
+        for i in range(size):
+            self._set_function(6, i, i % 2 == 0)
+            self._set_function(i, 6, i % 2 == 0)
+
+        for x, y in ((3, 3), (size - 4, 3), (3, size - 4)):
+            for dy in range(-4, 5):
+                for dx in range(-4, 5):
+                    xx, yy = x + dx, y + dy
+                    if 0 <= xx < size and 0 <= yy < size:
+                        self._set_function(xx, yy, max(abs(dx), abs(dy)) not in (2, 4))
+
+        positions = _alignment_positions(self.version)
+        last = len(positions) - 1
+        for i, x in enumerate(positions):
+            for j, y in enumerate(positions):
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dy in range(-2, 3):
+                    for dx in range(-2, 3):
+                        self._set_function(x + dx, y + dy, max(abs(dx), abs(dy)) != 1)
+
+        self._draw_format_bits(0)
+        self._draw_version()
+
+    def _draw_format_bits(self, mask):
+        size = self.size
+        data = ECC_FORMAT_BITS[self.ecc] << 3 | mask
+        remainder = data
+        for _ in range(10):
+            remainder = (remainder << 1) ^ ((remainder >> 9) * 0x537)
+        bits = (data << 10 | remainder) ^ 0x5412
+
+        def bit(i):
+            return (bits >> i) & 1 == 1
+
+        for i in range(6):
+            self._set_function(8, i, bit(i))
+        self._set_function(8, 7, bit(6))
+        self._set_function(8, 8, bit(7))
+        self._set_function(7, 8, bit(8))
+        for i in range(9, 15):
+            self._set_function(14 - i, 8, bit(i))
+
+        for i in range(8):
+            self._set_function(size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self._set_function(8, size - 15 + i, bit(i))
+        self._set_function(8, size - 8, True)
+
+    def _draw_version(self):
+        if self.version < 7:
+            return
+        remainder = self.version
+        for _ in range(12):
+            remainder = (remainder << 1) ^ ((remainder >> 11) * 0x1F25)
+        bits = self.version << 12 | remainder
+        for i in range(18):
+            dark = (bits >> i) & 1 == 1
+            a = self.size - 11 + i % 3
+            b = i // 3
+            self._set_function(a, b, dark)
+            self._set_function(b, a, dark)
+
+    def _draw_codewords(self, codewords):
+        size = self.size
+        total_bits = len(codewords) * 8
+        i = 0
+        right = size - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            upward = (right + 1) & 2 == 0
+            for vert in range(size):
+                y = size - 1 - vert if upward else vert
+                for x in (right, right - 1):
+                    if not self._function[y][x] and i < total_bits:
+                        self.modules[y][x] = (codewords[i >> 3] >> (7 - (i & 7))) & 1 == 1
+                        i += 1
+            right -= 2
+
+    def _apply_mask(self, mask):
+        conditions = (
+            lambda x, y: (x + y) % 2 == 0,
+            lambda x, y: y % 2 == 0,
+            lambda x, y: x % 3 == 0,
+            lambda x, y: (x + y) % 3 == 0,
+            lambda x, y: (x // 3 + y // 2) % 2 == 0,
+            lambda x, y: x * y % 2 + x * y % 3 == 0,
+            lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+            lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+        )
+        condition = conditions[mask]
+        for y in range(self.size):
+            row = self.modules[y]
+            function = self._function[y]
+            for x in range(self.size):
+                if not function[x] and condition(x, y):
+                    row[x] = not row[x]
+
+    def _penalty(self):
+        size = self.size
+        modules = self.modules
+        columns = [[modules[y][x] for y in range(size)] for x in range(size)]
+        finder_like = (
+            (True, False, True, True, True, False, True, False, False, False, False),
+            (False, False, False, False, True, False, True, True, True, False, True),
+        )
+        penalty = 0
+
+        for line in modules + columns:
+            run_color, run_length = None, 0
+            for dark in line:
+                if dark == run_color:
+                    run_length += 1
+                else:
+                    if run_length >= 5:
+                        penalty += run_length - 2
+                    run_color, run_length = dark, 1
+            if run_length >= 5:
+                penalty += run_length - 2
+            for i in range(size - 10):
+                if tuple(line[i : i + 11]) in finder_like:
+                    penalty += 40
+
+        for y in range(size - 1):
+            for x in range(size - 1):
+                color = modules[y][x]
+                if (
+                    color == modules[y][x + 1]
+                    and color == modules[y + 1][x]
+                    and color == modules[y + 1][x + 1]
+                ):
+                    penalty += 3
+
+        dark = sum(sum(row) for row in modules)
+        total = size * size
+        k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+        penalty += k * 10
+        return penalty
+
+    def to_svg(self, scale=8):
+        """
+        Renders the code as an SVG document with a quiet zone.
+        """
+        width = (self.size + QUIET_ZONE * 2) * scale
+        path = []
+        for y, row in enumerate(self.modules):
+            for x, dark in enumerate(row):
+                if dark:
+                    path.append(f"M{x + QUIET_ZONE},{y + QUIET_ZONE}h1v1h-1z")
+        view = self.size + QUIET_ZONE * 2
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{width}" '
+            f'viewBox="0 0 {view} {view}" shape-rendering="crispEdges">'
+            f'<rect width="100%" height="100%" fill="#fff"/>'
+            f'<path d="{"".join(path)}" fill="#000"/></svg>'
+        )
+
+    def to_png(self, scale=8):
+        """
+        Renders the code as a 1-bit greyscale PNG with a quiet zone.
+        """
+        side = self.size + QUIET_ZONE * 2
+        width = side * scale
+        light_row = b"\x00" + b"\xff" * ((width + 7) // 8)
+
+        raw = []
+        for _ in range(QUIET_ZONE * scale):
+            raw.append(light_row)
+        for row in self.modules:
+            bits = [1] * (QUIET_ZONE * scale)
+            for dark in row:
+                bits.extend([0 if dark else 1] * scale)
+            bits.extend([1] * (QUIET_ZONE * scale + (-width % 8)))
+            line = bytes(
+                int("".join(map(str, bits[i : i + 8])), 2) for i in range(0, len(bits), 8)
+            )
+            raw.extend([b"\x00" + line] * scale)
+        for _ in range(QUIET_ZONE * scale):
+            raw.append(light_row)
+
+        def chunk(kind, body):
+            return (
+                struct.pack(">I", len(body))
+                + kind
+                + body
+                + struct.pack(">I", zlib.crc32(kind + body) & 0xFFFFFFFF)
+            )
+
+        return b"".join(
+            [
+                b"\x89PNG\r\n\x1a\n",
+                chunk(b"IHDR", struct.pack(">IIBBBBB", width, width, 1, 0, 0, 0, 0)),
+                chunk(b"IDAT", zlib.compress(b"".join(raw), 9)),
+                chunk(b"IEND", b""),
+            ]
+        )
+
+
+def render_ticket(data, image_format="png", ecc="M", scale=8):
+    """
+    Encodes data as a QR code and renders it as PNG bytes or SVG text.
+    """
+    code = QRCode(data, ecc=ecc)
+    if image_format == "svg":
+        return code.to_svg(scale=scale).encode("utf-8")
+    return code.to_png(scale=scale)
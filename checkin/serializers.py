@@ -0,0 +1,55 @@
+from rest_framework import serializers
+
+from .models import CheckIn, Session
+
+
+class CheckInScanSerializer(serializers.Serializer):
+    """
+    Serializer for a check-in desk scan.
+    """
+
+    dawrah_id = serializers.CharField(
+        max_length=100,
+        error_messages={
+            "required": "Please provide the Dawrah ID",
+            "blank": "Please provide the Dawrah ID",
+        },
+    )
+    session = serializers.CharField(max_length=100, default=CheckIn.DEFAULT_SESSION)
+    desk = serializers.CharField(max_length=50, required=False, allow_blank=True, default="")
+
+
+class CheckInRecordSerializer(serializers.Serializer):
+    """
+    Serializer for a check-in collected by a desk while offline.
+    """
+
+    dawrah_id = serializers.CharField(max_length=100)
+    session = serializers.CharField(max_length=100, default=CheckIn.DEFAULT_SESSION)
+    desk = serializers.CharField(max_length=50, required=False, allow_blank=True, default="")
+    checked_in_at = serializers.DateTimeField()
+
+
+class CheckInUploadSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of offline check-ins uploaded by a desk.
+    """
+
+    checkins = CheckInRecordSerializer(many=True, allow_empty=False)
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Session
+        fields = ("id", "title", "starts_at", "ends_at", "attendance_count")
+        read_only_fields = ("attendance_count",)
+
+
+class MarkAttendanceSerializer(serializers.Serializer):
+    """
+    Serializer for a batch of Dawrah IDs scanned into a lecture session.
+    """
+
+    dawrah_ids = serializers.ListField(
+        child=serializers.CharField(max_length=100), allow_empty=False, max_length=1000
+    )
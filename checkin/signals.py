@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from registration.models import Attendee
+
+from .index import attendee_index
+
+
+@receiver(post_save, sender=Attendee)
+def update_attendee_index(sender, instance, **kwargs):
+    attendee_index.update(instance)
+
+
+@receiver(post_delete, sender=Attendee)
+def discard_attendee_index(sender, instance, **kwargs):
+    attendee_index.discard(instance.dawrah_id)
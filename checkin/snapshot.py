@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import tempfile
+
+from django.utils import timezone
+
+from registration.models import Attendee
+
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_SCHEMA = """
+CREATE TABLE attendees (
+    dawrah_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    level TEXT NOT NULL,
+    hall TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE checkins (
+    dawrah_id TEXT NOT NULL,
+    session TEXT NOT NULL,
+    desk TEXT NOT NULL DEFAULT '',
+    checked_in_at TEXT NOT NULL,
+    PRIMARY KEY (dawrah_id, session)
+) WITHOUT ROWID;
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def snapshot_rows():
+    rows = (
+        Attendee.objects.filter(paid=True, dawrah_id__isnull=False)
+        .order_by("dawrah_id")
+        .values_list("dawrah_id", "first_name", "last_name", "level", "hall_off_residence")
+        .iterator(chunk_size=2000)
+    )
+    for dawrah_id, first_name, last_name, level, hall in rows:
+        yield dawrah_id, f"{first_name} {last_name}", level, hall
+
+
+def build_snapshot(path):
+    """
+    Writes a standalone SQLite snapshot of paid attendees to the given path for offline check-in desks.
+
+    The file holds an `attendees` table keyed by dawrah_id, an empty `checkins` table the
+    desks fill while offline (later sent back through the check-in upload endpoint) and a
+    `meta` table. The database is built in a temporary file with journaling disabled and
+    moved into place once complete, so a half-written snapshot is never left at `path`.
+
+    Returns:
+        int: The number of attendees written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".sqlite3", dir=directory)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(SNAPSHOT_SCHEMA)
+            with conn:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO attendees VALUES (?, ?, ?, ?)", snapshot_rows()
+                )
+                count = cursor.rowcount
+                conn.executemany(
+                    "INSERT INTO meta VALUES (?, ?)",
+                    [
+                        ("version", str(SNAPSHOT_VERSION)),
+                        ("generated_at", timezone.now().isoformat()),
+                        ("attendees", str(count)),
+                    ],
+                )
+            # Packs the pages left half-full by the bulk insert.
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
+
+
+def snapshot_bytes():
+    """
+    Builds a snapshot in a scratch directory and returns its contents.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "snapshot.sqlite3")
+        build_snapshot(path)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def snapshot_filename():
+    return f"dawrah-checkin-{timezone.now():%Y%m%d-%H%M}.sqlite3"
@@ -0,0 +1,359 @@
+import hashlib
+import struct
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APITestCase
+
+from organizers.models import User
+from registration.models import Attendee
+from registration.utils import EmailThread, send_confirmation_email
+
+from . import counters
+from .counters import (
+    LIVE_KEY,
+    LIVE_TIMEOUT,
+    PENDING_KEY,
+    flush_session_counter,
+    live_headcount,
+    record_attendance,
+)
+from .index import attendee_index
+from .models import CheckIn, Session
+from .qr import QRCode, _data_capacity, render_ticket
+from .tickets import ticket_token, ticket_url
+from .utils import ingest_checkins
+
+
+def make_attendee(i=0, paid=True):
+    return Attendee.objects.create(
+        first_name="Aisha",
+        last_name="Bello",
+        email=f"aisha{i}@example.com",
+        phone="08012345678",
+        department="Law",
+        level_of_study=100,
+        hall_off_residence="Mellanby",
+        level="beginner",
+        paid=paid,
+        dawrah_id=f"SDW-{i:04d}" if paid else None,
+    )
+
+
+class CheckInTestCase(APITestCase):
+    """
+    Authenticates as an organizer and starts every test with a cold attendee index,
+    since the index outlives the test transactions.
+    """
+
+    def setUp(self):
+        attendee_index.clear()
+        self.addCleanup(attendee_index.clear)
+        self.admin = User.objects.create_superuser(
+            "admin@example.com", "password", first_name="Admin", last_name="User"
+        )
+        self.client.force_authenticate(self.admin)
+
+
+class AttendeeIndexTests(CheckInTestCase):
+    def test_first_lookup_warms_the_index(self):
+        make_attendee(1)
+        make_attendee(2)
+        attendee_index.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(attendee_index.get("SDW-0001").first_name, "Aisha")
+        self.assertEqual(len(attendee_index), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(attendee_index.get(" sdw-0002 ").dawrah_id, "SDW-0002")
+
+    def test_miss_falls_through_to_one_query(self):
+        attendee_index.warm()
+        # Saved while the signals are not looking, e.g. by another worker.
+        Attendee.objects.bulk_create([Attendee(
+            first_name="Umar",
+            last_name="Sani",
+            email="umar@example.com",
+            phone="08012345678",
+            department="Law",
+            level_of_study=200,
+            hall_off_residence="Tedder",
+            level="beginner",
+            paid=True,
+            dawrah_id="SDW-0004",
+        )])
+        with self.assertNumQueries(1):
+            self.assertEqual(attendee_index.get("sdw-0004").first_name, "Umar")
+        with self.assertNumQueries(0):
+            attendee_index.get("SDW-0004")
+        with self.assertNumQueries(1):
+            self.assertIsNone(attendee_index.get("SDW-9999"))
+
+    def test_signals_keep_the_index_current(self):
+        attendee = make_attendee(5)
+        attendee_index.warm()
+        attendee.first_name = "Hafsah"
+        attendee.save()
+        self.assertEqual(attendee_index.get("SDW-0005").first_name, "Hafsah")
+        attendee.delete()
+        with self.assertNumQueries(1):
+            self.assertIsNone(attendee_index.get("SDW-0005"))
+
+
+class CheckInScanTests(CheckInTestCase):
+    def scan(self, dawrah_id, session="collection"):
+        return self.client.post(
+            reverse("checkin-scan"),
+            {"dawrah_id": dawrah_id, "session": session, "desk": "A"},
+            format="json",
+        )
+
+    def test_second_scan_is_a_conflict_with_the_first_check_in(self):
+        make_attendee(1)
+        first = self.scan("sdw-0001")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.json()["data"]["dawrah_id"], "SDW-0001")
+
+        second = self.scan("SDW-0001")
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.json()["data"]["checked_in_at"], first.json()["data"]["checked_in_at"])
+        self.assertEqual(CheckIn.objects.count(), 1)
+
+        # Another session is a separate check-in.
+        self.assertEqual(self.scan("SDW-0001", session="meal").status_code, 201)
+
+    def test_unknown_and_unpaid_attendees(self):
+        make_attendee(2, paid=False)
+        self.assertEqual(self.scan("SDW-0404").status_code, 404)
+        unpaid = Attendee.objects.get()
+        unpaid.dawrah_id = "SDW-0002"
+        unpaid.save()
+        self.assertEqual(self.scan("SDW-0002").status_code, 400)
+        self.assertFalse(CheckIn.objects.exists())
+
+    def test_organizers_only(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.scan("SDW-0001").status_code, 401)
+
+
+class CheckInUploadTests(CheckInTestCase):
+    def upload(self, checkins):
+        return self.client.post(reverse("checkin-upload"), {"checkins": checkins}, format="json")
+
+    def test_upload_deduplicates_and_reports_unknown_ids(self):
+        make_attendee(1)
+        make_attendee(2)
+        now = timezone.now()
+        self.client.post(
+            reverse("checkin-scan"), {"dawrah_id": "SDW-0002"}, format="json"
+        )
+        response = self.upload([
+            {"dawrah_id": "sdw-0001", "desk": "B", "checked_in_at": now.isoformat()},
+            # The same scan twice; the earlier one is kept.
+            {"dawrah_id": "SDW-0001", "desk": "C", "checked_in_at": (now - timedelta(minutes=5)).isoformat()},
+            # Checked in online already.
+            {"dawrah_id": "SDW-0002", "desk": "B", "checked_in_at": now.isoformat()},
+            {"dawrah_id": "SDW-0404", "desk": "B", "checked_in_at": now.isoformat()},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["data"],
+            {"received": 4, "created": 1, "duplicates": 2, "unknown": ["SDW-0404"]},
+        )
+        checkin = CheckIn.objects.get(dawrah_id="SDW-0001")
+        self.assertEqual(checkin.desk, "C")
+
+    def test_empty_upload_is_rejected(self):
+        self.assertEqual(self.upload([]).status_code, 400)
+
+    def test_conflicting_rows_are_not_counted_as_created(self):
+        attendee = make_attendee(1)
+        now = timezone.now()
+        original = CheckIn.objects.bulk_create
+
+        def scan_then_bulk_create(checkins, **kwargs):
+            # An online scan lands after the upload looked for existing check-ins.
+            CheckIn.objects.create(attendee=attendee, dawrah_id="SDW-0001", session="collection")
+            return original(checkins, **kwargs)
+
+        with mock.patch.object(CheckIn.objects, "bulk_create", side_effect=scan_then_bulk_create):
+            result = ingest_checkins([
+                {
+                    "dawrah_id": "SDW-0001",
+                    "session": "collection",
+                    "desk": "B",
+                    "checked_in_at": now - timedelta(minutes=5),
+                },
+            ])
+        self.assertEqual(result["created"], 0)
+        self.assertEqual(result["duplicates"], 1)
+        self.assertEqual(CheckIn.objects.count(), 1)
+
+
+class AttendanceCounterTests(CheckInTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.session = Session.objects.create(title="Tafsir", starts_at=timezone.now())
+
+    def flushed(self):
+        self.session.refresh_from_db()
+        return self.session.attendance_count
+
+    def test_flush_writes_the_claimed_delta_once(self):
+        cache.set(PENDING_KEY.format(self.session.pk), 5, timeout=None)
+        self.assertEqual(flush_session_counter(self.session.pk), 5)
+        self.assertEqual(flush_session_counter(self.session.pk), 0)
+        self.assertEqual(self.flushed(), 5)
+
+    def test_concurrent_flushes_do_not_write_the_same_delta_twice(self):
+        pending_key = PENDING_KEY.format(self.session.pk)
+        cache.set(pending_key, 5, timeout=None)
+        # Another flush reads the same 5 and claims 3 of it before this one
+        # claims: this one must write the 2 left, not the 5 it read.
+        get = cache.get
+
+        def stale_get(key, *args, **kwargs):
+            value = get(key, *args, **kwargs)
+            if key == pending_key:
+                cache.decr(pending_key, 3)
+            return value
+
+        with mock.patch.object(counters.cache, "get", side_effect=stale_get):
+            self.assertEqual(flush_session_counter(self.session.pk), 2)
+        self.assertEqual(cache.get(pending_key), 0)
+        self.assertEqual(self.flushed(), 2)
+
+    def test_increments_during_a_flush_are_kept_for_the_next(self):
+        pending_key = PENDING_KEY.format(self.session.pk)
+        cache.set(pending_key, 4, timeout=None)
+        update = Session.objects.filter(pk=self.session.pk).update
+
+        def scan_then_update(*args, **kwargs):
+            record_attendance(self.session.pk, 1)
+            return update(*args, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", side_effect=scan_then_update):
+            self.assertEqual(flush_session_counter(self.session.pk), 4)
+        self.assertEqual(cache.get(pending_key), 1)
+
+    def test_failed_write_gives_the_delta_back(self):
+        pending_key = PENDING_KEY.format(self.session.pk)
+        cache.set(pending_key, 4, timeout=None)
+        with mock.patch.object(QuerySet, "update", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                flush_session_counter(self.session.pk)
+        self.assertEqual(cache.get(pending_key), 4)
+        self.assertEqual(self.flushed(), 0)
+
+    def test_command_flushes_sessions_no_one_is_marking(self):
+        # The first call flushes at once and closes the flush window; the rest wait.
+        record_attendance(self.session.pk, 1)
+        record_attendance(self.session.pk, 2)
+        self.assertEqual(self.flushed(), 1)
+        call_command("flush_attendance_counts", stdout=StringIO())
+        self.assertEqual(self.flushed(), 3)
+        self.assertEqual(live_headcount(self.session.pk), 3)
+        call_command("flush_attendance_counts", stdout=StringIO())
+        self.assertEqual(self.flushed(), 3)
+
+    def test_live_headcount_is_seeded_again_once_it_expires(self):
+        record_attendance(self.session.pk, 2)
+        self.assertEqual(live_headcount(self.session.pk), 2)
+        # An increment lost by another worker.
+        cache.decr(LIVE_KEY.format(self.session.pk))
+        self.assertEqual(live_headcount(self.session.pk), 1)
+        with mock.patch("time.time", return_value=time.time() + LIVE_TIMEOUT + 1):
+            self.assertEqual(live_headcount(self.session.pk), 2)
+
+
+class QREncoderTests(SimpleTestCase):
+    # (mask, SHA-1 prefix of the module matrix) per version and error correction level,
+    # for the longest byte-mode payload each fits. The matrices were checked module for
+    # module against the qrcode package's output for the same data and mask.
+    VECTORS = {
+        1: {"L": (3, "440e6b733d046ae3"), "M": (2, "a4439f27917c31e5"), "Q": (7, "7e0d081a51dc5a49"), "H": (3, "aa6f15caf56e0f7d")},
+        2: {"L": (3, "356dc06fe231a901"), "M": (2, "1ffc8f3b77be6096"), "Q": (0, "608b35ca764f2f91"), "H": (1, "a53eab65de2c68ce")},
+        3: {"L": (2, "75e22aa46c0b4a97"), "M": (6, "898a00316c312835"), "Q": (1, "2e72e3ee05f1e4a3"), "H": (1, "f723cdf37dccc8b5")},
+        4: {"L": (6, "7e70f4b751b0b9fc"), "M": (3, "7abeb6b663d64a97"), "Q": (2, "36e4d26dd5895014"), "H": (1, "d377761f6bf640df")},
+        5: {"L": (2, "d892ada3fd23d1dc"), "M": (1, "480cf0b6ea439146"), "Q": (0, "b2684b2f3a67467a"), "H": (2, "393944600f8cf6e8")},
+        6: {"L": (6, "a7cf7ec5856908d1"), "M": (4, "a309c4e589300ac7"), "Q": (1, "f9b7eb55e3a7451a"), "H": (5, "9679bc0674f18898")},
+        7: {"L": (0, "c3c7165d81215f3e"), "M": (0, "fb6281c8ab72674c"), "Q": (0, "afa3cc6e15c15d48"), "H": (3, "f42142930976838e")},
+        8: {"L": (0, "ca0fddba9042dff7"), "M": (3, "1d8c30de0c2a5999"), "Q": (7, "6a3c8922de994c91"), "H": (0, "3b2a698c53f09369")},
+        9: {"L": (2, "2dbf347c43d10766"), "M": (2, "ca22388e47c5c394"), "Q": (0, "c5cb5158dda0e455"), "H": (7, "5c741bc58188c34d")},
+        10: {"L": (0, "6a274b5d0df1daec"), "M": (0, "97c35f1094c53f94"), "Q": (0, "0075b8dd5bbb3a8e"), "H": (0, "3ad64b46994fdf3b")},
+    }
+
+    def test_known_vectors(self):
+        for version, levels in self.VECTORS.items():
+            for ecc, (mask, digest) in levels.items():
+                with self.subTest(version=version, ecc=ecc):
+                    count_bits = 8 if version < 10 else 16
+                    length = (_data_capacity(version, ecc) * 8 - 4 - count_bits) // 8
+                    code = QRCode((b"SDW-0001 " * 40)[:length], ecc)
+                    self.assertEqual(code.version, version)
+                    self.assertEqual(code.mask, mask)
+                    modules = bytes(dark for row in code.modules for dark in row)
+                    self.assertEqual(hashlib.sha1(modules).hexdigest()[:16], digest)
+
+    def test_one_more_byte_takes_the_next_version(self):
+        self.assertEqual(QRCode(b"x" * 14, "M").version, 1)
+        self.assertEqual(QRCode(b"x" * 15, "M").version, 2)
+        with self.assertRaises(ValueError):
+            QRCode(b"x" * 214, "M")
+
+    def test_images(self):
+        png = render_ticket("SDW-0001", "png", scale=2)
+        self.assertEqual(png[:8], b"\x89PNG\r\n\x1a\n")
+        # Version 1 is 21 modules, plus a quiet zone of 4 on each side.
+        self.assertEqual(struct.unpack(">II", png[16:24]), (58, 58))
+        svg = render_ticket("SDW-0001", "svg").decode()
+        self.assertIn('viewBox="0 0 29 29"', svg)
+
+
+class TicketViewTests(CheckInTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(None)
+        make_attendee(1)
+
+    def test_ticket_needs_its_signed_token(self):
+        url = reverse("ticket-png", kwargs={"dawrah_id": "SDW-0001"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url, {"token": ticket_token("SDW-0002")}).status_code, 404)
+
+        response = self.client.get(ticket_url("SDW-0001"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+        again = self.client.get(ticket_url("SDW-0001"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_pregeneration_needs_a_shared_cache(self):
+        with self.assertRaisesMessage(CommandError, "shared backend"):
+            call_command("generate_qr_tickets", stdout=StringIO())
+
+
+class ConfirmationEmailTests(CheckInTestCase):
+    def test_ticket_is_rendered_by_the_email_thread(self):
+        attendee = make_attendee(1)
+        render_ticket = mock.Mock(return_value=b"\x89PNG ticket")
+        threads = []
+        with mock.patch.object(EmailThread, "start", lambda thread: threads.append(thread)):
+            send_confirmation_email(attendee, render_ticket=render_ticket)
+        render_ticket.assert_not_called()
+
+        threads[0].run()
+        render_ticket.assert_called_once_with("SDW-0001", "png")
+        [email] = mail.outbox
+        self.assertEqual(email.attachments[0].get_payload(decode=True), b"\x89PNG ticket")
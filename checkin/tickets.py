@@ -0,0 +1,97 @@
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+
+from .qr import render_ticket
+
+# Bump QR_TICKET_VERSION when the ticket rendering changes to orphan old cache entries.
+TICKET_VERSION = getattr(settings, "QR_TICKET_VERSION", 1)
+TICKET_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+def ticket_cache_key(dawrah_id, image_format="png"):
+    return f"qr-ticket:{TICKET_VERSION}:{image_format}:{dawrah_id}"
+
+
+def ticket_token(dawrah_id):
+    """
+    Returns the signature that TicketView requires with a Dawrah ID, so that tickets
+    cannot be fetched by counting through the sequential IDs.
+    """
+    return signing.Signer(salt="checkin.ticket").signature(dawrah_id)
+
+
+def check_ticket_token(dawrah_id, token):
+    return constant_time_compare(ticket_token(dawrah_id), token or "")
+
+
+def ticket_url(dawrah_id, image_format="png"):
+    """
+    Returns the path of a Dawrah ID's ticket, signed with its ticket_token().
+    """
+    path = reverse(f"ticket-{image_format}", kwargs={"dawrah_id": dawrah_id})
+    return f"{path}?token={ticket_token(dawrah_id)}"
+
+
+def ticket_etag(dawrah_id, image_format="png"):
+    """
+    Returns the ETag of a ticket. A ticket is a pure function of its Dawrah ID,
+    format and TICKET_VERSION, so the tag is derived from those without rendering.
+    """
+    digest = hashlib.sha1(ticket_cache_key(dawrah_id, image_format).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def get_ticket(dawrah_id, image_format="png"):
+    """
+    Returns the rendered QR ticket for a Dawrah ID, rendering and caching it on first use.
+    """
+    key = ticket_cache_key(dawrah_id, image_format)
+    ticket = cache.get(key)
+    if ticket is None:
+        ticket = render_ticket(dawrah_id, image_format)
+        cache.set(key, ticket, TICKET_CACHE_TIMEOUT)
+    return ticket
+
+
+def pregenerate_tickets(dawrah_ids, image_format="png", workers=None, force=False):
+    """
+    Renders tickets for many Dawrah IDs across a process pool and stores them in the cache.
+
+    Tickets already in the cache are skipped unless force is set.
+
+    Returns:
+        int: The number of tickets rendered.
+    """
+    dawrah_ids = list(dawrah_ids)
+    if not force:
+        cached = cache.get_many([ticket_cache_key(d, image_format) for d in dawrah_ids])
+        dawrah_ids = [
+            d for d in dawrah_ids if ticket_cache_key(d, image_format) not in cached
+        ]
+    if not dawrah_ids:
+        return 0
+
+    render = partial(render_ticket, image_format=image_format)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tickets = executor.map(render, dawrah_ids, chunksize=64)
+        batch = {}
+        for dawrah_id, ticket in zip(dawrah_ids, tickets):
+            batch[ticket_cache_key(dawrah_id, image_format)] = ticket
+            if len(batch) >= 500:
+                cache.set_many(batch, TICKET_CACHE_TIMEOUT)
+                batch = {}
+        if batch:
+            cache.set_many(batch, TICKET_CACHE_TIMEOUT)
+    return len(dawrah_ids)
@@ -0,0 +1,32 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path("scan/", views.CheckInScanView.as_view(), name="checkin-scan"),
+    path("snapshot/", views.CheckInSnapshotView.as_view(), name="checkin-snapshot"),
+    path("upload/", views.CheckInUploadView.as_view(), name="checkin-upload"),
+    path(
+        "tickets/<str:dawrah_id>.png",
+        views.TicketView.as_view(),
+        {"image_format": "png"},
+        name="ticket-png",
+    ),
+    path(
+        "tickets/<str:dawrah_id>.svg",
+        views.TicketView.as_view(),
+        {"image_format": "svg"},
+        name="ticket-svg",
+    ),
+    path("sessions/", views.SessionListCreateView.as_view(), name="session-list"),
+    path(
+        "sessions/<int:pk>/attendance/",
+        views.MarkAttendanceView.as_view(),
+        name="session-attendance",
+    ),
+    path(
+        "sessions/<int:pk>/headcount/",
+        views.SessionHeadcountView.as_view(),
+        name="session-headcount",
+    ),
+]
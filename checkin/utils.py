@@ -0,0 +1,111 @@
+from .counters import record_attendance
+from .index import attendee_index, normalize_dawrah_id
+from .models import Attendance, CheckIn
+
+
+def ingest_checkins(records):
+    """
+    Stores check-ins uploaded from offline desks with a single bulk insert.
+
+    Records are deduplicated by (dawrah_id, session) within the batch, keeping the
+    earliest scan, and against check-ins already in the database. Dawrah IDs that
+    do not belong to a paid attendee are reported back instead of being stored.
+
+    Returns:
+        dict: Counts of received, created and duplicate records, plus the unknown Dawrah IDs.
+    """
+    batch = {}
+    for record in records:
+        key = (normalize_dawrah_id(record["dawrah_id"]), record["session"])
+        if key not in batch or record["checked_in_at"] < batch[key]["checked_in_at"]:
+            batch[key] = record
+
+    entries = {
+        key: entry
+        for key, entry in attendee_index.get_many({key[0] for key in batch}).items()
+        if entry.paid
+    }
+    unknown = sorted({key[0] for key in batch} - entries.keys())
+
+    known = CheckIn.objects.filter(dawrah_id__in=[entry.dawrah_id for entry in entries.values()])
+    existing = set(known.values_list("dawrah_id", "session"))
+
+    checkins = []
+    for (key, session), record in batch.items():
+        entry = entries.get(key)
+        if entry is None or (entry.dawrah_id, session) in existing:
+            continue
+        checkins.append(
+            CheckIn(
+                attendee_id=entry.attendee_id,
+                dawrah_id=entry.dawrah_id,
+                session=session,
+                desk=record["desk"],
+                checked_in_at=record["checked_in_at"],
+            )
+        )
+    # ignore_conflicts covers scans recorded online while this batch was in flight.
+    # It skips them silently, so the rows created are the ones now stored as scanned.
+    CheckIn.objects.bulk_create(checkins, batch_size=500, ignore_conflicts=True)
+    created = 0
+    if checkins:
+        scans = {(checkin.dawrah_id, checkin.session, checkin.checked_in_at) for checkin in checkins}
+        stored = known.filter(
+            checked_in_at__in={checkin.checked_in_at for checkin in checkins}
+        ).values_list("dawrah_id", "session", "checked_in_at")
+        created = len(scans.intersection(stored))
+
+    unknown_records = sum(
+        1 for record in records if normalize_dawrah_id(record["dawrah_id"]) in unknown
+    )
+    return {
+        "received": len(records),
+        "created": created,
+        "duplicates": len(records) - created - unknown_records,
+        "unknown": unknown,
+    }
+
+
+def mark_attendance(session, dawrah_ids):
+    """
+    Marks a batch of attendees present for a lecture session.
+
+    Dawrah IDs are resolved through the attendee index, already-marked attendees are
+    filtered out with one query and the rest are stored with one bulk insert. The
+    session's live headcount is then bumped by the number of new rows.
+
+    Returns:
+        dict: Counts of received, marked and duplicate IDs, the unknown Dawrah IDs and the live headcount.
+    """
+    keys = {normalize_dawrah_id(dawrah_id) for dawrah_id in dawrah_ids}
+    entries = {
+        key: entry
+        for key, entry in attendee_index.get_many(keys).items()
+        if entry.paid
+    }
+    unknown = sorted(keys - entries.keys())
+
+    already_marked = set(
+        Attendance.objects.filter(
+            session=session,
+            attendee_id__in=[entry.attendee_id for entry in entries.values()],
+        ).values_list("attendee_id", flat=True)
+    )
+    attendances = [
+        Attendance(
+            session=session,
+            attendee_id=entry.attendee_id,
+            dawrah_id=entry.dawrah_id,
+        )
+        for entry in entries.values()
+        if entry.attendee_id not in already_marked
+    ]
+    Attendance.objects.bulk_create(attendances, batch_size=500, ignore_conflicts=True)
+
+    return {
+        "received": len(dawrah_ids),
+        "marked": len(attendances),
+        "duplicates": len(keys) - len(unknown) - len(attendances),
+        "unknown": unknown,
+        "headcount": record_attendance(session.pk, len(attendances)),
+    }
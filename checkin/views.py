@@ -0,0 +1,257 @@
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+
+from core.db_router import ReplicaReadMixin
+
+from .counters import live_headcount
+from .index import attendee_index
+from .models import CheckIn, Session
+from .serializers import (
+    CheckInScanSerializer,
+    CheckInUploadSerializer,
+    MarkAttendanceSerializer,
+    SessionSerializer,
+)
+from .snapshot import snapshot_bytes, snapshot_filename
+from .tickets import CONTENT_TYPES, check_ticket_token, get_ticket, ticket_etag
+from .utils import ingest_checkins, mark_attendance
+
+
+def checkin_data(entry, checkin):
+    return {
+        "dawrah_id": entry.dawrah_id,
+        "first_name": entry.first_name,
+        "last_name": entry.last_name,
+        "level": entry.level,
+        "hall_off_residence": entry.hall,
+        "session": checkin.session,
+        "desk": checkin.desk,
+        "checked_in_at": checkin.checked_in_at,
+    }
+
+
+@extend_schema(tags=["Check-in"])
+class CheckInScanView(APIView):
+    """
+    Records a ticket collection scan from a check-in desk.
+
+    The Dawrah ID is resolved through the in-process attendee index instead of the
+    paginated attendee list, and the check-in row is inserted in its own savepoint.
+    A second scan of the same Dawrah ID for the same session is rejected by the
+    unique constraint on CheckIn and answered with 409 and the original check-in.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    query_budget = 3
+
+    @extend_schema(request=CheckInScanSerializer, tags=["Check-in"])
+    def post(self, request):
+        serializer = CheckInScanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.validated_data["session"]
+
+        entry = attendee_index.get(serializer.validated_data["dawrah_id"])
+        if entry is None:
+            return Response(
+                {"success": False, "message": "No attendee with that Dawrah ID."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if not entry.paid:
+            return Response(
+                {"success": False, "message": "Attendee has not completed payment."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            with transaction.atomic():
+                checkin = CheckIn.objects.create(
+                    attendee_id=entry.attendee_id,
+                    dawrah_id=entry.dawrah_id,
+                    session=session,
+                    desk=serializer.validated_data["desk"],
+                )
+        except IntegrityError:
+            checkin = CheckIn.objects.filter(
+                dawrah_id=entry.dawrah_id, session=session
+            ).first()
+            if checkin is None:
+                # The attendee row vanished between lookup and insert.
+                attendee_index.discard(entry.dawrah_id)
+                return Response(
+                    {"success": False, "message": "No attendee with that Dawrah ID."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            return Response(
+                {
+                    "success": False,
+                    "message": "Attendee has already checked in for this session.",
+                    "data": checkin_data(entry, checkin),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            {
+                "success": True,
+                "message": "Check-in successful.",
+                "data": checkin_data(entry, checkin),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
+@extend_schema(tags=["Check-in"])
+class CheckInSnapshotView(ReplicaReadMixin, APIView):
+    """
+    Downloads a standalone SQLite snapshot of paid attendees for offline check-in desks.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 3
+
+    @extend_schema(responses={(200, "application/vnd.sqlite3"): bytes}, tags=["Check-in"])
+    def get(self, request):
+        response = HttpResponse(snapshot_bytes(), content_type="application/vnd.sqlite3")
+        response["Content-Disposition"] = f'attachment; filename="{snapshot_filename()}"'
+        return response
+
+
+@extend_schema(tags=["Check-in"])
+class CheckInUploadView(APIView):
+    """
+    Ingests the check-ins an offline desk collected from its snapshot.
+
+    Records are deduplicated by (dawrah_id, session) and stored with one bulk insert.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    query_budget = 5
+
+    @extend_schema(request=CheckInUploadSerializer, tags=["Check-in"])
+    def post(self, request):
+        serializer = CheckInUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = ingest_checkins(serializer.validated_data["checkins"])
+        return Response(
+            {
+                "success": True,
+                "message": f"{result['created']} check-ins uploaded successfully.",
+                "data": result,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(tags=["Check-in"])
+class TicketView(APIView):
+    """
+    Serves the QR ticket for a Dawrah ID as PNG or SVG.
+
+    The URL must carry the ticket's signed token, see checkin.tickets.ticket_url(); the
+    payment status of a paid registration links to it. Tickets are rendered once and
+    cached. Their ETag is derived from the Dawrah ID and ticket version, so a matching
+    If-None-Match is answered with 304 before the cache is even consulted.
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    query_budget = 1
+
+    @extend_schema(
+        parameters=[OpenApiParameter("token", str, required=True, description="Signed ticket token")],
+        responses={(200, "image/png"): bytes},
+        tags=["Check-in"],
+    )
+    def get(self, request, dawrah_id, image_format):
+        entry = None
+        if check_ticket_token(dawrah_id, request.query_params.get("token")):
+            entry = attendee_index.get(dawrah_id)
+        if entry is None or not entry.paid:
+            return Response(
+                {"success": False, "message": "No attendee with that Dawrah ID."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        etag = ticket_etag(entry.dawrah_id, image_format)
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(
+                get_ticket(entry.dawrah_id, image_format),
+                content_type=CONTENT_TYPES[image_format],
+            )
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, max-age=86400"
+        return response
+
+
+@extend_schema(tags=["Attendance"])
+class SessionListCreateView(generics.ListCreateAPIView):
+    """
+    Lists the lecture sessions on the timetable or creates a new one.
+    """
+
+    serializer_class = SessionSerializer
+    queryset = Session.objects.all()
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 3
+
+
+@extend_schema(tags=["Attendance"])
+class MarkAttendanceView(generics.GenericAPIView):
+    """
+    Marks a batch of scanned Dawrah IDs present for a lecture session.
+    """
+
+    serializer_class = MarkAttendanceSerializer
+    queryset = Session.objects.all()
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    query_budget = 7
+
+    @extend_schema(tags=["Attendance"])
+    def post(self, request, *args, **kwargs):
+        session = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = mark_attendance(session, serializer.validated_data["dawrah_ids"])
+        return Response(
+            {
+                "success": True,
+                "message": f"{result['marked']} attendees marked present.",
+                "data": result,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(tags=["Attendance"])
+class SessionHeadcountView(APIView):
+    """
+    Returns the live headcount for a lecture session from the attendance counters.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 2
+
+    @extend_schema(tags=["Attendance"])
+    def get(self, request, pk):
+        headcount = live_headcount(pk)
+        if headcount is None:
+            return Response(
+                {"success": False, "message": "Session not found."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(
+            {"success": True, "data": {"session": pk, "headcount": headcount}},
+            status=status.HTTP_200_OK,
+        )
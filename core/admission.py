@@ -0,0 +1,248 @@
+"""
+Priority-aware admission control.
+
+Views name the class of traffic they serve with the `admission_class` attribute, or
+for one handler with the @admit_as decorator:
+
+    class DonorCreateListView(generics.ListCreateAPIView):
+        admission_class = "organizer"
+
+        @admit_as("registration")
+        def post(self, request, *args, **kwargs):
+            ...
+
+and ADMISSION_CLASSES gives every class a concurrency limit, a bounded wait queue, the
+longest a queued request waits for a slot, and the Retry-After sent when it gets none:
+
+    ADMISSION_CLASSES = {
+        "webhook": {"concurrency": 8, "queue": 32, "timeout": 10, "retry_after": 5},
+        "organizer": {"concurrency": 2, "queue": 2, "timeout": 0.5, "retry_after": 2},
+    }
+
+AdmissionMiddleware admits a request as soon as its class has a free slot. Otherwise the
+request waits in the class's queue; when the queue is full, or no slot frees up in
+time, it is answered at once with a 503 and Retry-After, before any view code, query or
+outbound call runs. Views without a class, or with a class missing from the setting,
+are always admitted.
+
+A queued request still holds a worker thread, so keep the concurrency plus queue of
+the lower priority classes below the threads of a worker; the remaining threads stay
+free for webhooks during a dashboard stampede. Under ASGI the middleware runs on the
+event loop, and a request only takes a thread of the loop's executor while it is queued.
+Limits and counters are per worker process, and the counters are exported on /metrics.
+"""
+
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from core.metrics import Histogram
+
+
+class AdmissionClass:
+    """
+    A concurrency limit with a bounded wait queue for one class of traffic.
+
+    Attributes:
+        name (str): The class name, as used by views' `admission_class`.
+        concurrency (int): Requests of the class allowed to run at once.
+        queue (int): Requests allowed to wait for a slot; more are rejected immediately.
+        timeout (float): Seconds a queued request waits for a slot before it is rejected.
+        retry_after (int): Seconds sent in the Retry-After header of rejections.
+    """
+
+    def __init__(self, name, concurrency, queue=0, timeout=1.0, retry_after=1):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_histogram = Histogram()
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Takes a slot, waiting in the queue if needed.
+
+        Returns:
+            str or None: None once admitted, else why the request was rejected.
+        """
+        with self._condition:
+            if self._take_slot():
+                return None
+            if self.waiting >= self.queue:
+                self.rejected["queue_full"] += 1
+                return "queue_full"
+
+            start = time.perf_counter()
+            self.waiting += 1
+            try:
+                admitted = self._condition.wait_for(
+                    lambda: self.active < self.concurrency, self.timeout
+                )
+            finally:
+                self.waiting -= 1
+            if not admitted:
+                self.rejected["timeout"] += 1
+                return "timeout"
+            self._take_slot()
+        self.wait_histogram.observe(time.perf_counter() - start)
+        return None
+
+    def try_acquire(self):
+        """
+        Takes a slot if one is free, without waiting.
+
+        Returns:
+            bool: Whether the request was admitted.
+        """
+        with self._condition:
+            return self._take_slot()
+
+    def _take_slot(self):
+        if self.active >= self.concurrency:
+            return False
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    @property
+    def options(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "timeout": self.timeout,
+            "retry_after": self.retry_after,
+        }
+
+    def snapshot(self):
+        with self._condition:
+            return {
+                "concurrency": self.concurrency,
+                "queue": self.queue,
+                "active": self.active,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+            }
+
+
+# Class name -> AdmissionClass, built by AdmissionMiddleware from ADMISSION_CLASSES.
+admission_classes = {}
+
+
+def admit_as(name):
+    """
+    Sets the admission class of a view class or of a single handler method.
+    """
+
+    def decorator(view):
+        view.admission_class = name
+        return view
+
+    return decorator
+
+
+def get_admission_class(view_func, method):
+    """
+    Returns the admission class name of a resolved view for the given HTTP method, or
+    None when the view declares none.
+    """
+    view_class = getattr(view_func, "view_class", None)
+    if view_class is None:
+        return getattr(view_func, "admission_class", None)
+    handler = getattr(view_class, method.lower(), None)
+    name = getattr(handler, "admission_class", None)
+    if name is None:
+        name = getattr(view_class, "admission_class", None)
+    return name
+
+
+class AdmissionMiddleware:
+    """
+    Sheds load per admission class, see the module docstring. Not used when
+    ADMISSION_CLASSES is empty.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = getattr(settings, "ADMISSION_CLASSES", {})
+        if not config:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django awaits a coroutine process_view on the loop instead of running it on a thread.
+            self.process_view = self.aprocess_view
+        for name, options in config.items():
+            # Kept across handler reloads so the counters survive, unless reconfigured.
+            current = admission_classes.get(name)
+            if current is None or current.options != {**current.options, **options}:
+                admission_classes[name] = AdmissionClass(name, **options)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.release(request)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release(request)
+
+    @staticmethod
+    def release(request):
+        admitted = getattr(request, "_admission_class", None)
+        if admitted is not None:
+            admitted.release()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        admission_class = admission_classes.get(get_admission_class(view_func, request.method))
+        if admission_class is None:
+            return None
+        return self.admit(request, admission_class, admission_class.acquire())
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        admission_class = admission_classes.get(get_admission_class(view_func, request.method))
+        if admission_class is None:
+            return None
+        if admission_class.try_acquire():
+            reason = None
+        elif admission_class.queue and admission_class.timeout:
+            # Queued: wait for a slot on a thread of the loop's executor, not on the loop.
+            reason = await sync_to_async(admission_class.acquire, thread_sensitive=False)()
+        else:
+            reason = admission_class.acquire()
+        return self.admit(request, admission_class, reason)
+
+    @staticmethod
+    def admit(request, admission_class, reason):
+        if reason is None:
+            request._admission_class = admission_class
+            return None
+        response = JsonResponse(
+            {"success": False, "message": "The server is busy, please retry shortly"},
+            status=503,
+        )
+        response["Retry-After"] = str(admission_class.retry_after)
+        response["X-Shed-Reason"] = f"{admission_class.name}:{reason}"
+        return response
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "core"
+
+    def ready(self):
+        from .query_budget import watch_connection as watch_query_logs
+        from .timing import watch_connection as watch_request_timing
+
+        # Installed on every connection rather than around each request, since under
+        # ASGI a request's queries run on threads other than its middleware's.
+        connection_created.connect(watch_query_logs, dispatch_uid="core-query-logs")
+        connection_created.connect(watch_request_timing, dispatch_uid="core-request-timing")
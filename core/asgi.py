@@ -7,10 +7,57 @@ For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
+import functools
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import SyncToAsync, ThreadSensitiveContext, iscoroutinefunction
+from django.core.handlers.asgi import ASGIHandler
+from django.urls import Resolver404, resolve
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+# Django runs each request's sync code in a thread of its own under ASGI, so a
+# persistent connection would be opened per request and never reused.
+os.environ.setdefault("CONN_MAX_AGE", "0")
 
-application = get_asgi_application()
+
+@functools.lru_cache(maxsize=512)
+def serves_async_view(path):
+    try:
+        return iscoroutinefunction(resolve(path).func)
+    except Resolver404:
+        return False
+
+
+class AsyncViewsHandler(ASGIHandler):
+    """
+    Django's ASGI handler, except that requests to async views share one thread for
+    their sync code.
+
+    Django runs the sync code of a request, its queries and the hooks of Django's own
+    middleware, on a thread of the request's own, which waits with its connection open
+    while an async view waits for Paystack. Requests to async views all use one thread
+    instead, and so one connection at a time; their sync steps are short, and SQLite
+    takes one writer at a time anyway.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.async_views_context = ThreadSensitiveContext()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not serves_async_view(
+            scope["path"].removeprefix(scope.get("root_path", ""))
+        ):
+            return await super().__call__(scope, receive, send)
+        # ThreadSensitiveContext() in ASGIHandler keeps a context already set.
+        token = SyncToAsync.thread_sensitive_context.set(self.async_views_context)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            SyncToAsync.thread_sensitive_context.reset(token)
+
+
+# As get_asgi_application() does.
+django.setup(set_prefix=False)
+application = AsyncViewsHandler()
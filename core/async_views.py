@@ -0,0 +1,103 @@
+"""
+Async API views.
+
+DRF's APIView dispatches synchronously, so a view calling Paystack holds its worker
+thread for the whole call. AsyncAPIView is the part of APIView the public async
+endpoints need, around an async dispatch(): parsing with DEFAULT_PARSER_CLASSES,
+throttling, the EXCEPTION_HANDLER and rendering with ORJSONRenderer. It neither
+authenticates nor checks permissions. Handlers are coroutines that run their queries
+through sync_to_async:
+
+    class AsyncRegistrationView(AsyncAPIView):
+        throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+        throttle_scope = "registration"
+
+        async def post(self, request):
+            attendee = await sync_to_async(register)(request.data)
+            ...
+
+Under ASGI every middleware is async capable, so the handler runs on the server's event
+loop and a request waiting in it holds no thread. Its sync_to_async steps run on one
+thread shared by the requests to async views, see core.asgi.AsyncViewsHandler. Under
+WSGI the same routes work, blocking their thread as the sync views do, and Django runs
+each handler on an event loop of its own, which is why Paystack calls are made on a
+shared loop, see payments.utils.get_gateway_loop().
+"""
+
+from asgiref.sync import sync_to_async
+from django.views import View
+
+from rest_framework.exceptions import MethodNotAllowed, Throttled
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .renderers import ORJSONRenderer
+
+
+class AsyncAPIView(View):
+    """
+    Base class for async API views, see the module docstring.
+
+    Attributes:
+        throttle_classes (list): Throttles checked before the handler runs, as on APIView.
+        parser_classes (list): Parsers of request.data.
+    """
+
+    throttle_classes = []
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    renderer_class = ORJSONRenderer
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Like APIView. csrf_exempt() would hide that the view is async in Django 4.2.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            parser_context={"view": self, "args": args, "kwargs": kwargs},
+        )
+        self.request = request
+        try:
+            method = request.method.lower()
+            if method not in self.http_method_names or not hasattr(self, method):
+                raise MethodNotAllowed(request.method)
+            # The throttles' cache may be Redis; keep its round trips off the event loop.
+            await sync_to_async(self.check_throttles)(request)
+            response = await getattr(self, method)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response)
+
+    def check_throttles(self, request):
+        durations = [
+            throttle.wait()
+            for throttle in (throttle_class() for throttle_class in self.throttle_classes)
+            if not throttle.allow_request(request, self)
+        ]
+        if durations:
+            raise Throttled(max((d for d in durations if d is not None), default=None))
+
+    def get_renderer_context(self):
+        return {"view": self, "args": self.args, "kwargs": self.kwargs, "request": self.request}
+
+    def handle_exception(self, exc):
+        response = api_settings.EXCEPTION_HANDLER(exc, self.get_renderer_context())
+        if response is None:
+            raise exc
+        response.exception = True
+        return response
+
+    def finalize_response(self, request, response):
+        if isinstance(response, Response):
+            renderer = self.renderer_class()
+            response.accepted_renderer = renderer
+            response.accepted_media_type = renderer.media_type
+            response.renderer_context = self.get_renderer_context()
+        return response
@@ -0,0 +1,166 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_delete, post_save
+
+from rest_framework.response import Response
+
+from .db_router import use_primary
+
+GENERATION_KEY = "cache-generation:{}"
+RESPONSE_KEY = "cached-response:{}:{}"
+
+
+class CacheMetrics:
+    """
+    In-process hit and miss counters for cached responses, keyed by view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+
+    def hit(self, name):
+        with self._lock:
+            self._hits[name] += 1
+
+    def miss(self, name):
+        with self._lock:
+            self._misses[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(set(self._hits) | set(self._misses))
+            views = {
+                name: {"hits": self._hits[name], "misses": self._misses[name]}
+                for name in names
+            }
+        hits = sum(view["hits"] for view in views.values())
+        misses = sum(view["misses"] for view in views.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+            "views": views,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+
+
+metrics = CacheMetrics()
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Returns whether a cache is shared between processes. LocMemCache and DummyCache
+    are not: what one worker or management command stores there, no other sees.
+    """
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def _new_generation():
+    # Seeded from the clock so a generation lost to eviction never repeats an old one.
+    return int(time.time() * 1000)
+
+
+def get_generations(namespaces):
+    keys = [GENERATION_KEY.format(namespace) for namespace in namespaces]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, _new_generation(), timeout=None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def invalidate(*namespaces):
+    """
+    Invalidates every cached response that depends on the given namespaces by
+    bumping their generation counters. Old entries are never read again and
+    simply expire.
+    """
+    for namespace in namespaces:
+        key = GENERATION_KEY.format(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), timeout=None)
+
+
+def invalidate_on_save(model, *namespaces):
+    """
+    Connects post_save and post_delete on model to invalidate the given namespaces.
+    Called from the AppConfig.ready() of the app that owns the model.
+    """
+
+    def receiver(sender, **kwargs):
+        invalidate(*namespaces)
+
+    receiver.__name__ = f"invalidate_{'_'.join(namespaces)}"
+    uid = f"invalidate-cache-{model._meta.label}-{'-'.join(namespaces)}"
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+
+
+def response_cache_key(name, request, namespaces):
+    generations = get_generations(namespaces)
+    query = "&".join(sorted(request.META.get("QUERY_STRING", "").split("&")))
+    raw = f"{request.path}?{query}|{generations}"
+    return RESPONSE_KEY.format(name, hashlib.md5(raw.encode()).hexdigest())
+
+
+def cache_response(*namespaces, timeout=DEFAULT_TIMEOUT, name=None):
+    """
+    Caches successful responses of a DRF view handler such as `get`.
+
+    The key is built from the request path, the sorted query string and the current
+    generation of each namespace the response depends on, so saving or deleting a
+    model connected through invalidate_on_save() makes the old responses unreachable.
+    Permission and authentication checks still run on every request, because DRF
+    performs them before calling the handler. A miss reads from the primary database
+    even in a ReplicaReadMixin view.
+
+    Args:
+        *namespaces: Names of the data the response depends on, e.g. "attendees".
+        timeout: Cache timeout in seconds. Defaults to the cache's TIMEOUT.
+        name: Name used for the cache key and metrics. Defaults to the handler's qualified name.
+    """
+
+    def decorator(handler):
+        view_name = name or handler.__qualname__
+
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = response_cache_key(view_name, request, namespaces)
+            cached = cache.get(key)
+            if cached is not None:
+                metrics.hit(view_name)
+                data, status_code = cached
+                response = Response(data, status=status_code)
+                response["X-Cache"] = "HIT"
+                return response
+
+            metrics.miss(view_name)
+            # A replica that has not caught up with a write would be cached under the
+            # generation that write already bumped, so responses are built from the primary.
+            with use_primary():
+                response = handler(view, request, *args, **kwargs)
+            if response.status_code == 200 and isinstance(response, Response):
+                cache.set(key, (response.data, response.status_code), timeout)
+                response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
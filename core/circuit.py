@@ -0,0 +1,135 @@
+"""
+Circuit breakers around outbound calls.
+
+A call to a slow or failing service ties up a worker thread for as long as the service
+takes to fail. A breaker wraps those calls:
+
+    with get_breaker("paystack").guard():
+        response = requests.post(url, json=data, timeout=settings.PAYSTACK_TIMEOUT)
+        response.raise_for_status()
+
+Every exception raised inside the block counts as a failure, cancellation included,
+and so does a call that succeeds but takes longer than `slow_call` seconds. After
+`failures` failures in a row the breaker opens: guard() then raises CircuitOpen at once, without calling out,
+for `reset_timeout` seconds. The next call is let through as a trial while other
+calls keep failing fast; its success closes the breaker, its failure opens it again.
+
+Options come from CIRCUIT_BREAKERS by breaker name. State is per worker process, like
+admission control, and is exported on /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f"The {name} circuit is open")
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a service keeps failing.
+
+    Attributes:
+        name (str): The breaker name, as used in CIRCUIT_BREAKERS and metrics.
+        failures (int): Consecutive failures that open the breaker.
+        slow_call (float): Seconds after which a successful call counts as a failure.
+        reset_timeout (float): Seconds the breaker stays open before a trial call.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failures=5, slow_call=5.0, reset_timeout=30.0):
+        self.name = name
+        self.failures = failures
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self, now=None):
+        """
+        Returns:
+            bool: Whether a call may go out now. An open breaker lets one trial call out
+            once its reset timeout has passed.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, success, now=None):
+        with self._lock:
+            if success:
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failures:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic() if now is None else now
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    @contextmanager
+    def guard(self):
+        """
+        Runs the block as a call through the breaker.
+
+        Raises:
+            CircuitOpen: When the breaker is open; the block does not run.
+        """
+        if not self.allow():
+            raise CircuitOpen(self.name)
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            # Cancelled calls too: a trial call must end, or the breaker stays half open.
+            self.record(False)
+            raise
+        self.record(time.monotonic() - start <= self.slow_call)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+# Breaker name -> CircuitBreaker, created on first use from CIRCUIT_BREAKERS.
+breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        breaker = breakers.get(name)
+        if breaker is None:
+            options = getattr(settings, "CIRCUIT_BREAKERS", {}).get(name, {})
+            breaker = breakers[name] = CircuitBreaker(name, **options)
+        return breaker
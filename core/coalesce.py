@@ -0,0 +1,139 @@
+"""
+Single-flight coalescing of identical concurrent requests.
+
+When several organizers open the dashboard at once, each request would run the same
+heavy queries. @single_flight lets the first request, the leader, run the handler while
+identical requests arriving meanwhile wait for it and answer with its result. A
+successful result is also reused for `window` seconds, so the stampede's stragglers
+share it too.
+
+Requests are identical when they hit the same handler with the same path, query
+parameters and permission classes. Authentication and permission checks still run for
+every request, because DRF performs them before calling the handler.
+
+Coalescing is per worker process and complements cache_response: placed above it, only
+the leader looks up or fills the cache while the others wait.
+
+    @single_flight()
+    @cache_response("attendees")
+    def get(self, request, *args, **kwargs):
+        ...
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+
+from rest_framework.response import Response
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.expires = 0.0
+
+
+class CoalesceMetrics:
+    """
+    In-process counters of handler runs and of responses shared from another request's
+    run, keyed by view.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = defaultdict(int)
+        self.shared = defaultdict(int)
+
+    def run(self, name):
+        with self._lock:
+            self.runs[name] += 1
+
+    def share(self, name):
+        with self._lock:
+            self.shared[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {"runs": self.runs[name], "shared": self.shared[name]}
+                for name in sorted(set(self.runs) | set(self.shared))
+            }
+
+
+metrics = CoalesceMetrics()
+
+_flights = {}
+_lock = threading.Lock()
+
+
+def _flight_key(view_name, view, request):
+    return (
+        view_name,
+        request.path,
+        tuple(sorted((param, tuple(values)) for param, values in request.query_params.lists())),
+        tuple(type(permission).__name__ for permission in view.get_permissions()),
+    )
+
+
+def _purge(now):
+    # Called with _lock held; drops finished flights whose reuse window has passed.
+    for key in [key for key, flight in _flights.items() if flight.done.is_set() and flight.expires <= now]:
+        del _flights[key]
+
+
+def single_flight(window=0.5, timeout=30.0, name=None):
+    """
+    Coalesces concurrent identical requests to a DRF view handler such as `get`.
+
+    Args:
+        window: Seconds a successful result keeps being shared after it is computed.
+        timeout: Seconds a waiting request waits for the leader before running the handler itself.
+        name: Name used for the key and metrics. Defaults to the handler's qualified name.
+    """
+
+    def decorator(handler):
+        view_name = name or handler.__qualname__
+
+        @functools.wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            key = _flight_key(view_name, view, request)
+            with _lock:
+                now = time.monotonic()
+                flight = _flights.get(key)
+                if flight is not None and flight.done.is_set() and flight.expires <= now:
+                    flight = None
+                leader = flight is None
+                if leader:
+                    _purge(now)
+                    flight = _flights[key] = Flight()
+
+            if not leader:
+                if flight.done.wait(timeout) and flight.result is not None:
+                    metrics.share(view_name)
+                    data, status_code = flight.result
+                    response = Response(data, status=status_code)
+                    response["X-Coalesced"] = "HIT"
+                    return response
+                # The leader failed or is too slow: answer on our own.
+                metrics.run(view_name)
+                return handler(view, request, *args, **kwargs)
+
+            metrics.run(view_name)
+            try:
+                response = handler(view, request, *args, **kwargs)
+                if isinstance(response, Response) and response.status_code == 200:
+                    flight.result = (response.data, response.status_code)
+                    flight.expires = time.monotonic() + window
+            finally:
+                if flight.result is None:
+                    with _lock:
+                        if _flights.get(key) is flight:
+                            del _flights[key]
+                flight.done.set()
+            return response
+
+        return wrapper
+
+    return decorator
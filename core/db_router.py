@@ -0,0 +1,179 @@
+"""
+Primary/replica database routing.
+
+Writes always go to `default`. Reads go to the `replica` alias only inside a replica
+scope: a safe request handled by a view using ReplicaReadMixin, or a `use_replica()`
+block such as an export. Inside a scope, reads fall back to `default` once the scope
+has written anything, and for REPLICA_STICKY_SECONDS after the same organizer last
+wrote, so nobody reads a replica that has not caught up with their own write yet.
+Reads that populate a shared cache run in `use_primary()`, see core.cache, so that a
+lagging replica's rows are never cached under a generation that is already newer.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = "replica"
+STICKY_KEY = "db-primary-sticky:{}"
+
+
+class _Writes:
+    """
+    Whether a request, or a replica scope, has written to the database.
+    """
+
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+# Context variables rather than thread locals, so that the state belongs to one request
+# or scope: it follows async views into sync_to_async, is never inherited by another
+# thread, and a command or thread outside any request records no writes at all.
+_request = ContextVar("db_routing_request", default=None)
+_scope = ContextVar("db_replica_scope", default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _sticky_key(user):
+    if user is None or not user.is_authenticated:
+        return None
+    return STICKY_KEY.format(user.pk)
+
+
+def is_sticky(user):
+    key = _sticky_key(user)
+    return key is not None and cache.get(key) is not None
+
+
+def stick_to_primary(user):
+    key = _sticky_key(user)
+    if key is not None:
+        cache.set(key, True, getattr(settings, "REPLICA_STICKY_SECONDS", 5))
+
+
+@contextmanager
+def use_replica():
+    """
+    Routes reads inside the block to the replica, e.g. for exports, until the block
+    writes. Writes made before the block do not count.
+    """
+    scope = _Writes()
+    token = _scope.set(scope)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+        outer = _scope.get()
+        if outer is not None and scope.wrote:
+            outer.wrote = True
+
+
+@contextmanager
+def use_primary():
+    """
+    Routes reads inside the block to the primary, even within a replica scope.
+    """
+    token = _scope.set(None)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None and not scope.wrote and replica_configured():
+            return REPLICA_ALIAS
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        for writes in (_request.get(), _scope.get()):
+            if writes is not None:
+                writes.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Resets the routing state per request and, when an authenticated organizer's
+    request wrote to the database, pins their reads to the primary for
+    REPLICA_STICKY_SECONDS.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = _Writes()
+        token = _request.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if writes.wrote:
+            stick_to_primary(getattr(request, "user", None))
+        return response
+
+    async def __acall__(self, request):
+        writes = _Writes()
+        token = _request.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        if writes.wrote:
+            # request.user may still have to be loaded, and the cache may be Redis.
+            await sync_to_async(stick_to_primary)(getattr(request, "user", None))
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    DRF view mixin that serves safe requests from the replica.
+
+    The scope is opened in initial(), after authentication, so the user lookup
+    itself stays on the primary and the organizer's sticky window can be checked.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        # initial() opens the scope; this closes it however the request ends.
+        token = _scope.set(_scope.get())
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _scope.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and replica_configured()
+            and not is_sticky(request.user)
+        ):
+            _scope.set(_Writes())
@@ -0,0 +1,72 @@
+"""
+File cache shared between worker processes.
+
+Django's FileBasedCache implements add() and incr() as a read followed by a write, so
+workers racing on a key lose updates: generation bumps, lock keys, attendance counters
+and throttle buckets all rely on them being atomic. FileBasedCache here runs add(),
+incr() and delete() under an exclusive lock on a file in the cache directory, and keeps
+a key's expiry on incr() as Redis does. Reads and set() stay lock free; set() already
+replaces the file with a rename.
+"""
+
+import os
+import pickle
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache.backends import filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.files import locks
+from django.core.files.move import file_move_safe
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    lock_name = "atomic.lock"
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, self.lock_name), "ab") as f:
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(f)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        fname = self._key_to_file(key, version)
+        with self._locked():
+            try:
+                with open(fname, "rb") as f:
+                    expiry = pickle.load(f)
+                    if expiry is None or expiry >= time.time():
+                        value = pickle.loads(zlib.decompress(f.read()))
+                    else:
+                        value = None
+            except FileNotFoundError:
+                value = None
+            if value is None:
+                raise ValueError("Key '%s' not found" % key)
+            value += delta
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+            renamed = False
+            try:
+                with open(fd, "wb") as f:
+                    f.write(pickle.dumps(expiry, self.pickle_protocol))
+                    f.write(zlib.compress(pickle.dumps(value, self.pickle_protocol)))
+                file_move_safe(tmp_path, fname, allow_overwrite=True)
+                renamed = True
+            finally:
+                if not renamed:
+                    os.remove(tmp_path)
+        return value
+
+    def delete(self, key, version=None):
+        with self._locked():
+            return super().delete(key, version)
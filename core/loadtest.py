@@ -0,0 +1,431 @@
+"""
+End-to-end load test of the registration, payment and webhook flows.
+
+LoadTest replays a registration spike against a running server, over HTTP:
+
+- Attendees arrive as a Poisson process at `arrival_rate` per second. Each one
+  registers, opens the payment URL on the Paystack emulator, whose checkout pays and
+  redirects back with the reference while the signed webhook goes to the server, then
+  long-polls the payment status until the webhook has been processed. A share of them
+  submit the form twice out of impatience, and a share of payments are declined and
+  retried. Rejected requests (429, 503) are retried after their Retry-After.
+- Organizers log in and poll the dashboard lists all along.
+
+Every request is timed under its endpoint name, webhooks included. report() gives
+throughput, latency percentiles, status codes and error rates per endpoint as JSON,
+and compare_reports() checks a report against an earlier baseline.
+
+`python manage.py load_test` runs the whole stack locally: a server on a throwaway
+database, the Paystack emulator and SMTPSink in place of the mail server.
+"""
+
+import json
+import random
+import socketserver
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from payments.emulator import parse_latency
+
+REGISTER_PATH = "/dawrah/api/event/register/"
+STATUS_PATH = "/dawrah/api/payments/status/{}/"
+RETRY_PATH = "/dawrah/api/payments/payment-retry/"
+WEBHOOK_PATH = "/dawrah/api/payments/webhook/paystack/"
+TOKEN_PATH = "/dawrah/api/organizers/obtain-token/"
+DASHBOARD_PATHS = {
+    "attendee_list": "/dawrah/api/organizers/attendee-list/",
+    "event_payment_list": "/dawrah/api/payments/event-payments-list/",
+    "donation_list": "/dawrah/api/payments/donation/",
+}
+
+
+def letters(i):
+    # Names are validated as letters only.
+    name = ""
+    while True:
+        i, digit = divmod(i, 26)
+        name = chr(ord("a") + digit) + name
+        if not i:
+            return name.capitalize()
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class Recorder:
+    """
+    Times requests per endpoint name.
+
+    A request counts as an error when it gets no response or a 5xx other than a 503,
+    which admission control sends on purpose and the client retries.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, status_code):
+        with self._lock:
+            self.samples[name].append((seconds, status_code))
+
+    def request(self, session, name, method, url, **kwargs):
+        kwargs.setdefault("timeout", 60)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException:
+            response = None
+        self.add(name, time.perf_counter() - start, response.status_code if response is not None else None)
+        return response
+
+    def report(self, duration):
+        endpoints = {}
+        with self._lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        for name, values in sorted(samples.items()):
+            latencies = [seconds * 1000 for seconds, _ in values]
+            codes = Counter(str(status_code or "none") for _, status_code in values)
+            errors = sum(
+                1 for _, status_code in values if status_code is None or (status_code >= 500 and status_code != 503)
+            )
+            endpoints[name] = {
+                "requests": len(values),
+                "throughput_rps": round(len(values) / duration, 2),
+                "errors": errors,
+                "error_rate": round(errors / len(values), 4),
+                "status_codes": dict(sorted(codes.items())),
+                "latency_ms": {
+                    "mean": round(statistics.mean(latencies), 2),
+                    "p50": round(percentile(latencies, 0.5), 2),
+                    "p90": round(percentile(latencies, 0.9), 2),
+                    "p95": round(percentile(latencies, 0.95), 2),
+                    "p99": round(percentile(latencies, 0.99), 2),
+                    "max": round(max(latencies), 2),
+                },
+            }
+        return endpoints
+
+
+class SMTPSink:
+    """
+    A mail server that accepts every message and keeps only a count, with a delivery
+    latency drawn from `latency` (see parse_latency()).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency="0", seed=None):
+        self.latency = parse_latency(latency, random.Random(seed))
+        self.stats = {"connections": 0, "messages": 0}
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def start(self):
+        threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode() + b"\r\n")
+
+            def handle(self):
+                sink._count("connections")
+                self.reply("220 localhost SMTP sink")
+                for line in self.rfile:
+                    command = line[:4].upper()
+                    if command in (b"HELO", b"EHLO"):
+                        self.reply("250 localhost")
+                    elif command == b"DATA":
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                        for data in self.rfile:
+                            if data == b".\r\n":
+                                break
+                        time.sleep(sink.latency())
+                        sink._count("messages")
+                        self.reply("250 OK")
+                    elif command == b"QUIT":
+                        return self.reply("221 Bye")
+                    else:
+                        self.reply("250 OK")
+
+        return Handler
+
+
+class LoadTest:
+    """
+    Drives attendees and organizers against a server.
+
+    Attributes:
+        base_url (str): The server, e.g. "http://127.0.0.1:8000".
+        paystack (PaystackEmulator): The gateway the server initializes payments with;
+            its webhooks are sent to the server through the recorder.
+        attendees (int): Attendees arriving over the run.
+        arrival_rate (float): Mean arrivals per second.
+        concurrency (int): Attendees in flight at most; later arrivals wait for a slot.
+        organizers (int): Organizers polling the dashboard, logged in with
+            `organizer_email` and `organizer_password`.
+        poll_interval (float): Mean seconds between an organizer's dashboard refreshes.
+        impatient (float): Share of attendees who submit the registration form twice.
+        fail_rate (float): Share of payments declined at checkout and retried.
+        status_wait (int): Seconds each payment status poll asks the server to wait.
+        max_retries (int): Times a rejected (429 or 503) request is tried again.
+        seed (int): Seeds arrivals and attendee behaviour.
+    """
+
+    def __init__(
+        self,
+        base_url,
+        paystack,
+        attendees=200,
+        arrival_rate=20.0,
+        concurrency=64,
+        organizers=2,
+        organizer_email=None,
+        organizer_password=None,
+        poll_interval=2.0,
+        impatient=0.2,
+        fail_rate=0.05,
+        status_wait=10,
+        max_retries=3,
+        seed=0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.paystack = paystack
+        self.attendees = attendees
+        self.arrival_rate = arrival_rate
+        self.concurrency = concurrency
+        self.organizers = organizers if organizer_email else 0
+        self.organizer_email = organizer_email
+        self.organizer_password = organizer_password
+        self.poll_interval = poll_interval
+        self.impatient = impatient
+        self.fail_rate = fail_rate
+        self.status_wait = status_wait
+        self.max_retries = max_retries
+        self.seed = seed
+        self.recorder = Recorder()
+        self.journeys = Counter()
+        self._lock = threading.Lock()
+        self._webhooks = requests.Session()
+        paystack.deliver = self.deliver_webhook
+
+    def url(self, path):
+        return self.base_url + path
+
+    def run(self):
+        """
+        Returns:
+            dict: The report; see Recorder.report() for the per-endpoint figures.
+        """
+        stop = threading.Event()
+        organizers = [
+            threading.Thread(target=self.organizer, args=(i, stop), daemon=True)
+            for i in range(self.organizers)
+        ]
+        for thread in organizers:
+            thread.start()
+        arrivals = random.Random(self.seed)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = []
+            for i in range(self.attendees):
+                futures.append(executor.submit(self.attendee, i))
+                time.sleep(arrivals.expovariate(self.arrival_rate))
+            for future in futures:
+                future.result()
+        duration = time.perf_counter() - start
+        stop.set()
+        for thread in organizers:
+            thread.join()
+        self.wait_for_webhooks()
+        return {
+            "duration_s": round(duration, 2),
+            "attendees": self.attendees,
+            "journeys": dict(sorted(self.journeys.items())),
+            "endpoints": self.recorder.report(duration),
+            "paystack": dict(self.paystack.stats),
+        }
+
+    def wait_for_webhooks(self, timeout=30):
+        # Webhooks of the last checkouts may still be on their way.
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            seen = self.paystack.stats["webhooks"]
+            time.sleep(0.5)
+            if self.paystack.stats["webhooks"] == seen:
+                return
+
+    def deliver_webhook(self, body, headers):
+        response = self.recorder.request(
+            self._webhooks, "webhook", "POST", self.url(WEBHOOK_PATH), data=body, headers=headers
+        )
+        return response.status_code if response is not None else None
+
+    def send(self, session, name, method, path, **kwargs):
+        """
+        Sends a request, and sends it again after its Retry-After while it is rejected.
+        """
+        for attempt in range(self.max_retries + 1):
+            response = self.recorder.request(session, name, method, self.url(path), **kwargs)
+            if response is None or response.status_code not in (429, 503) or attempt == self.max_retries:
+                return response
+            time.sleep(min(float(response.headers.get("Retry-After") or 1), 5))
+
+    # Attendees
+
+    def attendee(self, i):
+        try:
+            outcome = self.attendee_journey(i, random.Random(f"{self.seed}:{i}"))
+        except Exception as e:
+            outcome = f"exception:{type(e).__name__}"
+        with self._lock:
+            self.journeys[outcome] += 1
+
+    def attendee_journey(self, i, rng):
+        session = requests.Session()
+        # Every attendee comes from their own address, as far as the throttles can tell.
+        session.headers["X-Forwarded-For"] = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"
+        form = {
+            "first_name": "Load",
+            "last_name": letters(i),
+            "email": f"loadtest{self.seed}-{i}@example.com",
+            "phone": "08012345678",
+            "department": "Computer Science",
+            "level_of_study": rng.choice([100, 200, 300, 400, 500]),
+            "hall_off_residence": "Mellanby",
+            "level": rng.choice(["beginner", "intermediate", "advanced"]),
+        }
+        response = self.send(session, "register", "POST", REGISTER_PATH, json=form)
+        if response is None or response.status_code in (429, 503) or response.status_code >= 500:
+            return "register_error"
+        if response.status_code == 409:
+            return "full"
+        if response.status_code == 202:
+            return "deferred"
+        if response.status_code != 201:
+            return f"register_{response.status_code}"
+        payment_url = response.json()["payment_url"]
+        if rng.random() < self.impatient:
+            self.send(session, "register_again", "POST", REGISTER_PATH, json=form)
+
+        outcome = "failed" if rng.random() < self.fail_rate else "success"
+        reference = self.checkout(session, payment_url, outcome)
+        if reference is None:
+            return "checkout_error"
+        status = self.wait_for_status(session, reference)
+        if status != "failed":
+            return status or "status_error"
+
+        response = self.send(session, "payment_retry", "POST", RETRY_PATH, json={"reference": reference})
+        if response is None or response.status_code != 200:
+            return "retry_error"
+        reference = self.checkout(session, response.json()["authorization_url"], "success")
+        if reference is None:
+            return "checkout_error"
+        status = self.wait_for_status(session, reference)
+        return f"retried_{status}" if status else "status_error"
+
+    def checkout(self, session, payment_url, outcome):
+        # The customer pays on Paystack and is redirected back with the reference.
+        response = self.recorder.request(
+            session, "checkout", "GET", payment_url, params={"outcome": outcome}, allow_redirects=False
+        )
+        if response is None or response.status_code != 302:
+            return None
+        return parse_qs(urlparse(response.headers["Location"]).query).get("reference", [None])[0]
+
+    def wait_for_status(self, session, reference, polls=6):
+        # The payment-success page long-polls until the webhook has been processed.
+        for _ in range(polls):
+            response = self.send(
+                session, "payment_status", "GET", STATUS_PATH.format(reference),
+                params={"wait": self.status_wait},
+            )
+            if response is None or response.status_code != 200:
+                return None
+            status = response.json()["data"]["status"]
+            if status != "pending":
+                return status
+        return "pending"
+
+    # Organizers
+
+    def organizer(self, i, stop):
+        session = requests.Session()
+        session.headers["X-Forwarded-For"] = f"192.168.0.{i & 255}"
+        rng = random.Random(f"{self.seed}:organizer:{i}")
+        response = self.send(
+            session, "obtain_token", "POST", TOKEN_PATH,
+            json={"email": self.organizer_email, "password": self.organizer_password},
+        )
+        if response is None or response.status_code != 200:
+            return
+        session.headers["Authorization"] = f"Bearer {response.json()['tokens']['access']}"
+        while not stop.is_set():
+            for name, path in DASHBOARD_PATHS.items():
+                self.send(session, name, "GET", path)
+            stop.wait(rng.expovariate(1 / self.poll_interval))
+
+
+def compare_reports(baseline, current, threshold=20.0):
+    """
+    Compares each endpoint of a report with the baseline.
+
+    Returns:
+        tuple: The rows of the comparison, and the endpoints whose p95 latency grew by
+        more than `threshold` percent or whose error rate grew by more than a point.
+    """
+    rows, regressions = [], []
+    for name, now in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        p95_change = (now["latency_ms"]["p95"] - before["latency_ms"]["p95"]) / max(
+            before["latency_ms"]["p95"], 0.01
+        ) * 100
+        throughput_change = (now["throughput_rps"] - before["throughput_rps"]) / max(
+            before["throughput_rps"], 0.01
+        ) * 100
+        error_change = now["error_rate"] - before["error_rate"]
+        row = {
+            "endpoint": name,
+            "p95_ms": [before["latency_ms"]["p95"], now["latency_ms"]["p95"]],
+            "p95_change_pct": round(p95_change, 1),
+            "throughput_change_pct": round(throughput_change, 1),
+            "error_rate": [before["error_rate"], now["error_rate"]],
+        }
+        rows.append(row)
+        if p95_change > threshold or error_change > 0.01:
+            regressions.append(name)
+    return rows, regressions
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
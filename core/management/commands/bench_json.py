@@ -0,0 +1,116 @@
+import io
+import json
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+
+def attendee_rows(count):
+    """
+    Rows shaped like AttendeeSerializer output, where every field is already a string,
+    number or bool.
+    """
+    now = timezone.now()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "dawrah_id": f"SDW-{i:05d}",
+            "first_name": "Aisha",
+            "last_name": "Bello",
+            "email": f"attendee{i}@example.com",
+            "phone": "08012345678",
+            "department": "Computer Science",
+            "level_of_study": 200,
+            "hall_off_residence": "Mellanby",
+            "level": "beginner",
+            "paid": i % 3 != 0,
+            "date_created": (now - timedelta(minutes=i)).isoformat().replace("+00:00", "Z"),
+        }
+        for i in range(count)
+    ]
+
+
+def payment_rows(count):
+    """
+    Rows of raw UUID, Decimal and datetime values, as returned by QuerySet.values().
+    """
+    now = timezone.now()
+    return [
+        {
+            "id": i,
+            "attendee": uuid.uuid4(),
+            "reference": f"REG-{uuid.uuid4().hex[:12]}",
+            "status": "success",
+            "amount": Decimal("2100.00"),
+            "message": None,
+            "paid_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+PAYLOADS = {"attendees": attendee_rows, "payments": payment_rows}
+
+
+def best_of(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares DRF's JSONRenderer and JSONParser with the orjson-backed ORJSONRenderer "
+        "and ORJSONParser on list payloads, and checks both render the same bytes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows per list payload")
+        parser.add_argument("--runs", type=int, default=20, help="Timed runs per case")
+
+    def handle(self, *args, **options):
+        rows, runs = options["rows"], options["runs"]
+        results = {}
+        for name, build in PAYLOADS.items():
+            # Wrapped the way the project's views wrap their data.
+            data = {"success": True, "message": "Data retrieved", "data": build(rows)}
+
+            expected = JSONRenderer().render(data)
+            rendered = ORJSONRenderer().render(data)
+            if rendered != expected:
+                raise CommandError(f"{name}: ORJSONRenderer output differs from JSONRenderer")
+
+            stdlib_render = best_of(lambda: JSONRenderer().render(data), runs)
+            fast_render = best_of(lambda: ORJSONRenderer().render(data), runs)
+            stdlib_parse = best_of(lambda: JSONParser().parse(io.BytesIO(expected)), runs)
+            fast_parse = best_of(lambda: ORJSONParser().parse(io.BytesIO(expected)), runs)
+
+            results[name] = {
+                "rows": rows,
+                "bytes": len(expected),
+                "render_ms": {
+                    "JSONRenderer": round(stdlib_render[1] * 1000, 2),
+                    "ORJSONRenderer": round(fast_render[1] * 1000, 2),
+                    "speedup": round(stdlib_render[1] / fast_render[1], 1),
+                },
+                "parse_ms": {
+                    "JSONParser": round(stdlib_parse[1] * 1000, 2),
+                    "ORJSONParser": round(fast_parse[1] * 1000, 2),
+                    "speedup": round(stdlib_parse[1] / fast_parse[1], 1),
+                },
+            }
+        self.stdout.write(json.dumps(results, indent=2))
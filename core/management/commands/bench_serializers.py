@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.renderers import ORJSONRenderer
+from core.serializers import RowSerializer
+from payments.models import Donation, Donor, EventPayment
+from payments.serializers import DonationSerializer, DonorSerializer, EventPaymentSerializer
+from registration.models import Attendee
+from registration.serializers import AttendeeSerializer
+
+
+def seed(count):
+    attendees = Attendee.objects.bulk_create(
+        Attendee(
+            first_name="Aisha",
+            last_name="Bello",
+            email=f"attendee{i}@example.com",
+            phone="08012345678",
+            department="Computer Science",
+            level_of_study=200,
+            hall_off_residence="Mellanby",
+            level="beginner",
+            paid=True,
+            dawrah_id=f"SDW-{i:05d}",
+        )
+        for i in range(count)
+    )
+    EventPayment.objects.bulk_create(
+        EventPayment(
+            attendee=attendee,
+            reference=f"REG-{uuid.uuid4().hex[:12]}",
+            status="success",
+            amount=Decimal("2100.00"),
+        )
+        for attendee in attendees
+    )
+    donors = Donor.objects.bulk_create(
+        Donor(
+            first_name="Umar",
+            last_name="Sani",
+            email=f"donor{i}@example.com",
+            phone="08012345678",
+            amount=500,
+        )
+        for i in range(count)
+    )
+    Donation.objects.bulk_create(
+        Donation(donor=donor, reference=f"DON-{uuid.uuid4().hex[:12]}", status="success", amount=500)
+        for donor in donors
+    )
+
+
+CASES = {
+    "attendees": (AttendeeSerializer, Attendee.objects.all),
+    "payments": (EventPaymentSerializer, EventPayment.objects.all),
+    "donors": (DonorSerializer, Donor.objects.all),
+    "donations": (DonationSerializer, Donation.objects.all),
+}
+
+
+def median_ms(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares serializing list endpoints' rows with their ModelSerializer and with "
+        "RowSerializer, queries included, against a throwaway in-memory database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Rows per model")
+        parser.add_argument("--runs", type=int, default=5, help="Timed runs per case")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            seed(options["rows"])
+            results = {}
+            for name, (serializer_class, queryset) in CASES.items():
+                row_serializer = RowSerializer(serializer_class)
+
+                def model_serializer():
+                    return serializer_class(queryset(), many=True).data
+
+                def rows():
+                    return row_serializer.to_representation(row_serializer.values(queryset()))
+
+                if ORJSONRenderer().render(rows()) != ORJSONRenderer().render(model_serializer()):
+                    raise CommandError(f"{name}: RowSerializer output differs")
+
+                before = median_ms(model_serializer, options["runs"])
+                after = median_ms(rows, options["runs"])
+                results[name] = {
+                    "rows": options["rows"],
+                    "ModelSerializer_ms": round(before, 1),
+                    "RowSerializer_ms": round(after, 1),
+                    "speedup": round(before / after, 1),
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(json.dumps(results, indent=2))
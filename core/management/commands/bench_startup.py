@@ -0,0 +1,94 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter so every run pays the full import and setup cost.
+CHILD = r"""
+import io
+import json
+import sys
+import time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+from core.wsgi import application
+booted = time.perf_counter()
+
+
+def request(path):
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "wsgi.input": io.BytesIO()}
+    setup_testing_defaults(environ)
+    environ["HTTP_HOST"] = "localhost"
+    status = []
+    body = b"".join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+    return status[0]
+
+
+status = request(sys.argv[1])
+first = time.perf_counter()
+
+requests = int(sys.argv[2])
+loop_start = time.perf_counter()
+for _ in range(requests):
+    request(sys.argv[1])
+loop_end = time.perf_counter()
+
+print(json.dumps({
+    "boot": booted - start,
+    "first_request": first - booted,
+    "per_request": (loop_end - loop_start) / requests if requests else None,
+    "status": status,
+    "modules": len(sys.modules),
+}))
+"""
+
+PROFILES = {
+    "full": {"DEBUG_TOOLBAR": "True", "API_DOCS": "True", "CRONTAB_ENABLED": "True"},
+    "lean": {"DEBUG_TOOLBAR": "False", "API_DOCS": "False", "CRONTAB_ENABLED": "False"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures worker boot time (importing the WSGI app), time to first request and "
+        "per-request cost for the full and lean settings profiles, each in fresh processes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh processes per profile")
+        parser.add_argument("--requests", type=int, default=500, help="Requests timed per process")
+        parser.add_argument(
+            "--path",
+            default="/dawrah/api/organizers/attendee-list/",
+            help="Path requested; the default is rejected by authentication before any query runs",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile, overrides in PROFILES.items():
+            env = {**os.environ, **overrides, "DEBUG": "False", "PYTHONDONTWRITEBYTECODE": "1"}
+            env.setdefault("DJANGO_SETTINGS_MODULE", os.environ.get("DJANGO_SETTINGS_MODULE", "core.settings"))
+            runs = []
+            for _ in range(options["runs"]):
+                completed = subprocess.run(
+                    [sys.executable, "-c", CHILD, options["path"], str(options["requests"])],
+                    cwd=settings.BASE_DIR,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            results[profile] = {
+                "boot_ms": round(statistics.median(r["boot"] for r in runs) * 1000, 1),
+                "first_request_ms": round(statistics.median(r["first_request"] for r in runs) * 1000, 1),
+                "per_request_us": round(statistics.median(r["per_request"] for r in runs) * 1e6, 1),
+                "modules": runs[0]["modules"],
+                "status": runs[0]["status"],
+            }
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import build_schema, schema_dir
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema once into a versioned, gzipped file served by /dawrah/api/schema/"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=5,
+            help="Number of previous builds to keep",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.API_DOCS:
+            raise CommandError("API_DOCS is off, so the schema is neither built nor served.")
+        start = time.perf_counter()
+        build = build_schema(keep=options["keep"])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Built schema {build['version']} into {schema_dir() / build['file']} "
+                f"({build['size'] / 1024:.0f} KB, {build['gzipped_size'] / 1024:.0f} KB gzipped) "
+                f"in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import SyntheticData
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic attendees, payments, donors and organizers "
+        "for performance work; no real person's data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attendees", type=int, default=100000)
+        parser.add_argument("--donors", type=int, default=None, help="One per 20 attendees by default")
+        parser.add_argument("--users", type=int, default=20, help="Organizer accounts")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows per bulk insert")
+        parser.add_argument("--password", default="password", help="Password of the organizer accounts")
+
+    def handle(self, *args, **options):
+        donors = options["donors"] if options["donors"] is not None else options["attendees"] // 20
+        if min(options["attendees"], donors, options["users"]) < 0 or options["chunk_size"] < 1:
+            raise CommandError("Counts cannot be negative and the chunk size must be positive")
+        start = time.perf_counter()
+        counts = SyntheticData(
+            seed=options["seed"], chunk_size=options["chunk_size"], password=options["password"]
+        ).generate(attendees=options["attendees"], donors=donors, users=options["users"])
+        elapsed = time.perf_counter() - start
+        summary = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Generated {summary} in {elapsed:.1f}s"))
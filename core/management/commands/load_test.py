@@ -0,0 +1,211 @@
+import json
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import LoadTest, SMTPSink, compare_reports, load_report
+from payments.emulator import PaystackEmulator
+
+ORGANIZER_EMAIL = "loadtest@example.com"
+ORGANIZER_PASSWORD = "load-test-password"
+
+CREATE_ORGANIZER = (
+    "from organizers.models import User; "
+    f"User.objects.create_superuser({ORGANIZER_EMAIL!r}, {ORGANIZER_PASSWORD!r}, "
+    "first_name='Load', last_name='Test')"
+)
+
+
+# The production server, see core/asgi.py.
+SERVER_COMMAND = (
+    "{python} -m uvicorn core.asgi:application --host {host} --port {port} --no-access-log"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test registration, payment and webhook flows end to end, and report "
+        "throughput, latency percentiles and error rates per endpoint as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--attendees", type=int, default=200)
+        parser.add_argument("--arrival-rate", type=float, default=20.0, help="Mean attendees per second")
+        parser.add_argument("--concurrency", type=int, default=64, help="Attendees in flight at most")
+        parser.add_argument("--organizers", type=int, default=2)
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Dashboard refresh, seconds")
+        parser.add_argument("--impatient", type=float, default=0.2, help="Share submitting twice")
+        parser.add_argument("--fail-rate", type=float, default=0.05, help="Share of declined payments")
+        parser.add_argument("--status-wait", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--paystack-latency", default="lognormal:0.3:0.5", help="Paystack API latency, e.g. 0.2"
+        )
+        parser.add_argument("--paystack-error-rate", type=float, default=0.0)
+        parser.add_argument("--duplicate-rate", type=float, default=0.05, help="Webhooks sent twice")
+        parser.add_argument("--webhook-latency", default="uniform:0.1:1", help="Checkout to webhook")
+        parser.add_argument("--smtp-latency", default="uniform:0.05:0.3", help="Mail delivery latency")
+        parser.add_argument(
+            "--server-command",
+            default=SERVER_COMMAND,
+            help="Command serving the app on {host} and {port}, or {address} (host:port), "
+            f"with {{python}} the current interpreter; by default '{SERVER_COMMAND}'",
+        )
+        parser.add_argument(
+            "--env", action="append", default=[], metavar="KEY=VALUE", help="Extra server settings"
+        )
+        parser.add_argument(
+            "--base-url",
+            default=None,
+            help="Test a server that is already running instead; it must use the Paystack "
+            "emulator started on --paystack-port",
+        )
+        parser.add_argument("--paystack-port", type=int, default=0)
+        parser.add_argument("--organizer-email", default=ORGANIZER_EMAIL)
+        parser.add_argument("--organizer-password", default=ORGANIZER_PASSWORD)
+        parser.add_argument("--output", default=None, help="Also write the report to this file")
+        parser.add_argument("--compare", default=None, help="A baseline report to compare against")
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=20.0,
+            help="Exit with an error when a p95 latency grew by more than this percent",
+        )
+
+    def handle(self, *args, **options):
+        with ExitStack() as stack:
+            paystack = PaystackEmulator(
+                latency=options["paystack_latency"],
+                error_rate=options["paystack_error_rate"],
+                duplicate_rate=options["duplicate_rate"],
+                webhook_latency=options["webhook_latency"],
+                webhook_retries=3,
+                seed=options["seed"],
+                port=options["paystack_port"],
+            ).start()
+            stack.callback(paystack.stop)
+            smtp = None
+            base_url = options["base_url"]
+            if base_url is None:
+                smtp = SMTPSink(latency=options["smtp_latency"], seed=options["seed"]).start()
+                stack.callback(smtp.stop)
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+                base_url = self.start_server(stack, directory, paystack, smtp, options)
+
+            self.stderr.write(f"Load testing {base_url} with Paystack emulated at {paystack.base_url}")
+            report = LoadTest(
+                base_url,
+                paystack,
+                attendees=options["attendees"],
+                arrival_rate=options["arrival_rate"],
+                concurrency=options["concurrency"],
+                organizers=options["organizers"],
+                organizer_email=options["organizer_email"],
+                organizer_password=options["organizer_password"],
+                poll_interval=options["poll_interval"],
+                impatient=options["impatient"],
+                fail_rate=options["fail_rate"],
+                status_wait=options["status_wait"],
+                seed=options["seed"],
+            ).run()
+            if smtp is not None:
+                report["smtp"] = dict(smtp.stats)
+
+        report["options"] = {
+            key: options[key]
+            for key in (
+                "attendees", "arrival_rate", "concurrency", "organizers", "impatient", "fail_rate",
+                "paystack_latency", "paystack_error_rate", "duplicate_rate", "server_command", "env",
+            )
+        }
+        self.stdout.write(json.dumps(report, indent=2))
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        if options["compare"]:
+            rows, regressions = compare_reports(
+                load_report(options["compare"]), report, options["max_regression"]
+            )
+            self.stdout.write(json.dumps({"comparison": rows, "regressions": regressions}, indent=2))
+            if regressions:
+                raise CommandError(f"Regressed against {options['compare']}: {', '.join(regressions)}")
+
+    def start_server(self, stack, directory, paystack, smtp, options):
+        """
+        Migrates a throwaway database and serves the app on it, with Paystack and mail
+        pointing at the stand-ins.
+
+        Returns:
+            str: The server's base URL.
+        """
+        host, port = "127.0.0.1", free_port()
+        address = f"{host}:{port}"
+        smtp_host, smtp_port = smtp.address
+        env = dict(
+            os.environ,
+            DEBUG="False",
+            DEBUG_TOOLBAR="False",
+            SQLITE_PRODUCTION="True",
+            DB_NAME=os.path.join(directory, "loadtest.sqlite3"),
+            DB_REPLICA_NAME="",
+            CACHE_LOCATION=os.path.join(directory, "cache"),
+            PAYSTACK_BASE_URL=paystack.base_url,
+            PAYSTACK_SECRET_KEY=paystack.secret_key,
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST=smtp_host,
+            EMAIL_PORT=str(smtp_port),
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+            EMAIL_USE_TLS="False",
+            PROFILE_SAMPLE_RATE="0",
+        )
+        for item in options["env"]:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"--env expects KEY=VALUE, got '{item}'")
+            env[key] = value
+
+        manage = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+        for command in (["migrate", "--noinput"], ["shell", "-c", CREATE_ORGANIZER]):
+            result = subprocess.run(manage + command, env=env, capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(f"{' '.join(command[:1])} failed:\n{result.stderr}")
+
+        command = shlex.split(
+            options["server_command"].format(
+                python=shlex.quote(sys.executable), host=host, port=port, address=address
+            )
+        )
+        server = subprocess.Popen(
+            command, env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        stack.callback(server.wait)
+        stack.callback(server.terminate)
+
+        base_url = f"http://{address}"
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"The server exited with {server.returncode}")
+            try:
+                requests.get(base_url + "/dawrah/api/event/register/capacity/", timeout=1)
+                return base_url
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise CommandError(f"The server did not answer on {address}")
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_router import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = "Copy the default SQLite database into the replica file for local replica testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep copying every INTERVAL seconds instead of copying once.",
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise CommandError("No replica database configured. Set DB_REPLICA_NAME.")
+        primary = settings.DATABASES["default"]
+        replica = settings.DATABASES[REPLICA_ALIAS]
+        if "sqlite" not in primary["ENGINE"] or "sqlite" not in replica["ENGINE"]:
+            raise CommandError(
+                "sync_replica only copies SQLite files; use the database's own replication otherwise."
+            )
+
+        while True:
+            start = time.perf_counter()
+            source = sqlite3.connect(primary["NAME"])
+            target = sqlite3.connect(replica["NAME"])
+            try:
+                # The online backup API copies a consistent snapshot while both stay in use.
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Replica synced in {(time.perf_counter() - start) * 1000:.0f}ms"
+                )
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,212 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware profiles a request when either:
+
+- it is sampled, with probability PROFILE_SAMPLE_RATE (0 disables sampling), or
+- a staff user sends the PROFILE_HEADER header, "X-Profile: 1" by default.
+
+The header value picks the profiler. "cprofile" (also "1") runs cProfile and stores a
+pstats file, readable with `python -m pstats`, snakeviz or flameprof. "sample" runs a
+stack sampler and stores collapsed stacks, readable with flamegraph.pl or speedscope.
+Sampled requests use PROFILE_MODE.
+
+Profiles are written to PROFILE_DIR, keeping the newest PROFILE_KEEP, and the name of
+the file is returned in the X-Profile-Id response header so it can be downloaded from
+/dawrah/api/profiles/<name>/. An unprofiled request only pays for a header lookup and,
+when sampling is enabled, one random number.
+
+Under ASGI both profilers watch the event loop's thread while the request runs: its
+async code, and whatever other requests run on the loop meanwhile, but not the sync
+code it runs on other threads through sync_to_async.
+"""
+
+import cProfile
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+PROFILERS = {"1": "cprofile", "cprofile": "cprofile", "sample": "sample"}
+EXTENSIONS = {"cprofile": ".prof", "sample": ".collapsed"}
+
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(prof|collapsed)$")
+
+
+def profile_dir():
+    return Path(getattr(settings, "PROFILE_DIR", settings.BASE_DIR / "profiles"))
+
+
+def list_profiles():
+    """
+    Returns the stored profiles, newest first.
+    """
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    paths = [path for path in directory.iterdir() if PROFILE_NAME.match(path.name)]
+    return sorted(paths, key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def get_profile_path(name):
+    """
+    Returns the path of a stored profile, or None if there is no such profile.
+    """
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def _prune(keep):
+    for path in list_profiles()[keep:]:
+        path.unlink(missing_ok=True)
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread from a background thread every `interval` seconds
+    and counts the samples per stack, root first, in the collapsed stack format.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+        self.header = "HTTP_" + getattr(settings, "PROFILE_HEADER", "X-Profile").upper().replace("-", "_")
+        self.mode = getattr(settings, "PROFILE_MODE", "cprofile")
+        self.keep = getattr(settings, "PROFILE_KEEP", 100)
+        self._profiling_loop = False
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = self._requested_mode(request)
+        if mode is None or not self._is_staff(request):
+            mode = self._sampled_mode()
+        if mode is None:
+            return self.get_response(request)
+
+        profiler = self._start(mode)
+        try:
+            response = self.get_response(request)
+        finally:
+            self._stop(profiler)
+
+        response["X-Profile-Id"] = self._save(request, mode, profiler)
+        return response
+
+    async def __acall__(self, request):
+        mode = self._requested_mode(request)
+        # The staff check and saving the profile touch the database and disk, off the loop.
+        if mode is None or not await sync_to_async(self._is_staff)(request):
+            mode = self._sampled_mode()
+        # One profile at a time, since each would watch the same thread.
+        if mode is None or self._profiling_loop:
+            return await self.get_response(request)
+
+        self._profiling_loop = True
+        profiler = self._start(mode)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._stop(profiler)
+            self._profiling_loop = False
+
+        response["X-Profile-Id"] = await sync_to_async(self._save)(request, mode, profiler)
+        return response
+
+    def _requested_mode(self, request):
+        value = request.META.get(self.header)
+        return PROFILERS.get(value.lower()) if value is not None else None
+
+    def _sampled_mode(self):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    @staticmethod
+    def _start(mode):
+        if mode == "sample":
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    @staticmethod
+    def _stop(profiler):
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+        else:
+            profiler.disable()
+
+    @staticmethod
+    def _is_staff(request):
+        # API clients authenticate with JWT, which DRF only resolves inside the view.
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except Exception:
+            return False
+        return result is not None and result[0].is_staff
+
+    def _save(self, request, mode, profiler):
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r"[^\w]+", "-", request.path).strip("-")[:60] or "root"
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method.lower()}-{slug}-"
+            f"{uuid.uuid4().hex[:6]}{EXTENSIONS[mode]}"
+        )
+        if mode == "sample":
+            profiler.dump(directory / name)
+        else:
+            profiler.dump_stats(directory / name)
+        _prune(self.keep)
+        return name
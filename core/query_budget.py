@@ -0,0 +1,148 @@
+"""
+Query budgets for views.
+
+A view declares the most queries a single request to it may run, for every method with
+the `query_budget` class attribute, or for one handler with the @limit_queries decorator:
+
+    class AttendeeListView(generics.ListAPIView):
+        query_budget = 3
+
+        @limit_queries(2)
+        def get(self, request, *args, **kwargs):
+            ...
+
+A budget covers the whole request, authentication included. In DEBUG,
+QueryBudgetMiddleware logs a warning with the SQL of every request that runs over its
+budget; in tests, core.testing.QueryBudgetTestCase asserts the budget of every route.
+"""
+
+import logging
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+# The QueryLogs open in this context. A context variable, so that a log opened by async
+# code also records the queries its sync_to_async calls run on other threads.
+_logs = ContextVar("query_logs", default=())
+
+
+def limit_queries(limit):
+    """
+    Sets the query budget of a view class or of a single handler method.
+    """
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def get_query_budget(view_func, method):
+    """
+    Returns the query budget of a resolved view for the given HTTP method, or None
+    when the view declares none.
+    """
+    view_class = getattr(view_func, "view_class", None)
+    if view_class is None:
+        return getattr(view_func, "query_budget", None)
+    handler = getattr(view_class, method.lower(), None)
+    budget = getattr(handler, "query_budget", None)
+    if budget is None:
+        budget = getattr(view_class, "query_budget", None)
+    return budget
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection, see CoreConfig.ready(): records the query in
+    the open QueryLogs.
+    """
+    for log in _logs.get():
+        log.queries.append(sql)
+    return execute(sql, params, many, context)
+
+
+def watch_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver installing record_queries() on the connection, once.
+    """
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_queries)
+
+
+class QueryLog:
+    """
+    Records the SQL run on every database connection inside the block, by this thread
+    or, from async code, by its sync_to_async calls.
+
+    Example:
+        with QueryLog() as log:
+            client.get(url)
+        assert len(log) <= 3
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _logs.set(_logs.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info):
+        _logs.reset(self._token)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def format(self):
+        return "\n".join(f"{i}. {sql}" for i, sql in enumerate(self.queries, start=1))
+
+
+class QueryBudgetMiddleware:
+    """
+    Logs a warning, with the offending SQL, when a request runs more queries than its
+    view's budget. Only active in DEBUG.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryLog() as log:
+            response = self.get_response(request)
+        return self.check_budget(request, response, log)
+
+    async def __acall__(self, request):
+        with QueryLog() as log:
+            response = await self.get_response(request)
+        return self.check_budget(request, response, log)
+
+    @staticmethod
+    def check_budget(request, response, log):
+        match = getattr(request, "resolver_match", None)
+        budget = get_query_budget(match.func, request.method) if match else None
+        if budget is not None and len(log) > budget:
+            logger.warning(
+                "%s %s ran %s queries, over its budget of %s:\n%s",
+                request.method,
+                request.path,
+                len(log),
+                budget,
+                log.format(),
+            )
+        return response
@@ -0,0 +1,102 @@
+"""
+Prebuilt OpenAPI schema.
+
+Generating the schema introspects every view and serializer, so it is done once at
+deploy time with `python manage.py build_openapi_schema` instead of on every request.
+The command writes the schema as gzipped JSON named after a hash of its content, e.g.
+openapi-1a2b3c4d5e6f.json.gz, plus a `current` file naming the latest build, into
+OPENAPI_SCHEMA_DIR. core.schema_views.SchemaView serves it; without a build it generates the
+schema live in DEBUG and returns 404 otherwise.
+"""
+
+import functools
+import gzip
+import hashlib
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.functional import cached_property
+
+POINTER_FILE = "current"
+SCHEMA_FILE = re.compile(r"^openapi-[0-9a-f]{12}\.json\.gz$")
+
+
+def schema_dir():
+    return Path(getattr(settings, "OPENAPI_SCHEMA_DIR", settings.BASE_DIR / "openapi"))
+
+
+class PrebuiltSchema:
+    def __init__(self, version, gzipped):
+        self.version = version
+        self.gzipped = gzipped
+
+    @cached_property
+    def json(self):
+        # Only decompressed for the rare client that does not accept gzip.
+        return gzip.decompress(self.gzipped)
+
+
+def generate_schema():
+    """
+    Generates the OpenAPI schema and returns it as compact JSON bytes.
+    """
+    from drf_spectacular.generators import SchemaGenerator
+    from rest_framework.renderers import JSONRenderer
+
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return JSONRenderer().render(schema)
+
+
+def build_schema(keep=5):
+    """
+    Generates the schema, writes it to OPENAPI_SCHEMA_DIR and makes it the current build.
+    Older builds beyond `keep` are deleted.
+
+    Returns:
+        dict: The version, the file name and the raw and gzipped sizes in bytes.
+    """
+    data = generate_schema()
+    version = hashlib.sha256(data).hexdigest()[:12]
+    name = f"openapi-{version}.json.gz"
+    # mtime=0 keeps the gzip output identical for identical schemas.
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+
+    directory = schema_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_bytes(gzipped)
+    pointer = directory / f"{POINTER_FILE}.tmp"
+    pointer.write_text(name)
+    os.replace(pointer, directory / POINTER_FILE)
+
+    builds = sorted(
+        (path for path in directory.iterdir() if SCHEMA_FILE.match(path.name)),
+        key=lambda path: path.stat().st_mtime,
+        reverse=True,
+    )
+    for path in builds[keep:]:
+        if path.name != name:
+            path.unlink(missing_ok=True)
+
+    load_prebuilt_schema.cache_clear()
+    return {"version": version, "file": name, "size": len(data), "gzipped_size": len(gzipped)}
+
+
+@functools.lru_cache(maxsize=None)
+def load_prebuilt_schema():
+    """
+    Returns the current PrebuiltSchema, read once per process, or None without a build.
+    """
+    directory = schema_dir()
+    try:
+        name = (directory / POINTER_FILE).read_text().strip()
+    except FileNotFoundError:
+        return None
+    if not SCHEMA_FILE.match(name):
+        return None
+    try:
+        gzipped = (directory / name).read_bytes()
+    except FileNotFoundError:
+        return None
+    return PrebuiltSchema(name[len("openapi-") : -len(".json.gz")], gzipped)
@@ -0,0 +1,88 @@
+"""
+Views serving the prebuilt OpenAPI schema and the documentation pages that read it.
+Only imported when API_DOCS is enabled, see core/urls.py.
+"""
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+
+from rest_framework import status
+
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import (
+    SpectacularAPIView,
+    SpectacularRedocView,
+    SpectacularSwaggerView,
+)
+
+from .schema import load_prebuilt_schema
+
+SCHEMA_CONTENT_TYPE = "application/vnd.oai.openapi+json"
+
+
+@extend_schema(exclude=True)
+class SchemaView(SpectacularAPIView):
+    """
+    Serves the schema built by `manage.py build_openapi_schema`.
+
+    /dawrah/api/schema/<version>.json never changes and is cached for a year, while
+    /dawrah/api/schema/ follows the current build and is revalidated by ETag.
+    Without a build the schema is generated live in DEBUG and is a 404 otherwise.
+    """
+
+    query_budget = 1
+
+    def get(self, request, version=None, *args, **kwargs):
+        prebuilt = load_prebuilt_schema()
+        if prebuilt is None:
+            if settings.DEBUG:
+                return super().get(request, *args, **kwargs)
+            raise Http404("Schema not built. Run `python manage.py build_openapi_schema`.")
+        if version is not None and version != prebuilt.version:
+            raise Http404("Schema version not found.")
+
+        etag = f'"{prebuilt.version}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        elif "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(prebuilt.gzipped, content_type=SCHEMA_CONTENT_TYPE)
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(prebuilt.json, content_type=SCHEMA_CONTENT_TYPE)
+        response["ETag"] = etag
+        response["Vary"] = "Accept-Encoding"
+        if version is not None:
+            response["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response["Cache-Control"] = "public, max-age=300"
+        return response
+
+
+class PrebuiltSchemaUrlMixin:
+    """
+    Points a documentation page at the immutable URL of the current schema build, so
+    browsers cache the schema for good and only refetch the page itself.
+    """
+
+    query_budget = 1
+
+    def _get_schema_url(self, request):
+        prebuilt = load_prebuilt_schema()
+        if prebuilt is None:
+            return super()._get_schema_url(request)
+        return reverse("schema-version", kwargs={"version": prebuilt.version})
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if load_prebuilt_schema() is not None and response.status_code == 200:
+            response["Cache-Control"] = "public, max-age=3600"
+        return response
+
+
+class SchemaSwaggerView(PrebuiltSchemaUrlMixin, SpectacularSwaggerView):
+    pass
+
+
+class SchemaRedocView(PrebuiltSchemaUrlMixin, SpectacularRedocView):
+    pass
@@ -0,0 +1,111 @@
+"""
+Read-path serializers for list endpoints.
+
+A ModelSerializer with many=True loads a model instance per row and then walks every
+field of the serializer for it. For plain columns that is pure overhead: the value from
+the database is already what the field would return. RowSerializer takes the fields of
+an existing serializer, reads their columns with QuerySet.values_list() and only calls
+to_representation for fields that actually change the value, such as DecimalField and
+DateTimeField, so the output is exactly the serializer's.
+
+Example:
+    class AttendeeListView(generics.ListAPIView):
+        serializer_class = AttendeeSerializer
+        row_serializer = RowSerializer(AttendeeSerializer)
+
+        def get(self, request, *args, **kwargs):
+            rows = self.row_serializer.values(self.get_queryset())
+            return Response(self.row_serializer.to_representation(rows))
+"""
+
+import copy
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import cached_property
+
+from rest_framework import serializers
+
+
+def is_passthrough(field):
+    """
+    Whether the field's to_representation returns a value read from a column of the
+    matching model field type unchanged.
+    """
+    if isinstance(field, (serializers.CharField, serializers.IntegerField)):
+        return True
+    if type(field) is serializers.PrimaryKeyRelatedField:
+        return field.pk_field is None
+    return type(field) in (serializers.BooleanField, serializers.ChoiceField)
+
+
+class RowSerializer:
+    """
+    Read-only list serializer over QuerySet.values_list() rows.
+
+    Attributes:
+        serializer_class: The serializer whose readable fields, field order and output
+            are reproduced. Its fields must map to columns of the model, so method
+            fields, nested serializers and dotted sources are not supported.
+
+    Methods:
+        values(queryset): Returns the queryset as values_list() rows of the serializer's columns.
+        to_representation(rows): Returns the rows as a list of dicts, as serializer.data would.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def _fields(self):
+        # Built on first use, after the app registry is ready.
+        fields = [field for field in self.serializer_class().fields.values() if not field.write_only]
+        for field in fields:
+            if (
+                field.source == "*"
+                or "." in field.source
+                or isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField))
+            ):
+                raise ImproperlyConfigured(
+                    f"{self.serializer_class.__name__}.{field.field_name} does not map to a column"
+                )
+        return fields
+
+    @cached_property
+    def columns(self):
+        return [field.source for field in self._fields]
+
+    @cached_property
+    def names(self):
+        return [field.field_name for field in self._fields]
+
+    @cached_property
+    def converted_fields(self):
+        return [field for field in self._fields if not is_passthrough(field)]
+
+    def get_converters(self):
+        converters = []
+        for field in self.converted_fields:
+            if isinstance(field, serializers.DateTimeField) and not hasattr(field, "timezone"):
+                # DateTimeField looks the current timezone up for every value; it can't
+                # change within one call, so resolve it once on a copy of the field.
+                field = copy.copy(field)
+                field.timezone = field.default_timezone()
+            converters.append((field.field_name, field.to_representation))
+        return converters
+
+    def values(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def to_representation(self, rows):
+        names = self.names
+        converters = self.get_converters()
+        data = []
+        for row in rows:
+            item = dict(zip(names, row))
+            for name, convert in converters:
+                value = item[name]
+                # Serializer.to_representation skips the field for None as well.
+                if value is not None:
+                    item[name] = convert(value)
+            data.append(item)
+        return data
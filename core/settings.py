@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,25 +47,39 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
 
     # my apps
+    "core.apps.CoreConfig",
     "registration.apps.RegistrationConfig",
     "organizers.apps.OrganizersConfig",
     "payments.apps.PaymentsConfig",
+    "checkin.apps.CheckinConfig",
 
     # Third Party Apps
     "rest_framework",
-    "drf_spectacular",
-    "drf_yasg",
     "whitenoise.runserver_nostatic",
     "corsheaders",
-    'debug_toolbar',
-    'django_crontab',
 ]
 
+# Optional tooling. Each of these costs boot time, and the toolbar per-request time
+# too, so production only loads what it uses. Measure with `manage.py bench_startup`.
+DEBUG_TOOLBAR = config("DEBUG_TOOLBAR", default=DEBUG, cast=bool)
+API_DOCS = config("API_DOCS", default=DEBUG, cast=bool)
+CRONTAB_ENABLED = config("CRONTAB_ENABLED", default=False, cast=bool)
+
+if API_DOCS:
+    INSTALLED_APPS.append("drf_spectacular")
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append("debug_toolbar")
+if CRONTAB_ENABLED:
+    INSTALLED_APPS.append("django_crontab")
+
 MIDDLEWARE = [
+    "core.profiling.ProfilingMiddleware",
+    "core.timing.RequestTimingMiddleware",
+    "core.query_budget.QueryBudgetMiddleware",
+    "core.admission.AdmissionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    "core.static.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -73,6 +88,15 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Every middleware is async capable, so ASGI workers run async views on their event
+# loop. The toolbar is not: with it, the middleware above it and the views below it run
+# through threads, as under WSGI.
+if DEBUG_TOOLBAR:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("core.static.WhiteNoiseMiddleware") + 1,
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
@@ -100,10 +124,53 @@ WSGI_APPLICATION = "core.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": config("DB_NAME", default=str(BASE_DIR / "db.sqlite3")),
     }
 }
 
+# Production SQLite profile: WAL, busy timeout, mmap/cache PRAGMAs on every connection,
+# BEGIN IMMEDIATE for atomic blocks and persistent connections. See core/sqlite_backend.
+SQLITE_PRODUCTION = config("SQLITE_PRODUCTION", default=not DEBUG, cast=bool)
+
+if SQLITE_PRODUCTION:
+    DATABASES["default"].update(
+        {
+            "ENGINE": "core.sqlite_backend",
+            "CONN_MAX_AGE": config("CONN_MAX_AGE", default=600, cast=int),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Seconds the sqlite3 module waits on a locked database.
+                "timeout": 20,
+                "pragmas": {
+                    "journal_mode": "WAL",
+                    "synchronous": "NORMAL",
+                    "busy_timeout": 20000,
+                    "mmap_size": 268435456,
+                    "cache_size": -65536,
+                },
+            },
+        }
+    )
+    MIDDLEWARE.insert(3, "core.sqlite_backend.lock_wait.LockWaitMiddleware")
+
+# Read replica. Organizer reads and exports are routed to it by core.db_router;
+# writes, and an organizer's reads for REPLICA_STICKY_SECONDS after they write,
+# stay on default. Locally, point DB_REPLICA_NAME at a second SQLite file kept in
+# step with `python manage.py sync_replica`, or at a local Postgres replica.
+DB_REPLICA_NAME = config("DB_REPLICA_NAME", default="")
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=5, cast=int)
+
+if DB_REPLICA_NAME:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": DB_REPLICA_NAME,
+        "HOST": config("DB_REPLICA_HOST", default=DATABASES["default"].get("HOST", "")),
+        "PORT": config("DB_REPLICA_PORT", default=DATABASES["default"].get("PORT", "")),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["core.db_router.PrimaryReplicaRouter"]
+    MIDDLEWARE.append("core.db_router.PrimaryStickinessMiddleware")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -161,28 +228,45 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
-    "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
-
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
     "EXCEPTION_HANDLER": "core.utils.custom_exception_handler",
+    # orjson-backed drop-ins for DRF's JSONRenderer and JSONParser, see core/renderers.py.
+    # Swap back to the rest_framework classes to compare with `manage.py bench_json`.
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "core.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     # 'SEARCH_PARAM': 'q',
     # 'SEARCH_FIELDS': ['username', 'email'],
-    # 'DEFAULT_THROTTLE_CLASSES': [
-    #     'rest_framework.throttling.AnonRateThrottle',
-    #     'rest_framework.throttling.UserRateThrottle'
-    # ],
-    # 'DEFAULT_THROTTLE_RATES': {
-    #     'anon': '100/hour',
-    #     'user': '1000/hour'
-    # },
+    # Token buckets of the unauthenticated endpoints that send email, hash passwords or
+    # call Paystack, see core/throttling.py. Per IP rates are generous because students
+    # often share a campus network's address; per email rates catch the rest.
+    "DEFAULT_THROTTLE_RATES": {
+        "registration_ip": "120/hour",
+        "registration_email": "10/hour",
+        "login_ip": "120/hour",
+        "login_email": "20/hour",
+        "password_reset_ip": "30/hour",
+        "password_reset_email": "5/hour",
+        "resend_verification_ip": "30/hour",
+        "resend_verification_email": "5/hour",
+    },
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
+if API_DOCS:
+    REST_FRAMEWORK["DEFAULT_SCHEMA_CLASS"] = "drf_spectacular.openapi.AutoSchema"
+
 description = """
 
 # Dawrah API
@@ -266,16 +350,141 @@ EMAIL_USE_TLS = config("EMAIL_USE_TLS", cast=bool)
 
 
 
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-#         'LOCATION': BASE_DIR / "cache",
-#     }
-# }
+# Cache
+# CACHE_BACKEND selects one of the profiles below. "locmem" is per worker process, so
+# cache invalidation, counters and payment statuses would not reach the other workers;
+# it is the default, and allowed, only with DEBUG.
+# "file" is shared through CACHE_LOCATION; core.file_cache locks its add() and incr(),
+# which Django's file cache leaves racing between processes.
+# "redis" needs the redis package and accepts any Redis-compatible server at REDIS_URL,
+# so a local stand-in can take the place of a real Redis.
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem" if DEBUG else "file")
+
+if CACHE_BACKEND == "locmem" and not DEBUG:
+    raise ImproperlyConfigured(
+        'CACHE_BACKEND "locmem" is private to each worker; use "file" or "redis" without DEBUG.'
+    )
+
+CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "dawrah",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "file": {
+        "BACKEND": "core.file_cache.FileBasedCache",
+        "LOCATION": config("CACHE_LOCATION", default=str(BASE_DIR / "cache")),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("REDIS_URL", default="redis://127.0.0.1:6379/0"),
+    },
+}
+
+CACHES = {
+    "default": {
+        **CACHE_BACKENDS[CACHE_BACKEND],
+        "KEY_PREFIX": "dawrah",
+        "TIMEOUT": config("CACHE_TIMEOUT", default=300, cast=int),
+    }
+}
+
+
+# Seconds between flushes of the cached per-session attendance counters
+ATTENDANCE_FLUSH_INTERVAL = config("ATTENDANCE_FLUSH_INTERVAL", default=30, cast=int)
+
+# Seconds before the cached live headcount of a session is seeded again from the database
+ATTENDANCE_LIVE_TIMEOUT = config("ATTENDANCE_LIVE_TIMEOUT", default=300, cast=int)
+
+# Periodic jobs, installed with `python manage.py crontab add` when CRONTAB_ENABLED.
+# They run in a process of their own, so flushing only sees the attendance counters
+# of a shared cache ("file" or "redis"); without django_crontab, run the same
+# commands from the system crontab.
+CRONJOBS = [
+    ("* * * * *", "django.core.management.call_command", ["flush_attendance_counts"]),
+    (
+        "*/15 * * * *",
+        "django.core.management.call_command",
+        ["flush_attendance_counts"],
+        {"reconcile": True},
+    ),
+    ("* * * * *", "django.core.management.call_command", ["release_expired_holds"]),
+    ("* * * * *", "django.core.management.call_command", ["send_deferred_payment_links"]),
+]
+
+# Minutes a registration holds its places while the attendee pays, see registration/capacity.py
+REGISTRATION_HOLD_MINUTES = config("REGISTRATION_HOLD_MINUTES", default=30, cast=int)
+
+# Bump to re-render cached QR tickets after changing how they are drawn
+QR_TICKET_VERSION = 1
+
+# Renders the QR ticket attached to confirmation emails, see registration/utils.py
+TICKET_RENDERER = "checkin.tickets.get_ticket"
+
+# Where `manage.py build_openapi_schema` writes the prebuilt schema served at /dawrah/api/schema/
+OPENAPI_SCHEMA_DIR = config("OPENAPI_SCHEMA_DIR", default=str(BASE_DIR / "openapi"))
+
+# Request profiling, see core/profiling.py. Staff can profile any request by sending
+# PROFILE_HEADER; a PROFILE_SAMPLE_RATE fraction of all requests is profiled too.
+PROFILE_SAMPLE_RATE = config("PROFILE_SAMPLE_RATE", default=0.0, cast=float)
+PROFILE_HEADER = "X-Profile"
+PROFILE_MODE = config("PROFILE_MODE", default="cprofile")
+PROFILE_DIR = config("PROFILE_DIR", default=str(BASE_DIR / "profiles"))
+PROFILE_KEEP = config("PROFILE_KEEP", default=100, cast=int)
+
+# Load shedding per class of traffic, see core/admission.py. Limits are per worker
+# process and sized for 16 threads per worker: the non-webhook classes can hold at most
+# 14 threads between running and queued requests, so webhooks are never starved.
+# payment_status requests long-poll, holding their thread for up to 20 seconds, so
+# they are never queued. Served by ASGI workers, the async views wait for Paystack on the
+# event loop, holding no thread, connection or transaction, and run their queries on one
+# thread shared between them (core.asgi.AsyncViewsHandler). A waiting request costs
+# little more than memory, so async_registration admits 256 per worker; at most
+# PAYSTACK_MAX_CONNECTIONS of them call Paystack at once, the others wait for a
+# connection within PAYSTACK_TIMEOUT.
+ADMISSION_CONTROL = config("ADMISSION_CONTROL", default=True, cast=bool)
+ADMISSION_CLASSES = {
+    "webhook": {"concurrency": 8, "queue": 32, "timeout": 10, "retry_after": 5},
+    "registration": {"concurrency": 4, "queue": 2, "timeout": 2, "retry_after": 3},
+    "auth": {"concurrency": 2, "queue": 1, "timeout": 1, "retry_after": 2},
+    "organizer": {"concurrency": 2, "queue": 1, "timeout": 0.5, "retry_after": 2},
+    "payment_status": {"concurrency": 2, "queue": 0, "timeout": 0, "retry_after": 2},
+    "async_registration": {"concurrency": 256, "queue": 0, "timeout": 0, "retry_after": 3},
+} if ADMISSION_CONTROL else {}
+
+# Requests a throttle bucket can take at once, by "<scope>_<kind>". Defaults to the
+# number of requests in the bucket's rate.
+THROTTLE_BURSTS = {
+    "registration_ip": 30,
+    "registration_email": 3,
+    "login_ip": 30,
+    "login_email": 5,
+    "password_reset_ip": 10,
+    "password_reset_email": 2,
+    "resend_verification_ip": 10,
+    "resend_verification_email": 2,
+}
+
+# Bearer token Prometheus presents to scrape /metrics. Unset, /metrics is DEBUG only.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
 
 
 # Paystack keys
 PAYSTACK_SECRET_KEY = config("PAYSTACK_SECRET_KEY")
+# Point at `manage.py paystack_emulator` to run the payment code offline
+PAYSTACK_BASE_URL = config("PAYSTACK_BASE_URL", default="https://api.paystack.co")
+# Minutes an initialized payment's checkout URL is handed out again instead of
+# initializing a new transaction
+PAYSTACK_AUTHORIZATION_MINUTES = config("PAYSTACK_AUTHORIZATION_MINUTES", default=30, cast=int)
+# Seconds a Paystack call may take before it is abandoned
+PAYSTACK_TIMEOUT = config("PAYSTACK_TIMEOUT", default=10, cast=float)
+# Connections the async views keep open to Paystack, per process, see get_async_client()
+PAYSTACK_MAX_CONNECTIONS = config("PAYSTACK_MAX_CONNECTIONS", default=100, cast=int)
+
+# Outbound calls that fail fast while their service is down, see core/circuit.py
+CIRCUIT_BREAKERS = {
+    "paystack": {"failures": 5, "slow_call": 5, "reset_timeout": 30},
+}
 
 # Frontend Base URL
 FE_URL = config("FE_URL")
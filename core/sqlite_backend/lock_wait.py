@@ -0,0 +1,66 @@
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from core.metrics import Histogram
+
+# Time each request spent waiting on the SQLite write lock, in seconds.
+histogram = Histogram()
+
+
+class _LockWait:
+    __slots__ = ("total", "acquisitions")
+
+    def __init__(self):
+        self.total = 0.0
+        self.acquisitions = 0
+
+
+# The wait of the request being handled, followed into its sync_to_async calls.
+_current = ContextVar("sqlite_lock_wait", default=None)
+
+
+def record(seconds):
+    """
+    Adds time spent acquiring the write lock to the current request's total.
+    """
+    current = _current.get()
+    if current is not None:
+        current.total += seconds
+        current.acquisitions += 1
+
+
+class LockWaitMiddleware:
+    """
+    Observes the total write-lock wait of every request that wrote to the database.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = _LockWait()
+        token = _current.set(current)
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+            if current.acquisitions:
+                histogram.observe(current.total)
+
+    async def __acall__(self, request):
+        current = _LockWait()
+        token = _current.set(current)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current.reset(token)
+            if current.acquisitions:
+                histogram.observe(current.total)
@@ -0,0 +1,38 @@
+"""
+Static files.
+
+WhiteNoise 6.6's middleware is sync only. Under ASGI, Django runs every middleware above
+a sync one through a thread, and calls whatever is below it, async views included,
+through async_to_sync from that thread, so a single sync middleware would cost every
+request a thread. WhiteNoiseMiddleware here also runs async: only requests for a static
+file leave the event loop, the rest go straight on.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise import middleware
+
+
+class WhiteNoiseMiddleware(middleware.WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Looks on disk, in DEBUG.
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
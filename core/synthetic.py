@@ -0,0 +1,290 @@
+"""
+Synthetic data for performance work.
+
+SyntheticData fills the database with attendees, event payments, donors, donations
+and organizer accounts drawn from realistic distributions, so that benchmarks and
+query budgets see production volumes without anyone's personal data:
+
+    python manage.py generate_synthetic_data --attendees 100000 --seed 1
+
+Every field passes the registration serializers: Nigerian phone numbers, names,
+halls and departments of the university, levels of study and class levels in the
+mix registrations come in. Payments follow the lifecycle of init_payment() and the
+Paystack webhook: paid attendees hold a Dawrah ID and a successful payment, some
+after a failed one, and the others have an initialized, failed, expired or deferred
+payment, or none yet.
+
+When capacities are set, paid attendees have a confirmed Hold in each capacity that
+applies to them and attendees with an initialized payment a held one, as long as
+places remain, and the capacities' counters count them.
+
+Rows are inserted in chunks with bulk_create, which runs no model signals, so no
+email is sent and Dawrah IDs are numbered here. What the signals would have done
+otherwise is done once at the end: the cached responses are invalidated and the
+attendee index of this process is rebuilt. The same seed gives the same rows.
+"""
+
+import itertools
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from checkin.index import attendee_index
+from core.cache import invalidate
+from organizers.models import User
+from payments.models import Donation, Donor, EventPayment
+from registration.models import Attendee, Capacity, Hold
+from registration.utils import get_last_id
+
+FIRST_NAMES = [
+    "Abdullahi", "Abdulrahman", "Abubakar", "Aisha", "Aminah", "Azeez", "Balqees",
+    "Fatimah", "Habeeb", "Hafsah", "Ibrahim", "Kabir", "Khadijah", "Lateef", "Maryam",
+    "Muhammad", "Mustapha", "Qudus", "Rofiat", "Ruqayyah", "Sodiq", "Sumayyah",
+    "Umar", "Yusuf", "Zainab", "Zulaykha",
+]
+LAST_NAMES = [
+    "Abdulsalam", "Abubakar", "Adewale", "Adeyemi", "Afolabi", "Ajibola", "Akinola",
+    "Alabi", "Bello", "Ibrahim", "Lawal", "Musa", "Ogunbiyi", "Oladipo", "Olatunji",
+    "Olayemi", "Oyelaran", "Raji", "Salami", "Suleiman", "Yusuf", "Abdulkareem",
+    "Oyewole", "Adebayo", "Okeowo", "Balogun",
+]
+HALLS = {
+    "Mellanby": 10, "Tedder": 10, "Kuti": 8, "Sultan Bello": 12, "Queen Elizabeth II": 9,
+    "Idia": 12, "Independence": 10, "Nnamdi Azikiwe": 12, "Obafemi Awolowo": 14,
+    "Alexander Brown": 4, "Tafawa Balewa": 6, "Abdulsalami Abubakar": 8,
+}
+DEPARTMENTS = {
+    "Computer Science": 8, "Law": 7, "Medicine and Surgery": 8, "Economics": 6,
+    "Arabic and Islamic Studies": 5, "Mechanical Engineering": 5, "Civil Engineering": 4,
+    "Electrical and Electronic Engineering": 5, "Chemistry": 4, "Physics": 3,
+    "Pharmacy": 4, "Nursing": 4, "Microbiology": 4, "Biochemistry": 4, "Statistics": 3,
+    "Mathematics": 3, "Political Science": 4, "Sociology": 3, "Geography": 3,
+    "Agricultural Economics": 3, "English": 3, "Accounting": 4,
+}
+LEVELS_OF_STUDY = {100: 28, 200: 24, 300: 20, 400: 17, 500: 8, 600: 3}
+CLASS_LEVELS = {"beginner": 50, "intermediate": 35, "advanced": 15}
+# Network prefixes after the leading 0.
+PHONE_PREFIXES = [
+    "803", "806", "813", "816", "810", "814", "903", "906", "703", "706", "805", "807",
+    "815", "905", "802", "808", "812", "701", "902", "809", "817", "818", "909", "908",
+]
+EMAIL_DOMAINS = ["example.com", "example.org", "example.net"]
+# What became of each attendee's last payment; None is an attendee who has not paid yet.
+PAYMENT_OUTCOMES = {"success": 70, "initialized": 12, "failed": 8, "expired": 6, "deferred": 2, None: 2}
+# Share of paid attendees whose first payment failed.
+RETRIED = 0.05
+DONATIONS = {1000: 20, 2000: 25, 5000: 30, 10000: 15, 20000: 7, 50000: 3}
+DONATION_OUTCOMES = {"success": 75, "initialized": 15, "failed": 10}
+
+REGISTRATION_FEE = 2100
+
+
+def weighted(table):
+    """
+    Returns:
+        callable: Draws a key of `table` with the probability of its weight, from a rng.
+    """
+    population = list(table)
+    cum_weights = list(itertools.accumulate(table.values()))
+    return lambda rng: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+hall = weighted(HALLS)
+department = weighted(DEPARTMENTS)
+level_of_study = weighted(LEVELS_OF_STUDY)
+class_level = weighted(CLASS_LEVELS)
+payment_outcome = weighted(PAYMENT_OUTCOMES)
+donation_amount = weighted(DONATIONS)
+donation_outcome = weighted(DONATION_OUTCOMES)
+
+
+class SyntheticData:
+    """
+    Generates and inserts synthetic rows.
+
+    Attributes:
+        seed (int): Seeds every choice, for reproducible datasets.
+        chunk_size (int): Rows built and inserted per bulk_create.
+        password (str): Password of every organizer account, hashed once.
+    """
+
+    def __init__(self, seed=0, chunk_size=5000, password="password"):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.password = password
+        self.now = timezone.now()
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def reference(self, prefix="REG"):
+        return f"{prefix}-{int(self.now.timestamp())}-{self.rng.getrandbits(48):012X}"
+
+    def phone(self):
+        number = self.rng.choice(PHONE_PREFIXES) + f"{self.rng.randrange(10 ** 7):07d}"
+        return ("+234" if self.rng.random() < 0.3 else "0") + number
+
+    def person(self, n):
+        first_name, last_name = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        email = f"{first_name}.{last_name}{n}@{self.rng.choice(EMAIL_DOMAINS)}".lower()
+        return {"first_name": first_name, "last_name": last_name, "email": email}
+
+    def chunks(self, count):
+        for start in range(0, count, self.chunk_size):
+            yield range(start, min(start + self.chunk_size, count))
+
+    def generate(self, attendees=0, donors=0, users=0):
+        """
+        Returns:
+            dict: The number of rows inserted per model.
+        """
+        counts = {
+            "attendees": 0, "event_payments": 0, "holds": 0, "donors": 0, "donations": 0, "users": 0,
+        }
+        capacities = list(Capacity.objects.all())
+        remaining = {capacity.pk: capacity.remaining for capacity in capacities}
+        offset = Attendee.objects.count()
+        last_id = get_last_id()
+        next_id = int(last_id.split("-")[1]) + 1 if last_id else self.now.year % 100 * 100 + 1
+        # Dawrah IDs are ordered as strings by get_last_id(), so they share a width.
+        width = max(4, len(str(next_id + attendees)))
+        for chunk in self.chunks(attendees):
+            rows, payments, holds = [], [], []
+            for i in chunk:
+                attendee, attendee_payments = self.attendee(offset + i)
+                if attendee.paid:
+                    attendee.dawrah_id = f"SDW-{str(next_id).zfill(width)}"
+                    next_id += 1
+                rows.append(attendee)
+                payments.extend(attendee_payments)
+                if attendee_payments:
+                    holds.extend(self.holds(attendee, attendee_payments[-1], capacities, remaining))
+            with transaction.atomic():
+                Attendee.objects.bulk_create(rows)
+                EventPayment.objects.bulk_create(payments)
+                Hold.objects.bulk_create(holds)
+                self.count_places(holds)
+            counts["attendees"] += len(rows)
+            counts["event_payments"] += len(payments)
+            counts["holds"] += len(holds)
+
+        offset = Donor.objects.count()
+        for chunk in self.chunks(donors):
+            rows, donations = [], []
+            for i in chunk:
+                donor, donation = self.donor(offset + i)
+                rows.append(donor)
+                donations.append(donation)
+            with transaction.atomic():
+                Donor.objects.bulk_create(rows)
+                for donor, donation in zip(rows, donations):
+                    donation.donor = donor
+                Donation.objects.bulk_create(donations)
+            counts["donors"] += len(rows)
+            counts["donations"] += len(donations)
+
+        offset = User.objects.count()
+        password = make_password(self.password)
+        for chunk in self.chunks(users):
+            rows = [self.user(offset + i, password) for i in chunk]
+            User.objects.bulk_create(rows)
+            counts["users"] += len(rows)
+
+        invalidate("attendees", "payments", "donors", "donations")
+        if counts["attendees"] and attendee_index.warmed:
+            attendee_index.warm()
+        return counts
+
+    def attendee(self, n):
+        outcome = payment_outcome(self.rng)
+        attendee = Attendee(
+            id=self.uuid(),
+            **self.person(n),
+            phone=self.phone(),
+            department=department(self.rng),
+            level_of_study=level_of_study(self.rng),
+            hall_off_residence=hall(self.rng),
+            level=class_level(self.rng),
+            paid=outcome == "success",
+        )
+        if outcome is None:
+            return attendee, []
+        payments = []
+        if outcome == "success" and self.rng.random() < RETRIED:
+            payments.append(self.payment(attendee, "failed"))
+        payments.append(self.payment(attendee, outcome))
+        return attendee, payments
+
+    def payment(self, attendee, status):
+        # Initialized payments are stored in kobo; the webhook stores paid ones in naira.
+        payment = EventPayment(
+            attendee=attendee,
+            reference=self.reference(),
+            status=status,
+            amount=REGISTRATION_FEE if status == "success" else REGISTRATION_FEE * 100,
+        )
+        if status in ("initialized", "expired"):
+            access_code = f"{self.rng.getrandbits(60):015x}"
+            payment.access_code = access_code
+            payment.authorization_url = f"https://checkout.paystack.com/{access_code}"
+            minutes = self.rng.randint(1, 30)
+            payment.expires_at = self.now + timedelta(minutes=minutes if status == "initialized" else -minutes)
+        return payment
+
+    def holds(self, attendee, payment, capacities, remaining):
+        """
+        Returns:
+            list: The attendee's holds: confirmed when paid, held while the payment is
+                initialized, in every capacity that applies to them; none otherwise or
+                if any of those capacities is full.
+        """
+        if payment.status == "success":
+            status, expires_at = Hold.CONFIRMED, self.now
+        elif payment.status == "initialized":
+            status, expires_at = Hold.HELD, payment.expires_at
+        else:
+            return []
+        applicable = [c for c in capacities if c.level in ("", attendee.level)]
+        if any(remaining[capacity.pk] <= 0 for capacity in applicable):
+            return []
+        for capacity in applicable:
+            remaining[capacity.pk] -= 1
+        return [
+            Hold(attendee=attendee, capacity=capacity, status=status, expires_at=expires_at)
+            for capacity in applicable
+        ]
+
+    @staticmethod
+    def count_places(holds):
+        places = {}
+        for hold in holds:
+            held, confirmed = places.get(hold.capacity_id, (0, 0))
+            if hold.status == Hold.CONFIRMED:
+                confirmed += 1
+            else:
+                held += 1
+            places[hold.capacity_id] = (held, confirmed)
+        for capacity_id, (held, confirmed) in places.items():
+            Capacity.objects.filter(pk=capacity_id).update(
+                held=F("held") + held, confirmed=F("confirmed") + confirmed
+            )
+
+    def donor(self, n):
+        status = donation_outcome(self.rng)
+        amount = donation_amount(self.rng)
+        donor = Donor(**self.person(n), phone=self.phone(), amount=amount, donated=status == "success")
+        return donor, Donation(reference=self.reference("DON"), status=status, amount=amount)
+
+    def user(self, n, password):
+        person = self.person(n)
+        return User(
+            **person,
+            password=password,
+            is_verified=self.rng.random() < 0.9,
+            is_staff=self.rng.random() < 0.3,
+        )
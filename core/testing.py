@@ -0,0 +1,120 @@
+"""
+Test helpers shared across apps.
+"""
+
+import re
+
+from django.core.cache import cache
+from django.urls import URLResolver, get_resolver
+
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .query_budget import QueryLog, get_query_budget
+
+PROJECT_APPS = ("core", "registration", "organizers", "payments", "checkin")
+HANDLER_METHODS = ("get", "post", "put", "patch", "delete")
+
+ROUTE_PARAMETER = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+def iter_routes(patterns=None, prefix=""):
+    """
+    Yields (route, URLPattern) for every pattern in the URLconf, with the routes of
+    included URLconfs prefixed, e.g. "dawrah/api/payments/event-payment/<int:pk>/".
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern), pattern
+
+
+def project_routes():
+    """
+    Yields (route, URLPattern) for the class-based views defined in this project.
+    """
+    for route, pattern in iter_routes():
+        view_class = getattr(pattern.callback, "view_class", None)
+        if view_class is not None and view_class.__module__.split(".")[0] in PROJECT_APPS:
+            yield route, pattern
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base class for tests that hold views to their query budgets against seeded data.
+
+    Subclasses seed data in setUpTestData(), authenticate with authenticate(), and set:
+        route_kwargs: URL parameters per route, e.g.
+            {"dawrah/api/payments/event-payment/<int:pk>/": {"pk": 1}}.
+        route_params: Query parameters of the GET per route, e.g. a signed token.
+        post_requests: Keyword arguments of the test client's POST per route, e.g.
+            {"data": {...}, "format": "json"}. POSTs change data, so they are sent after
+            every GET, in the order given.
+        skip_routes: Routes whose GET cannot run in tests, e.g. because it calls an
+            external service. Their views must still declare a budget.
+
+    Requests carry a real JWT, so authentication counts against the budget just as
+    it does in production, and the cache is cleared first so cached responses do not
+    hide the queries behind them.
+    """
+
+    route_kwargs = {}
+    route_params = {}
+    post_requests = {}
+    skip_routes = ()
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def build_url(self, route):
+        kwargs = self.route_kwargs.get(route, {})
+        return "/" + ROUTE_PARAMETER.sub(lambda match: str(kwargs[match.group(1)]), route)
+
+    def assertQueryBudget(self, route, pattern, method="get", data=None, **extra):
+        """
+        Requests the route and asserts it ran no more queries than its view's budget.
+
+        Returns:
+            Response: The response, for further assertions.
+        """
+        budget = get_query_budget(pattern.callback, method)
+        self.assertIsNotNone(budget, f"{route} declares no query budget for {method.upper()}")
+        cache.clear()
+        with QueryLog() as log:
+            response = getattr(self.client, method)(self.build_url(route), data, **extra)
+        self.assertLess(response.status_code, 500, f"{method.upper()} {route} failed")
+        # Savepoints are the test transaction's stand-ins for BEGIN and COMMIT.
+        queries = [sql for sql in log.queries if "SAVEPOINT" not in sql]
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{method.upper()} {route} ran {len(queries)} queries, over its budget of {budget}:\n"
+            f"{log.format()}",
+        )
+        return response
+
+    def assertAllQueryBudgets(self):
+        """
+        Asserts that every project view declares a budget for each method it handles,
+        that a GET to every route that has one stays within it, and so does each POST
+        in post_requests.
+        """
+        routes = dict(project_routes())
+        for route, pattern in routes.items():
+            view_class = pattern.callback.view_class
+            with self.subTest(route=route):
+                for method in HANDLER_METHODS:
+                    if hasattr(view_class, method):
+                        self.assertIsNotNone(
+                            get_query_budget(pattern.callback, method),
+                            f"{view_class.__name__} declares no query budget for {method.upper()}",
+                        )
+                if hasattr(view_class, "get") and route not in self.skip_routes:
+                    self.assertQueryBudget(route, pattern, data=self.route_params.get(route))
+        for route, kwargs in self.post_requests.items():
+            with self.subTest(route=route, method="post"):
+                self.assertQueryBudget(route, routes[route], "post", **kwargs)
@@ -0,0 +1,841 @@
+import asyncio
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection, send_mail
+from django.core.signals import request_started
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
+
+from checkin.index import attendee_index
+from checkin.models import Session
+from checkin.tickets import ticket_token
+from organizers.views import AttendeeListView
+from organizers.models import User
+from payments.emulator import sign
+from payments.models import Donation, Donor, EventPayment
+from payments.views import PaystackWebhookView
+from payments.serializers import DonationSerializer, DonorSerializer, EventPaymentSerializer
+from registration.models import Attendee, Capacity, Hold
+from registration.serializers import AttendeeSerializer
+
+from .admission import AdmissionClass, AdmissionMiddleware, admission_classes
+from .asgi import AsyncViewsHandler, serves_async_view
+from .cache import cache_response, get_generations, metrics
+from .circuit import CircuitBreaker, CircuitOpen
+from .coalesce import single_flight
+from .db_router import PrimaryReplicaRouter, PrimaryStickinessMiddleware, use_primary, use_replica
+from .file_cache import FileBasedCache
+from .loadtest import Recorder, SMTPSink, compare_reports
+from .renderers import ORJSONRenderer
+from .serializers import RowSerializer
+from .synthetic import SyntheticData
+from .testing import QueryBudgetTestCase
+from .throttling import TokenBucket, check_cache_backend
+
+
+class ViewQueryBudgetTests(QueryBudgetTestCase):
+    """
+    Seeds enough rows per model that an N+1 query shows up as a blown budget.
+    """
+
+    ROWS = 25
+
+    skip_routes = (
+        # Both redirect through Google.
+        "dawrah/api/organizers/google-signin/",
+        "dawrah/api/organizers/google-signin-callback/",
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            "admin@example.com", "password", first_name="Admin", last_name="User"
+        )
+        for i in range(cls.ROWS):
+            attendee = Attendee.objects.create(
+                first_name="Aisha",
+                last_name="Bello",
+                email=f"attendee{i}@example.com",
+                phone="08012345678",
+                department="Law",
+                level_of_study=100,
+                hall_off_residence="Mellanby",
+                level="beginner",
+                paid=True,
+                dawrah_id=f"SDW-{i:04d}",
+            )
+            EventPayment.objects.create(
+                attendee=attendee, reference=f"REG-{i}", status="success", amount=1000
+            )
+            donor = Donor.objects.create(
+                first_name="Umar",
+                last_name="Sani",
+                email=f"donor{i}@example.com",
+                phone="08012345678",
+                amount=500,
+            )
+            Donation.objects.create(
+                donor=donor, reference=f"DON-{i}", status="success", amount=500
+            )
+            Session.objects.create(title=f"Session {i}", starts_at=timezone.now())
+            User.objects.create(
+                email=f"organizer{i}@example.com", first_name="Organizer", last_name="User"
+            )
+
+        attendee = Attendee.objects.first()
+        cls.route_kwargs = {
+            "dawrah/api/organizers/verify/<str:token>/": {"token": "invalid"},
+            "dawrah/api/organizers/attendee-list/<str:pk>/": {"pk": attendee.pk},
+            "dawrah/api/organizers/users/<int:pk>/": {"pk": cls.admin.pk},
+            "dawrah/api/payments/event-payment/<int:pk>/": {
+                "pk": EventPayment.objects.first().pk
+            },
+            "dawrah/api/payments/donation/<int:pk>/": {"pk": Donor.objects.first().pk},
+            "dawrah/api/payments/status/<str:reference>/": {"reference": "REG-0"},
+            "dawrah/api/checkin/tickets/<str:dawrah_id>.png": {"dawrah_id": attendee.dawrah_id},
+            "dawrah/api/checkin/tickets/<str:dawrah_id>.svg": {"dawrah_id": attendee.dawrah_id},
+            "dawrah/api/checkin/sessions/<int:pk>/attendance/": {
+                "pk": Session.objects.first().pk
+            },
+            "dawrah/api/checkin/sessions/<int:pk>/headcount/": {
+                "pk": Session.objects.first().pk
+            },
+            "dawrah/api/profiles/<str:name>/": {"name": "missing.prof"},
+            "dawrah/api/schema/<str:version>.json": {"version": "missing"},
+        }
+        cls.route_params = {
+            "dawrah/api/checkin/tickets/<str:dawrah_id>.png": {"token": ticket_token(attendee.dawrah_id)},
+            "dawrah/api/checkin/tickets/<str:dawrah_id>.svg": {"token": ticket_token(attendee.dawrah_id)},
+        }
+
+        # Unpaid registrations for the webhook and the payment retry to settle.
+        for reference, payment_status in (("REG-PENDING", "initialized"), ("REG-FAILED", "failed")):
+            unpaid = Attendee.objects.create(
+                first_name="Umar",
+                last_name="Sani",
+                email=f"{reference.lower()}@example.com",
+                phone="08012345678",
+                department="Law",
+                level_of_study=200,
+                hall_off_residence="Tedder",
+                level="beginner",
+            )
+            EventPayment.objects.create(
+                attendee=unpaid, reference=reference, status=payment_status, amount=2100
+            )
+        dawrah_ids = list(
+            Attendee.objects.filter(paid=True).values_list("dawrah_id", flat=True)
+        )
+        webhook = orjson.dumps(
+            {"event": "charge.success", "data": {"reference": "REG-PENDING", "amount": 210000}}
+        )
+        cls.post_requests = {
+            "dawrah/api/event/register/": {
+                "data": {
+                    "first_name": "Hafsah",
+                    "last_name": "Musa",
+                    "email": "hafsah@example.com",
+                    "phone": "08012345678",
+                    "department": "Law",
+                    "level_of_study": 100,
+                    "hall_off_residence": "Queens",
+                    "level": "beginner",
+                },
+                "format": "json",
+            },
+            "dawrah/api/payments/webhook/paystack/": {
+                "data": webhook,
+                "content_type": "application/json",
+                "HTTP_X_PAYSTACK_SIGNATURE": sign(webhook, settings.PAYSTACK_SECRET_KEY),
+            },
+            "dawrah/api/payments/payment-retry/": {
+                "data": {"reference": "REG-FAILED"},
+                "format": "json",
+            },
+            "dawrah/api/checkin/scan/": {"data": {"dawrah_id": dawrah_ids[0]}, "format": "json"},
+            "dawrah/api/checkin/upload/": {
+                "data": {
+                    "checkins": [
+                        {"dawrah_id": dawrah_id, "checked_in_at": timezone.now().isoformat()}
+                        for dawrah_id in dawrah_ids
+                    ]
+                },
+                "format": "json",
+            },
+            "dawrah/api/checkin/sessions/<int:pk>/attendance/": {
+                "data": {"dawrah_ids": dawrah_ids},
+                "format": "json",
+            },
+        }
+
+    def setUp(self):
+        self.authenticate(self.admin)
+        # Paystack itself is not called; its latency is not what budgets measure.
+        for target in ("registration.views.init_payment", "payments.views.init_payment"):
+            patcher = mock.patch(target, return_value="https://checkout.paystack.com/budget")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_views_stay_within_query_budgets(self):
+        self.assertAllQueryBudgets()
+
+
+class RowSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            attendee = Attendee.objects.create(
+                first_name="Zainab",
+                last_name="O'Neil",
+                email=f"attendee{i}@example.com",
+                phone="08012345678",
+                department="Law",
+                level_of_study=300,
+                hall_off_residence="Mellanby",
+                level="intermediate",
+                paid=bool(i % 2),
+                # One attendee without a dawrah_id, as before payment.
+                dawrah_id=f"SDW-{i:04d}" if i else None,
+            )
+            payment = EventPayment.objects.create(
+                attendee=attendee,
+                reference=f"REG-{i}",
+                status="success",
+                amount=Decimal("2100.5"),
+                message="Approved \u2028 ✓" if i else None,
+            )
+            donor = Donor.objects.create(
+                first_name="Umar",
+                last_name="Sani",
+                email=f"donor{i}@example.com",
+                phone="08012345678",
+                amount=500 + i,
+            )
+            Donation.objects.create(
+                donor=donor, reference=f"DON-{i}", status="failed", amount=Decimal("10")
+            )
+        # DRF keeps microseconds in DateTimeField output.
+        EventPayment.objects.filter(reference="REG-1").update(
+            paid_at=timezone.now().replace(microsecond=123456)
+        )
+
+    def test_output_matches_model_serializers(self):
+        cases = [
+            (AttendeeSerializer, Attendee.objects.all()),
+            (EventPaymentSerializer, EventPayment.objects.order_by("pk")),
+            (DonorSerializer, Donor.objects.order_by("pk")),
+            (DonationSerializer, Donation.objects.order_by("pk")),
+        ]
+        for serializer_class, queryset in cases:
+            with self.subTest(serializer=serializer_class.__name__):
+                row_serializer = RowSerializer(serializer_class)
+                rows = row_serializer.to_representation(row_serializer.values(queryset))
+                expected = serializer_class(queryset, many=True).data
+                self.assertEqual(ORJSONRenderer().render(rows), JSONRenderer().render(expected))
+
+
+class CountingCache:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        return getattr(cache, name)
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.bucket = TokenBucket("test-bucket", interval=10, burst=3)
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.bucket.take(now=1000) for _ in range(3)], [0, 0, 0])
+        self.assertEqual(self.bucket.take(now=1000), 10)
+        # One token back per interval.
+        self.assertEqual(self.bucket.take(now=1020), 0)
+        self.assertGreater(self.bucket.take(now=1020), 0)
+
+    def test_rejection_costs_one_cache_call(self):
+        for _ in range(3):
+            self.bucket.take(now=1000)
+        counting = CountingCache()
+        with mock.patch("core.throttling.cache", counting):
+            self.assertGreater(self.bucket.take(now=1000), 0)
+        self.assertEqual(counting.calls, ["incr"])
+
+    def test_full_again_after_idle(self):
+        for _ in range(3):
+            self.bucket.take(now=1000)
+        self.assertEqual([self.bucket.take(now=1100) for _ in range(3)], [0, 0, 0])
+
+    def test_expired_bucket_forgives_rejected_requests(self):
+        for _ in range(50):
+            self.bucket.take(now=1000)
+        cache.delete("test-bucket")
+        self.assertEqual(self.bucket.take(now=1000), 0)
+
+    def test_non_atomic_cache_backends_are_reported(self):
+        check_cache_backend.cache_clear()
+        self.addCleanup(check_cache_backend.cache_clear)
+        self.assertTrue(check_cache_backend("core.file_cache.FileBasedCache"))
+        with self.assertLogs("core.throttling", "WARNING"):
+            self.assertFalse(
+                check_cache_backend("django.core.cache.backends.filebased.FileBasedCache")
+            )
+
+
+class ThrottledViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_password_reset_is_throttled_per_email(self):
+        url = "/dawrah/api/organizers/request-password-reset/"
+        statuses = [
+            self.client.post(
+                url,
+                {"email": "Someone@Example.com"},
+                content_type="application/json",
+                REMOTE_ADDR=f"10.0.0.{i}",
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertNotEqual(statuses[0], 429)
+        self.assertEqual(statuses[2], 429)
+
+
+class AdmissionClassTests(SimpleTestCase):
+    def test_full_queue_rejects_without_waiting(self):
+        admission_class = AdmissionClass("test", concurrency=1, queue=0, timeout=10)
+        self.assertIsNone(admission_class.acquire())
+        self.assertEqual(admission_class.acquire(), "queue_full")
+        self.assertEqual(admission_class.snapshot()["rejected"]["queue_full"], 1)
+
+    def test_queued_request_times_out(self):
+        admission_class = AdmissionClass("test", concurrency=1, queue=1, timeout=0.01)
+        admission_class.acquire()
+        self.assertEqual(admission_class.acquire(), "timeout")
+
+    def test_queued_request_runs_once_a_slot_frees_up(self):
+        admission_class = AdmissionClass("test", concurrency=1, queue=1, timeout=10)
+        admission_class.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(admission_class.acquire()))
+        waiter.start()
+        while not admission_class.snapshot()["waiting"]:
+            pass
+        admission_class.release()
+        waiter.join()
+        self.assertEqual(results, [None])
+        self.assertEqual(admission_class.snapshot()["active"], 1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def fail(self, breaker):
+        with self.assertRaises(ValueError), breaker.guard():
+            raise ValueError
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        breaker = CircuitBreaker("test", failures=2, reset_timeout=60)
+        self.fail(breaker)
+        with breaker.guard():
+            pass
+        self.fail(breaker)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.fail(breaker)
+        calls = []
+        with self.assertRaises(CircuitOpen), breaker.guard():
+            calls.append(1)
+        self.assertEqual(calls, [])
+        self.assertEqual(breaker.snapshot()["trips"], 1)
+        self.assertEqual(breaker.snapshot()["rejected"], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        breaker = CircuitBreaker("test", failures=1, slow_call=0)
+        with breaker.guard():
+            pass
+        self.assertTrue(breaker.is_open)
+
+    def test_single_trial_call_after_reset_timeout(self):
+        breaker = CircuitBreaker("test", failures=1, reset_timeout=10)
+        breaker.record(False, now=100)
+        self.assertFalse(breaker.allow(now=105))
+        self.assertTrue(breaker.allow(now=110))
+        # Other calls fail fast while the trial runs.
+        self.assertFalse(breaker.allow(now=110))
+        breaker.record(False, now=111)
+        self.assertFalse(breaker.allow(now=120))
+        self.assertTrue(breaker.allow(now=121))
+        breaker.record(True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    def test_cancelled_trial_call_opens_the_breaker_again(self):
+        breaker = CircuitBreaker("test", failures=1, reset_timeout=0)
+        breaker.record(False)
+
+        async def trial():
+            with breaker.guard():
+                await asyncio.sleep(60)
+
+        async def cancel_trial():
+            task = asyncio.create_task(trial())
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.allow())
+
+
+@override_settings(
+    ADMISSION_CLASSES={
+        "webhook": {"concurrency": 1, "queue": 0},
+        "organizer": {"concurrency": 1, "queue": 0, "retry_after": 7},
+    }
+)
+@mock.patch.dict("core.admission.admission_classes", clear=True)
+class AdmissionMiddlewareTests(SimpleTestCase):
+    def test_saturated_class_does_not_starve_others(self):
+        middleware = AdmissionMiddleware(lambda request: None)
+        factory = RequestFactory()
+        dashboard = factory.get("/dawrah/api/organizers/attendee-list/")
+        self.assertIsNone(middleware.process_view(dashboard, AttendeeListView.as_view(), (), {}))
+
+        response = middleware.process_view(
+            factory.get("/dawrah/api/organizers/attendee-list/"), AttendeeListView.as_view(), (), {}
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+
+        webhook = factory.post("/dawrah/api/payments/webhook/paystack/")
+        self.assertIsNone(middleware.process_view(webhook, PaystackWebhookView.as_view(), (), {}))
+        for request in (dashboard, webhook):
+            request._admission_class.release()
+
+    def test_async_requests_are_admitted_on_the_event_loop(self):
+        async def get_response(request):
+            return None
+
+        middleware = AdmissionMiddleware(get_response)
+        factory = RequestFactory()
+        view = AttendeeListView.as_view()
+
+        async def admit():
+            first = factory.get("/dawrah/api/organizers/attendee-list/")
+            second = factory.get("/dawrah/api/organizers/attendee-list/")
+            responses = [
+                await middleware.process_view(first, view, (), {}),
+                await middleware.process_view(second, view, (), {}),
+            ]
+            await middleware(first)
+            return responses
+
+        admitted, shed = asyncio.run(admit())
+        self.assertIsNone(admitted)
+        self.assertEqual(shed.status_code, 503)
+        self.assertEqual(admission_classes["organizer"].snapshot()["active"], 0)
+
+
+class AsyncViewsHandlerTests(SimpleTestCase):
+    def request(self, handler, method, path, body=b""):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 1024),
+            "server": ("testserver", 80),
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        return handler(scope, receive, send)
+
+    def test_finds_the_async_views(self):
+        self.assertTrue(serves_async_view(reverse("register-async")))
+        self.assertFalse(serves_async_view(reverse("register")))
+        self.assertFalse(serves_async_view("/nowhere/"))
+
+    def test_requests_to_async_views_share_a_thread(self):
+        threads = []
+
+        def record(**kwargs):
+            threads.append(threading.get_ident())
+
+        request_started.connect(record)
+        self.addCleanup(request_started.disconnect, record)
+        handler = AsyncViewsHandler()
+
+        async def send_requests():
+            await asyncio.gather(
+                self.request(handler, "POST", reverse("register-async"), b"{"),
+                self.request(handler, "POST", reverse("register-async"), b"{"),
+            )
+            await self.request(handler, "GET", "/nowhere/")
+
+        asyncio.run(send_requests())
+        self.assertEqual(threads[0], threads[1])
+        self.assertNotEqual(threads[1], threads[2])
+
+
+class FileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = directory.name
+
+    def test_concurrent_increments_are_not_lost(self):
+        def increment():
+            worker_cache = FileBasedCache(self.location, {})
+            for _ in range(50):
+                worker_cache.add("counter", 0, timeout=None)
+                worker_cache.incr("counter")
+
+        workers = [threading.Thread(target=increment) for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(FileBasedCache(self.location, {}).get("counter"), 400)
+
+    def test_incr_keeps_the_expiry(self):
+        file_cache = FileBasedCache(self.location, {})
+        file_cache.set("counter", 1, timeout=60)
+        self.assertEqual(file_cache.incr("counter", 2), 3)
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.assertIsNone(file_cache.get("counter"))
+            with self.assertRaises(ValueError):
+                file_cache.incr("counter")
+
+
+class CacheResponseTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        admin = User.objects.create_superuser(
+            "admin@example.com", "password", first_name="Admin", last_name="User"
+        )
+        self.client.force_authenticate(admin)
+        self.attendee = Attendee.objects.create(
+            first_name="Aisha",
+            last_name="Bello",
+            email="aisha@example.com",
+            phone="08012345678",
+            department="Law",
+            level_of_study=100,
+            hall_off_residence="Mellanby",
+            level="beginner",
+        )
+
+    def get(self):
+        return self.client.get(reverse("organizers:attendee-detail", args=[self.attendee.pk]))
+
+    def test_second_request_is_served_from_the_cache(self):
+        first = self.get()
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = self.get()
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.json(), first.json())
+        # Query strings are part of the key, in any order.
+        url = reverse("organizers:attendee-detail", args=[self.attendee.pk])
+        self.assertEqual(self.client.get(f"{url}?a=1&b=2")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(f"{url}?b=2&a=1")["X-Cache"], "HIT")
+        self.assertEqual(metrics.snapshot()["hits"], 2)
+
+    def test_saving_a_model_invalidates_its_namespace(self):
+        self.get()
+        self.attendee.first_name = "Hafsah"
+        self.attendee.save()
+        response = self.get()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["first_name"], "Hafsah")
+
+        # Saving a model of another namespace leaves the entry alone.
+        Donor.objects.create(
+            first_name="Umar",
+            last_name="Sani",
+            email="donor@example.com",
+            phone="08012345678",
+            amount=500,
+        )
+        self.assertEqual(self.get()["X-Cache"], "HIT")
+
+        self.attendee.delete()
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_errors_are_not_cached(self):
+        url = reverse("organizers:attendee-detail", args=["00000000-0000-0000-0000-000000000000"])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNotIn("X-Cache", self.client.get(url))
+
+
+@mock.patch("core.db_router.replica_configured", return_value=True)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def read(self):
+        return self.router.db_for_read(Attendee)
+
+    def test_reads_use_the_replica_only_in_a_scope_until_it_writes(self, configured):
+        self.assertEqual(self.read(), "default")
+        with use_replica():
+            self.assertEqual(self.read(), "replica")
+            with use_primary():
+                self.assertEqual(self.read(), "default")
+            self.assertEqual(self.read(), "replica")
+            self.router.db_for_write(Attendee)
+            self.assertEqual(self.read(), "default")
+        self.assertEqual(self.read(), "default")
+
+    def test_writes_outside_a_scope_do_not_leak_into_later_scopes(self, configured):
+        # E.g. a command, or a thread, that wrote before exporting.
+        self.router.db_for_write(Attendee)
+        with use_replica():
+            self.assertEqual(self.read(), "replica")
+
+        def write_then_read():
+            self.router.db_for_write(Attendee)
+            with use_replica():
+                reads.append(self.read())
+
+        reads = []
+        thread = threading.Thread(target=write_then_read)
+        thread.start()
+        thread.join()
+        self.assertEqual(reads, ["replica"])
+
+    def test_writes_in_a_nested_scope_end_the_outer_one(self, configured):
+        with use_replica():
+            with use_replica():
+                self.router.db_for_write(Attendee)
+            self.assertEqual(self.read(), "default")
+
+    def test_middleware_pins_writers_to_the_primary(self, configured):
+        user = mock.Mock(is_authenticated=True, pk=7)
+
+        def view(request):
+            if request.path == "/write/":
+                self.router.db_for_write(Attendee)
+            return mock.Mock()
+
+        middleware = PrimaryStickinessMiddleware(view)
+        with mock.patch("core.db_router.stick_to_primary") as stick:
+            for path in ("/read/", "/write/", "/read/"):
+                request = RequestFactory().get(path)
+                request.user = user
+                middleware(request)
+        stick.assert_called_once_with(user)
+
+    def test_cached_responses_are_built_from_the_primary(self, configured):
+        cache.clear()
+        reads = []
+
+        class View:
+            @cache_response("attendees", name="router-test")
+            def get(view, request):
+                reads.append(self.read())
+                return Response({})
+
+        request = Request(RequestFactory().get("/attendees/"))
+        with use_replica():
+            View().get(request)
+            self.assertEqual(self.read(), "replica")
+        self.assertEqual(reads, ["default"])
+
+
+class SingleFlightTests(SimpleTestCase):
+    class View:
+        def get_permissions(self):
+            return []
+
+    def request(self, query=""):
+        return Request(RequestFactory().get(f"/dashboard/{query}"))
+
+    def test_concurrent_identical_requests_share_one_run(self):
+        runs = []
+        started = threading.Event()
+        release = threading.Event()
+
+        @single_flight(name="test-share")
+        def handler(view, request):
+            runs.append(request)
+            started.set()
+            release.wait(5)
+            return Response({"rows": [1, 2, 3]})
+
+        view = self.View()
+        responses = []
+        leader = threading.Thread(target=lambda: responses.append(handler(view, self.request())))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: responses.append(handler(view, self.request())))
+            for _ in range(5)
+        ]
+        for thread in followers:
+            thread.start()
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual([response.data for response in responses], [{"rows": [1, 2, 3]}] * 6)
+
+    def test_different_query_params_run_separately(self):
+        runs = []
+
+        @single_flight(name="test-params")
+        def handler(view, request):
+            runs.append(request)
+            return Response({})
+
+        handler(self.View(), self.request("?page=1"))
+        handler(self.View(), self.request("?page=2"))
+        self.assertEqual(len(runs), 2)
+
+    def test_errors_are_not_shared(self):
+        runs = []
+
+        @single_flight(name="test-errors")
+        def handler(view, request):
+            runs.append(request)
+            return Response({}, status=500)
+
+        handler(self.View(), self.request())
+        handler(self.View(), self.request())
+        self.assertEqual(len(runs), 2)
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def report(self, latencies, status_code=200):
+        recorder = Recorder()
+        for seconds in latencies:
+            recorder.add("register", seconds, status_code)
+        return {"endpoints": recorder.report(duration=10)}
+
+    def test_report_per_endpoint(self):
+        recorder = Recorder()
+        for i in range(100):
+            recorder.add("register", (i + 1) / 1000, 201 if i < 97 else 500)
+        recorder.add("register", 0.5, 503)
+        recorder.add("register", 0.5, None)
+        report = recorder.report(duration=2)["register"]
+        self.assertEqual(report["requests"], 102)
+        self.assertEqual(report["throughput_rps"], 51)
+        # Admission control's 503s are retried, not errors.
+        self.assertEqual(report["errors"], 4)
+        self.assertEqual(report["status_codes"], {"201": 97, "500": 3, "503": 1, "none": 1})
+        self.assertEqual(report["latency_ms"]["p50"], 51.0)
+        self.assertEqual(report["latency_ms"]["max"], 500.0)
+
+    def test_compare_flags_slower_p95_and_more_errors(self):
+        baseline = self.report([0.1] * 20)
+        rows, regressions = compare_reports(baseline, self.report([0.11] * 20), threshold=20)
+        self.assertEqual(rows[0]["p95_change_pct"], 10.0)
+        self.assertEqual(regressions, [])
+        self.assertEqual(compare_reports(baseline, self.report([0.2] * 20))[1], ["register"])
+        self.assertEqual(compare_reports(baseline, self.report([0.1] * 20, 500))[1], ["register"])
+
+    def test_smtp_sink_counts_messages(self):
+        sink = SMTPSink().start()
+        self.addCleanup(sink.stop)
+        host, port = sink.address
+        connection = get_connection(
+            "django.core.mail.backends.smtp.EmailBackend",
+            host=host, port=port, username="", password="", use_tls=False,
+        )
+        send_mail("Dawrah", "Body", "from@example.com", ["to@example.com"], connection=connection)
+        self.assertEqual(sink.stats["messages"], 1)
+
+
+class SyntheticDataTests(TestCase):
+    def test_rows_pass_registration_validation(self):
+        counts = SyntheticData(seed=1, chunk_size=70).generate(attendees=300, donors=30, users=3)
+        self.assertEqual(
+            {key: counts[key] for key in ("attendees", "donors", "donations", "users")},
+            {"attendees": 300, "donors": 30, "donations": 30, "users": 3},
+        )
+        self.assertEqual(EventPayment.objects.count(), counts["event_payments"])
+        fields = AttendeeSerializer().fields
+        for attendee in Attendee.objects.all():
+            for name in ("first_name", "last_name", "phone", "department", "level_of_study", "hall_off_residence", "level"):
+                fields[name].run_validation(getattr(attendee, name))
+            paid = attendee.payments.filter(status="success").exists()
+            self.assertEqual(attendee.paid, paid)
+            self.assertEqual(attendee.dawrah_id is not None, paid)
+        self.assertEqual(User.objects.filter(password__startswith="pbkdf2").count(), 3)
+
+    def test_holds_take_places_in_the_capacities(self):
+        venue = Capacity.objects.create(name="venue", limit=100)
+        advanced = Capacity.objects.create(name="advanced class", level="advanced", limit=5)
+        counts = SyntheticData(seed=2).generate(attendees=150)
+
+        self.assertEqual(Hold.objects.count(), counts["holds"])
+        for capacity in (venue, advanced):
+            capacity.refresh_from_db()
+            holds = Hold.objects.filter(capacity=capacity)
+            self.assertEqual(capacity.held, holds.filter(status=Hold.HELD).count())
+            self.assertEqual(capacity.confirmed, holds.filter(status=Hold.CONFIRMED).count())
+            self.assertLessEqual(capacity.held + capacity.confirmed, capacity.limit)
+        self.assertEqual(venue.remaining, 0)
+        paid = Hold.objects.filter(attendee__paid=True)
+        self.assertFalse(paid.exclude(status=Hold.CONFIRMED).exists())
+        self.assertFalse(Hold.objects.filter(capacity=advanced).exclude(attendee__level="advanced").exists())
+
+    def test_caches_and_index_see_the_new_rows(self):
+        namespaces = ["attendees", "payments", "donors", "donations"]
+        before = get_generations(namespaces)
+        attendee_index.clear()
+        attendee_index.ensure_warm()
+        self.addCleanup(attendee_index.clear)
+
+        SyntheticData(seed=3).generate(attendees=20, donors=5)
+        self.assertTrue(all(new > old for new, old in zip(get_generations(namespaces), before)))
+        dawrah_ids = Attendee.objects.exclude(dawrah_id=None).values_list("dawrah_id", flat=True)
+        self.assertEqual(len(attendee_index), len(dawrah_ids))
+        with self.assertNumQueries(0):
+            self.assertEqual(len(attendee_index.get_many(dawrah_ids)), len(dawrah_ids))
+
+    def test_same_seed_same_rows_and_ids_keep_counting(self):
+        def phones():
+            return list(Attendee.objects.order_by("phone").values_list("phone", flat=True))
+
+        SyntheticData(seed=7).generate(attendees=50)
+        first = phones()
+        Attendee.objects.all().delete()
+        SyntheticData(seed=7).generate(attendees=50)
+        self.assertEqual(phones(), first)
+
+        # Registrations after the synthetic rows get the next Dawrah ID.
+        last_id = Attendee.objects.last().dawrah_id
+        SyntheticData(seed=8).generate(attendees=50)
+        self.assertGreater(Attendee.objects.last().dawrah_id, last_id)
+        emails = Attendee.objects.values_list("email", flat=True)
+        self.assertEqual(len(set(emails)), 100)
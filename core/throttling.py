@@ -0,0 +1,190 @@
+"""
+Token-bucket rate limiting backed by the shared cache.
+
+Each bucket is a single integer in Django's cache: the time, in milliseconds, at which
+the bucket will be full again had every request so far taken a token (the "theoretical
+arrival time" of GCRA, which behaves exactly like a token bucket). A request adds one
+refill interval to it with cache.incr(), and is allowed if the bucket then is no more
+than `burst` intervals ahead of now. A rejected request costs that one round trip and
+nothing else.
+
+The limit holds under concurrency only where incr() and add() are atomic: on Redis,
+memcached, core.file_cache's file backend, and within a locmem cache, which is per
+process anyway. Django's own file and database caches read then write, so concurrent
+requests overwrite each other's tokens; throttles log a warning on those.
+
+Rejected requests still take their token, so a client retrying while limited stays
+limited. The key expires when the bucket would have been full again after its last
+allowed request, which forgives those tokens as soon as the client stops.
+
+Views pick the buckets they need and name their route with `throttle_scope`:
+
+    class RegistrationView(generics.CreateAPIView):
+        throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+        throttle_scope = "registration"
+
+Rates come from REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] under "<scope>_<kind>", e.g.
+"registration_ip": "20/hour", and bursts from THROTTLE_BURSTS under the same name,
+defaulting to the number of requests in the rate.
+"""
+
+import functools
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+BUCKET_KEY = "throttle:{}:{}"
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+ATOMIC_CACHE_BACKENDS = {
+    "core.file_cache.FileBasedCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.memcached.PyLibMCCache",
+    "django.core.cache.backends.memcached.PyMemcacheCache",
+    "django.core.cache.backends.redis.RedisCache",
+}
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def check_cache_backend(backend):
+    """
+    Warns, once per backend, when the cache's increments are not atomic.
+
+    Returns:
+        bool: Whether the backend enforces the limits under concurrency.
+    """
+    if backend in ATOMIC_CACHE_BACKENDS:
+        return True
+    logger.warning(
+        "Cache backend %s does not increment atomically: concurrent requests can "
+        "exceed the throttle rates. Use CACHE_BACKEND \"file\" or \"redis\".",
+        backend,
+    )
+    return False
+
+
+def parse_rate(rate):
+    """
+    Parses a DRF style rate such as "20/hour".
+
+    Returns:
+        tuple: The number of requests and the period in seconds.
+    """
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+class TokenBucket:
+    """
+    A bucket holding up to `burst` tokens, refilled with one token every `interval` seconds.
+    """
+
+    def __init__(self, key, interval, burst):
+        self.key = key
+        self.interval = max(1, int(interval * 1000))
+        self.window = self.interval * burst
+
+    def take(self, now=None):
+        """
+        Takes a token from the bucket.
+
+        Returns:
+            float: 0 if the request is allowed, else the seconds until a token is available.
+        """
+        now = int((time.time() if now is None else now) * 1000)
+        try:
+            tat = cache.incr(self.key, self.interval)
+        except ValueError:
+            # No bucket, or it expired: it is full.
+            if cache.add(self.key, now + self.interval, self._timeout(self.interval)):
+                return 0
+            tat = cache.incr(self.key, self.interval)
+
+        if tat - self.interval < now:
+            # The bucket refilled completely since the last request.
+            cache.set(self.key, now + self.interval, self._timeout(self.interval))
+            return 0
+        if tat - now > self.window:
+            return (tat - now - self.window) / 1000
+        # Keep the bucket until it would be full again.
+        cache.touch(self.key, self._timeout(tat - now))
+        return 0
+
+    @staticmethod
+    def _timeout(milliseconds):
+        # Whole seconds, rounded up: some backends truncate, and 0 deletes the key.
+        return math.ceil(milliseconds / 1000)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base class for token-bucket throttles. Subclasses set `kind` and implement
+    get_ident_key(); requests without an identity are not throttled.
+    """
+
+    kind = None
+
+    def get_ident_key(self, request):
+        raise NotImplementedError(".get_ident_key() must be overridden")
+
+    def get_bucket_name(self, view):
+        return f"{view.throttle_scope}_{self.kind}"
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if getattr(view, "throttle_scope", None) is None:
+            return True
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+
+        check_cache_backend(settings.CACHES["default"]["BACKEND"])
+        name = self.get_bucket_name(view)
+        try:
+            num_requests, period = parse_rate(api_settings.DEFAULT_THROTTLE_RATES[name])
+        except KeyError:
+            raise ImproperlyConfigured(f"No throttle rate set for '{name}'")
+        burst = getattr(settings, "THROTTLE_BURSTS", {}).get(name, num_requests)
+
+        bucket = TokenBucket(BUCKET_KEY.format(name, ident), period / num_requests, burst)
+        self.wait_seconds = bucket.take()
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per client IP, taken from X-Forwarded-For as configured by NUM_PROXIES.
+    """
+
+    kind = "ip"
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class EmailTokenBucketThrottle(TokenBucketThrottle):
+    """
+    One bucket per email address in the request body, so rotating IPs does not help
+    against a single account. The address is hashed to keep it out of cache keys.
+    """
+
+    kind = "email"
+
+    def get_ident_key(self, request):
+        data = request.data
+        email = data.get("email") if hasattr(data, "get") else None
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
@@ -0,0 +1,277 @@
+"""
+Request timing.
+
+RequestTimingMiddleware measures every request's total time, the time and number of
+queries it ran, and the time it spent in outbound calls wrapped in timed(), such as
+Paystack requests and SMTP sends. The breakdown is returned in a Server-Timing header
+and observed into in-process histograms, which /metrics exposes in the Prometheus text
+format. Histograms are per worker process; scrape every worker, or run a single one,
+to see the whole picture.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from core.admission import admission_classes
+from core.circuit import breakers
+from core.coalesce import metrics as coalesce_metrics
+from core.metrics import Histogram
+from core.sqlite_backend import lock_wait
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+# The timings of the request being handled. A context variable rather than a thread
+# local, so that the outbound calls of async views, which run on the event loop's
+# thread, and their sync_to_async queries count towards their own request.
+_current = ContextVar("request_timing", default=None)
+_lock = threading.Lock()
+
+# (method, route) -> Histogram of total and database seconds.
+request_histograms = {}
+db_histograms = {}
+# (method, route, status) -> request count.
+request_counts = defaultdict(int)
+# Outbound target, e.g. "paystack" or "smtp" -> Histogram of seconds.
+outbound_histograms = {}
+
+
+def _histogram(registry, key):
+    histogram = registry.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = registry.setdefault(key, Histogram())
+    return histogram
+
+
+@contextmanager
+def timed(target):
+    """
+    Times an outbound call. The time is observed into the target's histogram and,
+    when the call is made while handling a request, added to that request's Server-Timing.
+
+    Example:
+        with timed("paystack"):
+            response = requests.post(url, json=data)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _histogram(outbound_histograms, target).observe(elapsed)
+        current = _current.get()
+        if current is not None:
+            current.spans[target] += elapsed
+
+
+class _RequestTiming:
+    def __init__(self):
+        self.spans = defaultdict(float)
+        self.db_time = 0.0
+        self.queries = 0
+
+
+def time_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection, see CoreConfig.ready(): adds the query to the
+    timings of the request running it.
+    """
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.db_time += time.perf_counter() - start
+        current.queries += 1
+
+
+def watch_connection(sender, connection, **kwargs):
+    """
+    connection_created receiver installing time_queries() on the connection, once.
+    """
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_queries)
+
+
+class RequestTimingMiddleware:
+    """
+    Adds a Server-Timing header to every response and records per-route latency.
+
+    Routes are labelled by their URL pattern, e.g.
+    "dawrah/api/payments/event-payments/<int:pk>/", so the number of series stays
+    bounded; requests that match no pattern share a single label.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        current = _RequestTiming()
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            _current.reset(token)
+        return self.observe(request, response, current, total)
+
+    async def __acall__(self, request):
+        current = _RequestTiming()
+        token = _current.set(current)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            _current.reset(token)
+        return self.observe(request, response, current, total)
+
+    @staticmethod
+    def observe(request, response, current, total):
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match is not None else UNMATCHED_ROUTE
+        key = (request.method, route)
+        _histogram(request_histograms, key).observe(total)
+        _histogram(db_histograms, key).observe(current.db_time)
+        with _lock:
+            request_counts[(request.method, route, response.status_code)] += 1
+
+        timings = [
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={current.db_time * 1000:.1f};desc="{current.queries} queries"',
+        ]
+        timings += [f"{target};dur={seconds * 1000:.1f}" for target, seconds in current.spans.items()]
+        response["Server-Timing"] = ", ".join(timings)
+        return response
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name, **labels):
+    if not labels:
+        return name
+    pairs = ",".join(f'{label}="{_escape(value)}"' for label, value in labels.items())
+    return f"{name}{{{pairs}}}"
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _render_histogram(lines, name, help_text, series):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series:
+        for bound, count in histogram.cumulative_counts():
+            lines.append(f"{_series(name + '_bucket', **labels, le=_format_bound(bound))} {count}")
+        lines.append(f"{_series(name + '_sum', **labels)} {histogram.sum:.6f}")
+        lines.append(f"{_series(name + '_count', **labels)} {histogram.count}")
+
+
+def render_prometheus():
+    """
+    Returns this worker's metrics in the Prometheus text exposition format.
+    """
+    with _lock:
+        requests_by_route = sorted(request_histograms.items())
+        db_by_route = sorted(db_histograms.items())
+        outbound = sorted(outbound_histograms.items())
+        counts = sorted(request_counts.items())
+
+    lines = [
+        "# HELP dawrah_requests_total Requests handled, by route and status code.",
+        "# TYPE dawrah_requests_total counter",
+    ]
+    for (method, route, status_code), count in counts:
+        series = _series("dawrah_requests_total", method=method, route=route, status=status_code)
+        lines.append(f"{series} {count}")
+    _render_histogram(
+        lines,
+        "dawrah_request_duration_seconds",
+        "Total request latency, by route.",
+        [({"method": m, "route": r}, h) for (m, r), h in requests_by_route],
+    )
+    _render_histogram(
+        lines,
+        "dawrah_request_db_seconds",
+        "Time spent running queries per request, by route.",
+        [({"method": m, "route": r}, h) for (m, r), h in db_by_route],
+    )
+    _render_histogram(
+        lines,
+        "dawrah_outbound_duration_seconds",
+        "Latency of outbound calls, by target.",
+        [({"target": target}, h) for target, h in outbound],
+    )
+    _render_histogram(
+        lines,
+        "dawrah_sqlite_lock_wait_seconds",
+        "Time requests waited for the SQLite write lock.",
+        [({}, lock_wait.histogram)],
+    )
+
+    admission = sorted(admission_classes.items())
+    snapshots = [(name, admission_class.snapshot()) for name, admission_class in admission]
+    for metric, kind, help_text, key in (
+        ("dawrah_admission_active", "gauge", "Requests running, by admission class.", "active"),
+        ("dawrah_admission_waiting", "gauge", "Requests queued for a slot, by admission class.", "waiting"),
+        ("dawrah_admission_admitted_total", "counter", "Requests admitted, by admission class.", "admitted"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, snapshot in snapshots:
+            lines.append(f"{_series(metric, **{'class': name})} {snapshot[key]}")
+    lines += [
+        "# HELP dawrah_admission_rejected_total Requests shed with a 503, by admission class and reason.",
+        "# TYPE dawrah_admission_rejected_total counter",
+    ]
+    for name, snapshot in snapshots:
+        for reason, count in sorted(snapshot["rejected"].items()):
+            series = _series("dawrah_admission_rejected_total", **{"class": name, "reason": reason})
+            lines.append(f"{series} {count}")
+    _render_histogram(
+        lines,
+        "dawrah_admission_wait_seconds",
+        "Time admitted requests waited in the queue, by admission class.",
+        [({"class": name}, admission_class.wait_histogram) for name, admission_class in admission],
+    )
+    circuits = [(name, breaker.snapshot()) for name, breaker in sorted(breakers.items())]
+    lines += [
+        "# HELP dawrah_circuit_open Whether a circuit breaker is open (1), half open (0.5) or closed (0).",
+        "# TYPE dawrah_circuit_open gauge",
+    ]
+    for name, snapshot in circuits:
+        value = {"open": 1, "half_open": 0.5}.get(snapshot["state"], 0)
+        lines.append(f"{_series('dawrah_circuit_open', breaker=name)} {value}")
+    for metric, help_text, key in (
+        ("dawrah_circuit_trips_total", "Times a circuit breaker opened.", "trips"),
+        ("dawrah_circuit_rejected_total", "Calls failed fast by an open circuit breaker.", "rejected"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for name, snapshot in circuits:
+            lines.append(f"{_series(metric, breaker=name)} {snapshot[key]}")
+    coalescing = coalesce_metrics.snapshot()
+    for metric, help_text, key in (
+        ("dawrah_coalesce_runs_total", "Handler runs of coalesced views.", "runs"),
+        ("dawrah_coalesce_shared_total", "Responses shared from another request's run.", "shared"),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        for view_name, counts in coalescing.items():
+            lines.append(f"{_series(metric, view=view_name)} {counts[key]}")
+    return "\n".join(lines) + "\n"
@@ -14,6 +14,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
@@ -22,10 +23,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularRedocView,
-    SpectacularSwaggerView,
+from .views import (
+    CacheStatsView,
+    DatabaseStatsView,
+    MetricsView,
+    ProfileDownloadView,
+    ProfileListView,
 )
 
 urlpatterns = [
@@ -34,19 +37,39 @@ urlpatterns = [
     path("dawrah/api/event/", include("registration.urls"), name="event"),
     path("dawrah/api/organizers/", include("organizers.urls", namespace="organizers"), name="organizers"),
     path("dawrah/api/payments/", include("payments.urls"), name="payments"),
-    
-    # DRF Spectacular
-    path("dawrah/api/schema/", SpectacularAPIView.as_view(), name="schema"),
-    path(
-        "dawrah/api/schema/swagger-ui/",
-        SpectacularSwaggerView.as_view(url_name="schema"),
-        name="swagger-ui",
-    ),
-    path(
-        "dawrah/api/schema/redoc/",
-        SpectacularRedocView.as_view(url_name="schema"),
-        name="redoc",
-    ),
-    # django-debug-toolbar
-    path("dawrah/__debug__/", include("debug_toolbar.urls")),
+    path("dawrah/api/checkin/", include("checkin.urls"), name="checkin"),
+    path("dawrah/api/cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    path("dawrah/api/db/stats/", DatabaseStatsView.as_view(), name="db-stats"),
+    path("dawrah/api/profiles/", ProfileListView.as_view(), name="profile-list"),
+    path("dawrah/api/profiles/<str:name>/", ProfileDownloadView.as_view(), name="profile-download"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ]
+
+if settings.API_DOCS:
+    from .schema_views import SchemaRedocView, SchemaSwaggerView, SchemaView
+
+    urlpatterns += [
+        # DRF Spectacular, serving the schema built by `manage.py build_openapi_schema`
+        path("dawrah/api/schema/", SchemaView.as_view(), name="schema"),
+        path(
+            "dawrah/api/schema/<str:version>.json",
+            SchemaView.as_view(),
+            name="schema-version",
+        ),
+        path(
+            "dawrah/api/schema/swagger-ui/",
+            SchemaSwaggerView.as_view(url_name="schema"),
+            name="swagger-ui",
+        ),
+        path(
+            "dawrah/api/schema/redoc/",
+            SchemaRedocView.as_view(url_name="schema"),
+            name="redoc",
+        ),
+    ]
+
+if settings.DEBUG_TOOLBAR:
+    urlpatterns += [
+        # django-debug-toolbar
+        path("dawrah/__debug__/", include("debug_toolbar.urls")),
+    ]
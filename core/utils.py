@@ -8,6 +8,8 @@ from rest_framework import status
 
 from django.conf import settings
 
+from .timing import timed
+
 
 def format_drf_errors(errors):
     formatted_errors = []
@@ -49,11 +51,12 @@ class EmailThread(threading.Thread):
         threading.Thread.__init__(self)
 
     def run(self):
-        send_mail(
-            subject=self.subject,
-            message=self.message,
-            from_email=f"Event App <{settings.DEFAULT_FROM_EMAIL}>",
-            html_message=self.html_message,
-            recipient_list=self.recipients,
-            fail_silently=False,
-        )
+        with timed("smtp"):
+            send_mail(
+                subject=self.subject,
+                message=self.message,
+                from_email=f"Event App <{settings.DEFAULT_FROM_EMAIL}>",
+                html_message=self.html_message,
+                recipient_list=self.recipients,
+                fail_silently=False,
+            )
@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, Http404
+from django.utils.crypto import constant_time_compare
+
+from rest_framework import status
+from rest_framework.permissions import BasePermission
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from drf_spectacular.utils import extend_schema
+
+from .cache import metrics as cache_metrics
+from .coalesce import metrics as coalesce_metrics
+from .profiling import get_profile_path, list_profiles
+from .sqlite_backend import lock_wait
+from .timing import render_prometheus
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = "text/plain"
+    format = "txt"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class HasMetricsToken(BasePermission):
+    """
+    Allows scrapers presenting `Authorization: Bearer <METRICS_TOKEN>`. Without a
+    METRICS_TOKEN the endpoint is only open in DEBUG.
+    """
+
+    def has_permission(self, request, view):
+        token = getattr(settings, "METRICS_TOKEN", "")
+        if not token:
+            return settings.DEBUG
+        return constant_time_compare(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}")
+
+
+@extend_schema(tags=["Monitoring"])
+class CacheStatsView(APIView):
+    """
+    Returns the response cache hit and miss counters, and the handler runs and shared
+    responses of coalesced views, of the worker serving the request.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 1
+
+    def get(self, request):
+        context = {
+            "success": True,
+            "message": "Cache stats retrieved successfully",
+            "data": {
+                "backend": settings.CACHES["default"]["BACKEND"],
+                **cache_metrics.snapshot(),
+                "coalescing": coalesce_metrics.snapshot(),
+            },
+        }
+        return Response(context, status=status.HTTP_200_OK)
+
+
+@extend_schema(tags=["Monitoring"])
+class DatabaseStatsView(APIView):
+    """
+    Returns the active SQLite PRAGMAs and this worker's write-lock wait histogram.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 6
+
+    def get(self, request):
+        pragmas = {}
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                for name in ("journal_mode", "synchronous", "busy_timeout", "mmap_size", "cache_size"):
+                    cursor.execute(f"PRAGMA {name}")
+                    row = cursor.fetchone()
+                    pragmas[name] = row[0] if row else None
+        context = {
+            "success": True,
+            "message": "Database stats retrieved successfully",
+            "data": {
+                "engine": settings.DATABASES["default"]["ENGINE"],
+                "pragmas": pragmas,
+                "lock_wait_seconds": lock_wait.histogram.snapshot(),
+            },
+        }
+        return Response(context, status=status.HTTP_200_OK)
+
+
+@extend_schema(exclude=True)
+class MetricsView(APIView):
+    """
+    Exposes this worker's request, query and outbound call latency histograms in the
+    Prometheus text format.
+    """
+
+    authentication_classes = []
+    permission_classes = [HasMetricsToken]
+    renderer_classes = [PrometheusRenderer]
+    query_budget = 0
+
+    def get(self, request):
+        return Response(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@extend_schema(tags=["Monitoring"])
+class ProfileListView(APIView):
+    """
+    Lists the stored request profiles, newest first.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 1
+
+    def get(self, request):
+        profiles = [
+            {"name": path.name, "size": path.stat().st_size, "created_at": path.stat().st_mtime}
+            for path in list_profiles()
+        ]
+        context = {
+            "success": True,
+            "message": "Profiles retrieved successfully",
+            "data": profiles,
+        }
+        return Response(context, status=status.HTTP_200_OK)
+
+
+@extend_schema(tags=["Monitoring"])
+class ProfileDownloadView(APIView):
+    """
+    Downloads a stored request profile: a pstats file (.prof) or collapsed stacks (.collapsed).
+    """
+
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 1
+
+    @extend_schema(responses={(200, "application/octet-stream"): bytes}, tags=["Monitoring"])
+    def get(self, request, name):
+        path = get_profile_path(name)
+        if path is None:
+            raise Http404("Profile not found.")
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
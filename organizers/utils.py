@@ -1,26 +1,36 @@
+import functools
+
 import jwt
 
-from authlib.integrations.django_client import OAuth
 from django.conf import settings
 from django.core.mail import send_mail
 from django.urls import reverse
 
 from core.utils import EmailThread
 
-oauth = OAuth()
-
-google_config = settings.AUTHLIB_OAUTH_CLIENTS["google"]
-oauth.register(
-    name="google",
-    client_id=google_config["client_id"],
-    client_secret=google_config["client_secret"],
-    authorize_url=google_config["authorize_url"],
-    authorize_params=google_config["authorize_params"],
-    access_token_url=google_config["access_token_url"],
-    access_token_params=google_config["access_token_params"],
-    client_kwargs=google_config["client_kwargs"],
-    jwks_uri=google_config["jwks_uri"],
-)
+
+@functools.lru_cache(maxsize=None)
+def get_oauth():
+    """
+    Returns the OAuth registry with the Google client registered, building it on first
+    use so workers do not import Authlib until someone signs in with Google.
+    """
+    from authlib.integrations.django_client import OAuth
+
+    oauth = OAuth()
+    google_config = settings.AUTHLIB_OAUTH_CLIENTS["google"]
+    oauth.register(
+        name="google",
+        client_id=google_config["client_id"],
+        client_secret=google_config["client_secret"],
+        authorize_url=google_config["authorize_url"],
+        authorize_params=google_config["authorize_params"],
+        access_token_url=google_config["access_token_url"],
+        access_token_params=google_config["access_token_params"],
+        client_kwargs=google_config["client_kwargs"],
+        jwks_uri=google_config["jwks_uri"],
+    )
+    return oauth
 
 
 def decode_token(token):
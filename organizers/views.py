@@ -16,14 +16,20 @@ from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.cache import cache_response
+from core.coalesce import single_flight
+from core.db_router import ReplicaReadMixin
+from core.query_budget import limit_queries
+from core.serializers import RowSerializer
+from core.throttling import EmailTokenBucketThrottle, IPTokenBucketThrottle
+
 from registration.serializers import AttendeeSerializer
 from registration.models import Attendee
 
 from .serializers import PasswordResetSerializer, ResendVerificationEmailSerializer, SetNewPasswordSerializer, UserCreateSerializer, UserSerializer
 from .models import User, UserProviderEnum
-from .utils import oauth
 
-from .utils import oauth, decode_token, send_verification, send_reset_password
+from .utils import get_oauth, decode_token, send_verification, send_reset_password
 
 
 # from .permissions import CustomAdminPermission
@@ -39,6 +45,8 @@ class UserCreateView(generics.CreateAPIView):
 
     serializer_class = UserCreateSerializer
     queryset = User.objects.all()
+    admission_class = "organizer"
+    query_budget = 4
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -81,6 +89,8 @@ class AccountVerificationView(generics.RetrieveAPIView):
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    admission_class = "auth"
+    query_budget = 3
 
     def get_object(self):
         """
@@ -148,6 +158,10 @@ class ResendVerificationEmailView(generics.GenericAPIView):
     """
 
     serializer_class = ResendVerificationEmailSerializer
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = "resend_verification"
+    admission_class = "auth"
+    query_budget = 2
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -192,6 +206,10 @@ class RequestPasswordResetView(generics.GenericAPIView):
     """
 
     serializer_class = PasswordResetSerializer
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = "password_reset"
+    admission_class = "auth"
+    query_budget = 2
 
     def post(self, request, *args, **kwargs):
         """
@@ -240,6 +258,8 @@ class ResetPasswordView(generics.GenericAPIView):
     """
 
     serializer_class = SetNewPasswordSerializer
+    admission_class = "auth"
+    query_budget = 2
 
     def patch(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -271,7 +291,7 @@ class AllUsersListView(generics.ListAPIView):
     """
 
     serializer_class = UserSerializer
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("groups", "user_permissions")
     permission_classes = [IsAuthenticated, IsAdminUser]
     ordering_fields = [
         "id",
@@ -282,6 +302,8 @@ class AllUsersListView(generics.ListAPIView):
         "is_active",
     ]
     search_fields = ["id", "email", "first_name", "last_name", "is_staff", "is_active"]
+    admission_class = "organizer"
+    query_budget = 5
 
 
 class UserDetailUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
@@ -301,17 +323,26 @@ class UserDetailUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     """
 
     serializer_class = UserSerializer
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related("groups", "user_permissions")
     permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 7
 
 
-class SingleAttendeeView(generics.RetrieveUpdateDestroyAPIView):
+class SingleAttendeeView(ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AttendeeSerializer
     queryset = Attendee.objects.all()
     permission_classes = [IsAuthenticated, IsAdminUser]
+    admission_class = "organizer"
+    query_budget = 7
+
+    @limit_queries(2)
+    @cache_response("attendees")
+    def get(self, request, *args, **kwargs):
+        return self.retrieve(request, *args, **kwargs)
 
 
-class AttendeeListView(generics.ListAPIView):
+class AttendeeListView(ReplicaReadMixin, generics.ListAPIView):
     """
     A view that returns a paginated list of all attendees in the system.
 
@@ -347,6 +378,19 @@ class AttendeeListView(generics.ListAPIView):
         "phone",
     ]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    row_serializer = RowSerializer(AttendeeSerializer)
+    admission_class = "organizer"
+    query_budget = 3
+
+    @single_flight()
+    @cache_response("attendees")
+    def get(self, request, *args, **kwargs):
+        # Same as self.list(), with rows serialized straight from values_list().
+        queryset = self.row_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.row_serializer.to_representation(page))
+        return Response(self.row_serializer.to_representation(queryset))
 
     def get_queryset(self):
         """
@@ -378,6 +422,11 @@ class PairTokenObtainView(TokenObtainPairView):
     View to obtain both access and refresh tokens for a user.
     """
 
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = "login"
+    admission_class = "auth"
+    query_budget = 2
+
     @extend_schema(
         description="View to obtain both access and refresh tokens for a user.",
         responses={
@@ -426,6 +475,9 @@ class RefreshTokenView(TokenRefreshView):
 
     """
 
+    admission_class = "auth"
+    query_budget = 0
+
     @extend_schema(
         description="A view for refreshing authentication tokens.",
         responses={200: "Token obtained successfully."},
@@ -452,8 +504,11 @@ class GoogleSignInView(APIView):
         - get: Handles the GET request and redirects the user to the Google sign-in page.
     """
 
+    admission_class = "auth"
+    query_budget = 0
+
     def get(self, request):
-        google = oauth.create_client("google")
+        google = get_oauth().create_client("google")
         redirect_url = request.build_absolute_uri(
             reverse("organizers:google-signin-callback")
         )
@@ -477,6 +532,9 @@ class GoogleSignInCallbackView(APIView):
 
     """
 
+    admission_class = "auth"
+    query_budget = 3
+
     @transaction.atomic()
     def get(self, request):
         """
@@ -489,8 +547,9 @@ class GoogleSignInCallbackView(APIView):
             A response indicating the success or failure of the login or registration process.
 
         """
-        token = oauth.google.authorize_access_token(request)
-        resp = oauth.google.get(
+        google = get_oauth().create_client("google")
+        token = google.authorize_access_token(request)
+        resp = google.get(
             "https://www.googleapis.com/oauth2/v2/userinfo", token=token
         )
         resp.raise_for_status()
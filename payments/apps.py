@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "payments"
+
+    def ready(self):
+        from core.cache import invalidate_on_save
+
+        from .models import Donation, Donor, EventPayment
+
+        invalidate_on_save(EventPayment, "payments")
+        invalidate_on_save(Donor, "donors")
+        invalidate_on_save(Donation, "donations")
@@ -0,0 +1,376 @@
+"""
+A local stand-in for the Paystack API.
+
+PaystackEmulator serves the endpoints this project uses, over HTTP on localhost:
+
+    POST /transaction/initialize
+    GET  /transaction/verify/<reference>
+    GET  /transaction?status=&perPage=&page=
+
+and "pays" transactions by sending charge.success or charge.failed webhooks, signed
+with the secret key the way Paystack signs them, to PaystackWebhookView. The
+authorization URL it hands out is a checkout that pays at once, with ?outcome=failed
+to decline, and redirects to the transaction's callback_url while the webhook is sent. Pointing
+PAYSTACK_BASE_URL at it lets the payment code run offline:
+
+    python manage.py paystack_emulator --latency lognormal:0.3:0.6 --error-rate 0.05 \
+        --auto-pay success --webhook-url http://127.0.0.1:8000/dawrah/api/payments/webhook/paystack/
+
+In tests, run_paystack_emulator() starts one on a free port for the duration of a
+block and overrides PAYSTACK_BASE_URL, and pay() delivers the webhooks synchronously,
+optionally through a callable such as the test client instead of HTTP:
+
+    with run_paystack_emulator(deliver=post_webhook) as paystack:
+        response = self.client.post(reverse("register"), ...)
+        paystack.pay(reference)
+
+Faults are injected per API request: a latency drawn from a distribution (see
+parse_latency()) and a fraction of 500 responses. Webhooks can be delivered more than
+once, as Paystack does, with `duplicate_rate`. `stats` counts requests, injected
+errors, webhooks and the most API requests that were in flight at once.
+"""
+
+import hashlib
+import hmac
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from django.conf import settings
+from django.test.utils import override_settings
+from django.utils import timezone
+
+
+def parse_latency(spec, rng=random):
+    """
+    Parses a latency distribution, in seconds: "0.2" (fixed), "uniform:0.05:0.5",
+    "normal:0.2:0.05" (mean, deviation), "lognormal:0.2:0.5" (median, sigma) or
+    "exponential:0.2" (mean).
+
+    Returns:
+        callable: A function returning one sample, never negative.
+    """
+    kind, _, args = str(spec).partition(":")
+    if not args:
+        value = float(kind)
+        return lambda: value
+    params = [float(arg) for arg in args.split(":")]
+    samplers = {
+        "uniform": lambda low, high: rng.uniform(low, high),
+        "normal": lambda mean, deviation: rng.gauss(mean, deviation),
+        "lognormal": lambda median, sigma: rng.lognormvariate(math.log(median), sigma),
+        "exponential": lambda mean: rng.expovariate(1 / mean),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}'")
+    sampler = samplers[kind]
+    return lambda: max(0.0, sampler(*params))
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for hundreds of connections arriving at once, from async views.
+    request_queue_size = 1024
+
+
+def sign(body, secret):
+    return hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+
+
+class PaystackEmulator:
+    """
+    An in-memory Paystack served from a background thread.
+
+    Attributes:
+        secret_key (str): The key callers must send as a Bearer token, also used to sign webhooks.
+        webhook_url (str): Where webhooks are posted, unless `deliver` is given.
+        deliver (callable): Called with the webhook body and headers instead of posting it.
+        latency (str): Latency distribution of API responses, see parse_latency().
+        error_rate (float): Fraction of API requests answered with a 500.
+        duplicate_rate (float): Probability that a webhook is delivered once more.
+        auto_pay (str): "success" or "failed" to pay every initialized transaction, in
+            a background thread, after a delay drawn from `pay_delay`.
+        webhook_retries (int): Times an undelivered webhook is sent again, a second apart.
+        seed (int): Seeds the fault injection for reproducible runs.
+    """
+
+    def __init__(
+        self,
+        secret_key=None,
+        webhook_url=None,
+        deliver=None,
+        latency="0",
+        error_rate=0.0,
+        duplicate_rate=0.0,
+        auto_pay=None,
+        pay_delay="0",
+        webhook_latency="0",
+        webhook_retries=0,
+        seed=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.secret_key = secret_key or settings.PAYSTACK_SECRET_KEY
+        self.webhook_url = webhook_url
+        self.deliver = deliver
+        self.error_rate = error_rate
+        self.duplicate_rate = duplicate_rate
+        self.auto_pay = auto_pay
+        self.webhook_retries = webhook_retries
+        self.random = random.Random(seed)
+        self.latency = parse_latency(latency, self.random)
+        self.pay_delay = parse_latency(pay_delay, self.random)
+        self.webhook_latency = parse_latency(webhook_latency, self.random)
+        self.transactions = {}
+        self.stats = {
+            "requests": 0,
+            "errors_injected": 0,
+            "webhooks": 0,
+            "webhook_failures": 0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+        }
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _count(self, key, delta=1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == "in_flight":
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats[key])
+
+    # API
+
+    def initialize(self, payload):
+        email, amount = payload.get("email"), payload.get("amount")
+        if not email or not amount:
+            return 400, {"status": False, "message": "Email and amount are required"}
+        reference = payload.get("reference") or uuid.uuid4().hex[:12]
+        access_code = uuid.uuid4().hex[:15]
+        with self._lock:
+            if reference in self.transactions:
+                return 400, {"status": False, "message": "Duplicate Transaction Reference"}
+            self.transactions[reference] = {
+                "id": len(self.transactions) + 1,
+                "reference": reference,
+                "access_code": access_code,
+                "amount": int(amount),
+                "currency": "NGN",
+                "status": "abandoned",
+                "gateway_response": None,
+                "paid_at": None,
+                "created_at": timezone.now().isoformat(),
+                "customer": {"email": email},
+                "callback_url": payload.get("callback_url"),
+            }
+        if self.auto_pay:
+            threading.Thread(
+                target=self._auto_pay, args=(reference, self.pay_delay()), daemon=True
+            ).start()
+        return 200, {
+            "status": True,
+            "message": "Authorization URL created",
+            "data": {
+                "authorization_url": f"{self.base_url}/checkout/{access_code}",
+                "access_code": access_code,
+                "reference": reference,
+            },
+        }
+
+    def verify(self, reference):
+        with self._lock:
+            transaction = self.transactions.get(reference)
+            transaction = dict(transaction) if transaction else None
+        if transaction is None:
+            return 400, {"status": False, "message": "Transaction reference not found"}
+        return 200, {"status": True, "message": "Verification successful", "data": transaction}
+
+    def list_transactions(self, query):
+        status = query.get("status")
+        per_page = int(query.get("perPage", 50))
+        page = int(query.get("page", 1))
+        with self._lock:
+            transactions = [
+                dict(transaction)
+                for transaction in reversed(list(self.transactions.values()))
+                if status is None or transaction["status"] == status
+            ]
+        start = (page - 1) * per_page
+        return 200, {
+            "status": True,
+            "message": "Transactions retrieved",
+            "data": transactions[start:start + per_page],
+            "meta": {
+                "total": len(transactions),
+                "perPage": per_page,
+                "page": page,
+                "pageCount": math.ceil(len(transactions) / per_page) if per_page else 0,
+            },
+        }
+
+    # Checkout
+
+    def pay(self, reference, outcome="success"):
+        """
+        Completes a transaction as the customer would on the checkout page, and sends
+        its webhook, and any duplicate, from the calling thread.
+
+        Returns:
+            list: The status codes the webhook deliveries got.
+        """
+        with self._lock:
+            transaction = self.transactions[reference]
+            transaction["status"] = outcome
+            transaction["gateway_response"] = "Successful" if outcome == "success" else "Declined"
+            if outcome == "success":
+                transaction["paid_at"] = timezone.now().isoformat()
+            event = {"event": f"charge.{outcome}", "data": dict(transaction)}
+        deliveries = 2 if self.random.random() < self.duplicate_rate else 1
+        return [self.send_webhook(event) for _ in range(deliveries)]
+
+    def _auto_pay(self, reference, delay):
+        time.sleep(delay)
+        self.pay(reference, self.auto_pay)
+
+    def send_webhook(self, event):
+        time.sleep(self.webhook_latency())
+        body = json.dumps(event).encode()
+        headers = {"Content-Type": "application/json", "X-Paystack-Signature": sign(body, self.secret_key)}
+        for attempt in range(self.webhook_retries + 1):
+            if attempt:
+                time.sleep(1)
+            self._count("webhooks")
+            try:
+                if self.deliver is not None:
+                    status_code = self.deliver(body, headers)
+                else:
+                    status_code = requests.post(
+                        self.webhook_url, data=body, headers=headers, timeout=30
+                    ).status_code
+            except requests.RequestException:
+                status_code = None
+            if status_code == 200:
+                break
+            self._count("webhook_failures")
+        return status_code
+
+    def _handler_class(self):
+        emulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def respond(self, status_code, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle_api(self, route):
+                emulator._count("requests")
+                emulator._count("in_flight")
+                try:
+                    time.sleep(emulator.latency())
+                    if self.headers.get("Authorization") != f"Bearer {emulator.secret_key}":
+                        return self.respond(401, {"status": False, "message": "Invalid key"})
+                    if emulator.random.random() < emulator.error_rate:
+                        emulator._count("errors_injected")
+                        return self.respond(500, {"status": False, "message": "Internal server error"})
+                    self.respond(*route())
+                finally:
+                    emulator._count("in_flight", -1)
+
+            def do_POST(self):
+                path = urlparse(self.path).path.rstrip("/")
+                if path != "/transaction/initialize":
+                    return self.respond(404, {"status": False, "message": "Not found"})
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    return self.respond(400, {"status": False, "message": "Invalid JSON"})
+                self.handle_api(lambda: emulator.initialize(payload))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path.rstrip("/")
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                if path.startswith("/transaction/verify/"):
+                    reference = path.rsplit("/", 1)[1]
+                    return self.handle_api(lambda: emulator.verify(reference))
+                if path == "/transaction":
+                    return self.handle_api(lambda: emulator.list_transactions(query))
+                if path.startswith("/checkout/"):
+                    return self.checkout(path.rsplit("/", 1)[1], query.get("outcome", "success"))
+                self.respond(404, {"status": False, "message": "Not found"})
+
+            def checkout(self, access_code, outcome):
+                with emulator._lock:
+                    reference = next(
+                        (
+                            transaction["reference"]
+                            for transaction in emulator.transactions.values()
+                            if transaction["access_code"] == access_code
+                        ),
+                        None,
+                    )
+                    callback_url = reference and emulator.transactions[reference]["callback_url"]
+                if reference is None:
+                    return self.respond(404, {"status": False, "message": "Not found"})
+                if not callback_url:
+                    deliveries = emulator.pay(reference, outcome)
+                    return self.respond(200, {"status": True, "reference": reference, "webhooks": deliveries})
+                # Like Paystack, send the customer back at once and the webhook separately.
+                threading.Thread(target=emulator.pay, args=(reference, outcome), daemon=True).start()
+                separator = "&" if "?" in callback_url else "?"
+                self.send_response(302)
+                self.send_header("Location", f"{callback_url}{separator}trxref={reference}&reference={reference}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
+
+
+@contextmanager
+def run_paystack_emulator(**options):
+    """
+    Runs a PaystackEmulator on a free port for the duration of the block, with
+    PAYSTACK_BASE_URL pointing at it.
+    """
+    emulator = PaystackEmulator(**options).start()
+    try:
+        with override_settings(PAYSTACK_BASE_URL=emulator.base_url):
+            yield emulator
+    finally:
+        emulator.stop()
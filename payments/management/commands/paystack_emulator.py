@@ -0,0 +1,75 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.emulator import PaystackEmulator, parse_latency
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the Paystack API with injected latency and errors. "
+        "Point PAYSTACK_BASE_URL at it to run the payment code offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--webhook-url",
+            default="http://127.0.0.1:8000/dawrah/api/payments/webhook/paystack/",
+            help="Where charge.success and charge.failed webhooks are posted",
+        )
+        parser.add_argument(
+            "--latency",
+            default="0",
+            help='API latency in seconds, e.g. "0.2", "uniform:0.05:0.5" or "lognormal:0.3:0.6"',
+        )
+        parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 500s")
+        parser.add_argument(
+            "--duplicate-rate", type=float, default=0.0, help="Fraction of webhooks sent twice"
+        )
+        parser.add_argument(
+            "--auto-pay",
+            choices=["success", "failed"],
+            help="Pay every initialized transaction with this outcome",
+        )
+        parser.add_argument(
+            "--pay-delay", default="2", help="Seconds before an auto-paid transaction is paid"
+        )
+        parser.add_argument("--webhook-latency", default="0")
+        parser.add_argument("--webhook-retries", type=int, default=3)
+        parser.add_argument("--seed", type=int)
+
+    def handle(self, *args, **options):
+        for name in ("latency", "pay_delay", "webhook_latency"):
+            try:
+                parse_latency(options[name])
+            except ValueError as e:
+                raise CommandError(f"--{name.replace('_', '-')}: {e}")
+
+        emulator = PaystackEmulator(
+            webhook_url=options["webhook_url"],
+            latency=options["latency"],
+            error_rate=options["error_rate"],
+            duplicate_rate=options["duplicate_rate"],
+            auto_pay=options["auto_pay"],
+            pay_delay=options["pay_delay"],
+            webhook_latency=options["webhook_latency"],
+            webhook_retries=options["webhook_retries"],
+            seed=options["seed"],
+            host=options["host"],
+            port=options["port"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Paystack emulator on {emulator.base_url}; set PAYSTACK_BASE_URL={emulator.base_url}"
+            )
+        )
+        self.stdout.write("Pay a transaction by opening its authorization URL (?outcome=failed to fail it)")
+        try:
+            emulator.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            emulator.stop()
+            self.stdout.write(json.dumps(emulator.stats, indent=2))
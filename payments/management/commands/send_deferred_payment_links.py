@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from payments.utils import send_deferred_payment_links
+
+LOCK_KEY = "send-deferred-payment-links"
+LOCK_TIMEOUT = 60 * 30
+
+
+class Command(BaseCommand):
+    help = "Initialize payments deferred while Paystack was unavailable and email their links"
+
+    def handle(self, *args, **options):
+        # Cron starts a run every minute; a slow run must not email the same links twice.
+        if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+            self.stdout.write("Another run is still sending payment links")
+            return
+        try:
+            count = send_deferred_payment_links()
+        finally:
+            cache.delete(LOCK_KEY)
+        self.stdout.write(self.style.SUCCESS(f"{count} payment links sent!"))
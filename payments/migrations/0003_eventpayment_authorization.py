@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("payments", "0002_donor_alter_donation_donor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="eventpayment",
+            name="access_code",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name="eventpayment",
+            name="authorization_url",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="eventpayment",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -27,9 +27,14 @@ class EventPayment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     message = models.CharField(max_length=255, null=True, blank=True)
     paid_at = models.DateTimeField(auto_now_add=True)
+    # Paystack checkout of an initialized payment, reused until it expires.
+    authorization_url = models.CharField(max_length=255, null=True, blank=True)
+    access_code = models.CharField(max_length=100, null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"Payment for {self.attendee.first_name} {self.attendee.last_name} - {self.status}"
+        # The reference rather than the attendee's name, so listing payments runs no query per row.
+        return f"Payment {self.reference} - {self.status}"
 
 
 class Donation(models.Model):
@@ -10,7 +10,7 @@ from .models import EventPayment, Donation
 class EventPaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = EventPayment
-        fields = "__all__"
+        exclude = ("authorization_url", "access_code")
 
 
 class DonationSerializer(serializers.ModelSerializer):
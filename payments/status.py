@@ -0,0 +1,77 @@
+"""
+Event payment status for the payment-success page.
+
+The outcome of an event payment is kept in the cache under its reference: "pending"
+until PaystackWebhookView publishes "success", with the attendee's Dawrah ID, or
+"failed" once its transaction commits. PaymentStatusView long-polls that key, so a
+waiting page costs cache reads rather than queries. A waiter in the worker that handled
+the webhook is woken at once; waiters in other workers see the change at their next
+read, every POLL_INTERVAL, as long as the cache is shared between workers.
+
+"pending" is only cached for PENDING_TIMEOUT, so a status page never waits on a stale
+"pending" for long if the outcome was published where it cannot see it (a cache that is
+not shared, an evicted key): once the key expires the next poll reads the database.
+"""
+
+import threading
+import time
+
+from django.core.cache import cache
+
+STATUS_KEY = "payment-status:{}"
+STATUS_TIMEOUT = 60 * 60 * 24
+POLL_INTERVAL = 0.5
+# A few POLL_INTERVALs, in whole seconds for cache backends that round timeouts.
+PENDING_TIMEOUT = 2
+
+PENDING = "pending"
+
+_published = 0
+_condition = threading.Condition()
+
+
+def get_payment_status(reference):
+    """
+    Returns:
+        dict or None: The cached {"status", "dawrah_id"} of the payment, if any.
+    """
+    return cache.get(STATUS_KEY.format(reference))
+
+
+def mark_payment_pending(reference):
+    """
+    Caches the payment as pending unless an outcome was published meanwhile.
+    """
+    cache.add(STATUS_KEY.format(reference), {"status": PENDING, "dawrah_id": None}, PENDING_TIMEOUT)
+
+
+def publish_payment_status(reference, status, dawrah_id=None):
+    """
+    Caches the outcome of a payment and wakes the requests waiting for it in this process.
+    """
+    global _published
+    cache.set(STATUS_KEY.format(reference), {"status": status, "dawrah_id": dawrah_id}, STATUS_TIMEOUT)
+    with _condition:
+        _published += 1
+        _condition.notify_all()
+
+
+def wait_for_payment_status(reference, timeout):
+    """
+    Waits up to `timeout` seconds for the payment to leave the pending state. The wait
+    ends early when the pending status expires, for the caller to read the database.
+
+    Returns:
+        dict or None: The cached status when the wait ended, pending or not, or None
+            once it expired.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        with _condition:
+            seen = _published
+        result = get_payment_status(reference)
+        remaining = deadline - time.monotonic()
+        if result is None or result["status"] != PENDING or remaining <= 0:
+            return result
+        with _condition:
+            _condition.wait_for(lambda: _published != seen, min(POLL_INTERVAL, remaining))
@@ -1,3 +1,394 @@
+import threading
+import time
+from smtplib import SMTPException
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from checkin.tickets import ticket_url
+from core.circuit import CircuitBreaker
+from core.query_budget import QueryLog
+from registration.models import Attendee
+from registration.utils import EmailThread
+from registration.views import AsyncRegistrationView
+
+from .emulator import run_paystack_emulator, sign
+from .models import Donor, EventPayment
+from .status import publish_payment_status
+from .utils import init_payment, send_deferred_payment_links
+
+
+def make_attendee(i=0):
+    return Attendee.objects.create(
+        first_name="Aisha",
+        last_name="Bello",
+        email=f"aisha{i}@example.com",
+        phone="08012345678",
+        department="Law",
+        level_of_study=100,
+        hall_off_residence="Mellanby",
+        level="beginner",
+    )
+
+
+class PaystackTestCase(TestCase):
+    """
+    Runs every test against a PaystackEmulator, self.paystack, whose webhooks are
+    posted to PaystackWebhookView through the test client.
+    """
+
+    paystack_options = {}
+
+    def setUp(self):
+        cache.clear()
+        emulator = run_paystack_emulator(deliver=self.post_webhook, **self.paystack_options)
+        self.paystack = emulator.__enter__()
+        self.addCleanup(emulator.__exit__, None, None, None)
+        # A fresh breaker per test, so failures do not leak between tests.
+        patcher = mock.patch.dict(
+            "core.circuit.breakers", {"paystack": CircuitBreaker("paystack", failures=1)}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Send confirmation emails, and render their tickets, before the webhook returns.
+        patcher = mock.patch.object(EmailThread, "start", EmailThread.run)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_webhook(self, body, headers):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("paystack-webhook"),
+                body,
+                content_type="application/json",
+                headers={"X-Paystack-Signature": headers["X-Paystack-Signature"]},
+            )
+        return response.status_code
+
+    def register(self, i=0, route="register"):
+        return self.client.post(
+            reverse(route),
+            {
+                "first_name": "Aisha",
+                "last_name": "Bello",
+                "email": f"aisha{i}@example.com",
+                "phone": "08012345678",
+                "department": "Law",
+                "level_of_study": 100,
+                "hall_off_residence": "Mellanby",
+                "level": "beginner",
+            },
+            content_type="application/json",
+        )
+
+
+class PaystackEmulatorTests(PaystackTestCase):
+    paystack_options = {"duplicate_rate": 1}
+
+    def test_registration_is_paid_through_signed_webhooks(self):
+        self.assertEqual(self.register().status_code, 201)
+        payment = EventPayment.objects.get()
+        self.assertEqual(payment.status, "initialized")
+        self.assertTrue(payment.authorization_url.startswith(self.paystack.base_url))
+
+        # Both deliveries of the duplicated webhook succeed, but only the first counts.
+        self.assertEqual(self.paystack.pay(payment.reference), [200, 200])
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "success")
+        self.assertIsNotNone(payment.attendee.dawrah_id)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_webhooks_are_signed_with_the_secret_key(self):
+        delivered = []
+        self.paystack.deliver = lambda body, headers: delivered.append((body, headers)) or 200
+        self.register()
+        self.paystack.pay(EventPayment.objects.get().reference, "failed")
+        body, headers = delivered[0]
+        self.assertEqual(headers["X-Paystack-Signature"], sign(body, self.paystack.secret_key))
+
+    def test_webhooks_without_a_valid_signature_are_rejected(self):
+        delivered = []
+        self.paystack.deliver = lambda body, headers: delivered.append(body) or 200
+        self.register()
+        payment = EventPayment.objects.get()
+        self.paystack.pay(payment.reference)
+        body = delivered[0]
+        for headers in ({}, {"X-Paystack-Signature": sign(body, "not-the-secret-key")}):
+            response = self.client.post(
+                reverse("paystack-webhook"), body, content_type="application/json", headers=headers
+            )
+            self.assertEqual(response.status_code, 401)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "initialized")
+        self.assertFalse(payment.attendee.paid)
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(
+            self.post_webhook(body, {"X-Paystack-Signature": sign(body, self.paystack.secret_key)}),
+            200,
+        )
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, "success")
+
+    def test_verify_and_list(self):
+        self.register()
+        reference = EventPayment.objects.get().reference
+        self.paystack.pay(reference)
+        base_url = self.paystack.base_url
+        auth = {"Authorization": f"Bearer {self.paystack.secret_key}"}
+        verified = requests.get(f"{base_url}/transaction/verify/{reference}", headers=auth)
+        self.assertEqual(verified.json()["data"]["status"], "success")
+        listed = requests.get(f"{base_url}/transaction?status=success", headers=auth)
+        self.assertEqual(listed.json()["meta"]["total"], 1)
+        self.assertEqual(requests.get(f"{base_url}/transaction").status_code, 401)
+
+
+class PaymentStatusTests(PaystackTestCase):
+    def setUp(self):
+        super().setUp()
+        self.attendee = make_attendee()
+        EventPayment.objects.create(
+            attendee=self.attendee, reference="REG-1", status="initialized", amount=2100
+        )
+
+    def get_status(self, reference="REG-1", wait=0):
+        return self.client.get(reverse("payment-status", args=[reference]), {"wait": wait})
+
+    def test_unknown_reference(self):
+        self.assertEqual(self.get_status("REG-404").status_code, 404)
+
+    def test_pending_payment_is_read_from_the_cache_after_the_first_poll(self):
+        with self.assertNumQueries(1):
+            response = self.get_status()
+        self.assertEqual(response.json()["data"]["status"], "pending")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_status().json()["data"]["status"], "pending")
+
+    def test_waiting_poll_answers_once_the_webhook_confirms(self):
+        self.get_status()
+        timer = threading.Timer(
+            0.2, publish_payment_status, args=("REG-1", "success", "SDW-0001")
+        )
+        timer.start()
+        start = time.monotonic()
+        with self.assertNumQueries(0):
+            response = self.get_status(wait=5)
+        timer.join()
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(
+            response.json()["data"],
+            {
+                "reference": "REG-1",
+                "status": "success",
+                "dawrah_id": "SDW-0001",
+                "ticket_url": "http://testserver" + ticket_url("SDW-0001"),
+            },
+        )
+
+    @mock.patch("payments.status.PENDING_TIMEOUT", 0.3)
+    def test_stale_pending_expires_when_the_outcome_was_published_elsewhere(self):
+        self.get_status()
+        # The webhook ran in a worker that does not share this worker's cache.
+        EventPayment.objects.filter(reference="REG-1").update(status="success")
+        with mock.patch("payments.status.cache", LocMemCache("elsewhere", {})):
+            publish_payment_status("REG-1", "success")
+        start = time.monotonic()
+        with self.assertNumQueries(1):
+            response = self.get_status(wait=5)
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(response.json()["data"]["status"], "success")
+
+    def test_webhook_publishes_the_dawrah_id(self):
+        self.register(1)
+        reference = EventPayment.objects.get(attendee__email="aisha1@example.com").reference
+        self.paystack.pay(reference)
+        with self.assertNumQueries(0):
+            data = self.get_status(reference).json()["data"]
+        self.assertEqual(data["status"], "success")
+        self.assertEqual(data["dawrah_id"], Attendee.objects.get(email="aisha1@example.com").dawrah_id)
+        self.assertIsNotNone(data["dawrah_id"])
+        self.assertEqual(self.client.get(data["ticket_url"]).status_code, 200)
+
+
+class InitPaymentTests(PaystackTestCase):
+    def setUp(self):
+        super().setUp()
+        self.attendee = make_attendee()
+
+    def test_outstanding_authorization_is_reused(self):
+        url = init_payment(self.attendee.email, 210000)
+        with self.assertNumQueries(2):
+            self.assertEqual(init_payment(self.attendee.email, 210000), url)
+        self.assertEqual(self.paystack.stats["requests"], 1)
+        payment = EventPayment.objects.get()
+        self.assertEqual(payment.authorization_url, url)
+        self.assertEqual(
+            payment.access_code, self.paystack.transactions[payment.reference]["access_code"]
+        )
+
+    def test_other_amount_is_a_new_transaction(self):
+        self.assertNotEqual(
+            init_payment(self.attendee.email, 210000), init_payment(self.attendee.email, 203000)
+        )
+        self.assertEqual(self.paystack.stats["requests"], 2)
+
+    def test_expired_authorization_is_replaced(self):
+        init_payment(self.attendee.email, 210000)
+        EventPayment.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        init_payment(self.attendee.email, 210000)
+        self.assertEqual(self.paystack.stats["requests"], 2)
+        self.assertEqual(
+            sorted(EventPayment.objects.values_list("status", flat=True)),
+            ["expired", "initialized"],
+        )
+
+    def test_retry_of_failed_payment(self):
+        self.attendee.delete()
+        self.register()
+        self.paystack.pay(EventPayment.objects.get().reference, "failed")
+        failed = EventPayment.objects.get(status="failed")
+        self.assertEqual(len(mail.outbox), 1)
+
+        response = self.client.post(
+            reverse("payment-retry"), {"reference": failed.reference}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["authorization_url"],
+            EventPayment.objects.get(status="initialized").authorization_url,
+        )
+
+        # Retrying again before paying hands out the same checkout.
+        again = self.client.post(
+            reverse("payment-retry"), {"reference": failed.reference}, content_type="application/json"
+        )
+        self.assertEqual(again.json()["authorization_url"], response.json()["authorization_url"])
+        self.assertEqual(self.paystack.stats["requests"], 2)
+
+    def test_retry_email_failure_keeps_the_failed_status(self):
+        self.attendee.delete()
+        self.register()
+        reference = EventPayment.objects.get().reference
+        with mock.patch("payments.utils.send_mail", side_effect=SMTPException), self.assertLogs(
+            "django.test", "ERROR"
+        ):
+            self.assertEqual(self.paystack.pay(reference, "failed"), [200])
+        self.assertEqual(EventPayment.objects.get().status, "failed")
+
+
+class DeferredPaymentTests(PaystackTestCase):
+    paystack_options = {"error_rate": 1}
+
+    def test_donation_is_refused_while_paystack_is_down(self):
+        response = self.client.post(
+            reverse("donation"),
+            {
+                "first_name": "Aisha",
+                "last_name": "Bello",
+                "email": "donor@example.com",
+                "phone": "08012345678",
+                "amount": 5000,
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["success"])
+        self.assertFalse(Donor.objects.exists())
+
+    def test_registrations_are_kept_while_paystack_is_down(self):
+        for i in range(3):
+            response = self.register(i)
+            self.assertEqual(response.status_code, 202)
+            self.assertIsNone(response.json()["payment_url"])
+        # The first failure opened the circuit; the others failed fast.
+        self.assertEqual(self.paystack.stats["requests"], 1)
+        self.assertEqual(EventPayment.objects.filter(status="deferred").count(), 3)
+
+        # Still down: nothing is sent, and the payments stay queued.
+        breaker = CircuitBreaker("paystack", failures=1, reset_timeout=0)
+        with mock.patch.dict("core.circuit.breakers", {"paystack": breaker}):
+            self.assertEqual(send_deferred_payment_links(), 0)
+            self.assertEqual(EventPayment.objects.filter(status="deferred").count(), 3)
+
+            self.paystack.error_rate = 0
+            self.assertEqual(send_deferred_payment_links(), 3)
+        self.assertFalse(EventPayment.objects.exclude(status="initialized").exists())
+        self.assertEqual(len(mail.outbox), 3)
+        payment = EventPayment.objects.get(attendee__email="aisha0@example.com")
+        self.assertIn(payment.authorization_url, mail.outbox[0].body)
+
+
+class AsyncRegistrationTests(PaystackTestCase):
+    def test_registration_is_paid_through_signed_webhooks(self):
+        with QueryLog() as log:
+            response = self.register(route="register-async")
+        self.assertEqual(response.status_code, 201)
+        # Savepoints are the test transaction's stand-ins for BEGIN and COMMIT.
+        queries = [sql for sql in log.queries if "SAVEPOINT" not in sql]
+        self.assertLessEqual(len(queries), AsyncRegistrationView.query_budget, log.format())
+        payment = EventPayment.objects.get()
+        self.assertEqual(response.json()["payment_url"], payment.authorization_url)
+        self.assertEqual(payment.amount, 210000)
+        self.assertIn("paystack;dur=", response["Server-Timing"])
+
+        self.assertEqual(self.paystack.pay(payment.reference), [200])
+        attendee = Attendee.objects.get()
+        self.assertTrue(attendee.paid)
+        again = self.register(route="register-async")
+        self.assertEqual(again.status_code, 400)
+        self.assertEqual(again.json()["message"], "You have already registered for this event.")
+
+    def test_unpaid_attendee_gets_the_outstanding_checkout(self):
+        first = self.register(route="register-async").json()["payment_url"]
+        # Registering again is charged at the re-registration amount, as on the sync view.
+        response = self.register(route="register-async")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["payment_url"],
+            EventPayment.objects.get(amount=203000).authorization_url,
+        )
+        self.assertNotEqual(response.json()["payment_url"], first)
+
+    def test_invalid_registration(self):
+        response = self.client.post(
+            reverse("register-async"), {"email": "aisha"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()["success"])
+        self.assertEqual(self.paystack.stats["requests"], 0)
+
+    def test_retry_of_failed_payment(self):
+        self.register(route="register-async")
+        self.paystack.pay(EventPayment.objects.get().reference, "failed")
+        failed = EventPayment.objects.get(status="failed")
+        response = self.client.post(
+            reverse("payment-retry-async"), {"reference": failed.reference}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["authorization_url"],
+            EventPayment.objects.get(status="initialized").authorization_url,
+        )
+        missing = self.client.post(
+            reverse("payment-retry-async"), {"reference": "REG-404"}, content_type="application/json"
+        )
+        self.assertEqual(missing.status_code, 404)
+
+
+class AsyncDeferredPaymentTests(PaystackTestCase):
+    paystack_options = {"error_rate": 1}
 
-# Create your tests here.
+    def test_registrations_are_kept_while_paystack_is_down(self):
+        for i in range(2):
+            response = self.register(i, route="register-async")
+            self.assertEqual(response.status_code, 202)
+            self.assertIsNone(response.json()["payment_url"])
+        self.assertEqual(self.paystack.stats["requests"], 1)
+        self.assertEqual(EventPayment.objects.filter(status="deferred").count(), 2)
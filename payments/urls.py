@@ -18,7 +18,17 @@ urlpatterns = [
         views.EventPaymentDetailView.as_view(),
         name="event-payment-detail",
     ),
+    path(
+        "status/<str:reference>/",
+        views.PaymentStatusView.as_view(),
+        name="payment-status",
+    ),
     path("donation/", views.DonorCreateListView.as_view(), name="donation"),
     path("donation/<int:pk>/", views.DonorDetailView.as_view(), name="donation-detail"),
     path("payment-retry/", views.PaymentRetryView.as_view(), name="payment-retry"),
+    path(
+        "payment-retry/async/",
+        views.AsyncPaymentRetryView.as_view(),
+        name="payment-retry-async",
+    ),
 ]
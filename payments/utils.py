@@ -1,89 +1,390 @@
+import asyncio
+import hashlib
+import hmac
+import logging
 import random
 import string
+import threading
 import time
+from datetime import timedelta
 
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
 from django.urls import reverse
+from django.utils import timezone
 
-from .models import EventPayment, Donation
+from core.circuit import CircuitOpen, get_breaker
+from core.timing import timed
+
+from .models import Donor, EventPayment, Donation
+from registration.capacity import CapacityFull, hold_places
 from registration.models import Attendee
 
+logger = logging.getLogger(__name__)
+
 
-def init_payment(email, amount, donation=False, existing_reference=None):
+def outstanding_payment(attendee, amount, now=None):
     """
-    Initialize a Paystack payment for the given email and amount.
+    Returns the attendee's initialized payment for the amount whose checkout has not
+    expired yet, if any.
+    """
+    return (
+        EventPayment.objects.filter(
+            attendee=attendee,
+            amount=amount,
+            status="initialized",
+            expires_at__gt=now or timezone.now(),
+        )
+        .order_by("-expires_at")
+        .first()
+    )
 
-    Args:
-        email (str): Email of the attendee initiating the payment.
-        amount (int): Payment amount in kobo (smallest currency unit).
 
-    Returns:
-        str: The Paystack authorization URL for completing the payment if successful.
-        None: If the payment initialization fails.
+class GatewayUnavailable(Exception):
+    """
+    Paystack failed, timed out, or is not being called because its circuit is open.
+    """
 
-    Notes:
-        - Ensures the payment is recorded in the database with 'initialized' status.
-        - Expects the email to match an attendee in the database.
-        - Verifies the Paystack response and handles errors gracefully.
+
+class PaymentDeferred(GatewayUnavailable):
+    """
+    Raised by init_payment(defer=True) when Paystack is unavailable, once the payment
+    is queued as a 'deferred' EventPayment. Its link is emailed by
+    `python manage.py send_deferred_payment_links` when Paystack recovers.
     """
 
-    paystack_url = "https://api.paystack.co/transaction/initialize"
-    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
+    def __init__(self, payment):
+        self.payment = payment
+        super().__init__(f"Payment {payment.reference} deferred")
+
+
+def verify_webhook_signature(body, signature):
+    """
+    Returns:
+        bool: Whether the x-paystack-signature header of a webhook is the HMAC-SHA512
+        of its raw body, keyed with PAYSTACK_SECRET_KEY, as Paystack signs them.
+    """
+    if not signature:
+        return False
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
 
+def new_reference():
     random_string = "".join(
         random.choices(string.ascii_uppercase + string.digits, k=6)
     )  # for generating unique reference
-    reference = existing_reference or f"REG-{int(time.time())}-{random_string}"
+    return f"REG-{int(time.time())}-{random_string}"
+
+
+def _initialize_request(email, amount, reference):
+    url = f"{settings.PAYSTACK_BASE_URL}/transaction/initialize"
+    headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
     data = {
         "email": email,
         "amount": amount,
         "reference": reference,
         "callback_url": f"https://{settings.FE_URL}/payment-success",
     }
-    response = requests.post(paystack_url, headers=headers, json=data)
-    response_data = response.json()
-
-    if response_data["status"]:
-        attendee = Attendee.objects.filter(email=email).first()
-        if not attendee:
-            raise ValueError("Attendee not found for the provided email.")
-        if donation:
-            payment, created = Donation.objects.get_or_create(
-                reference=reference,
-                defaults={
-                    "attendee": attendee,
-                    "amount": amount,
-                    "status": "initialized",
-                },
+    return url, headers, data
+
+
+def _transaction_data(response_data):
+    if not response_data.get("status"):
+        return None
+    return response_data["data"]
+
+
+def initialize_transaction(email, amount, reference):
+    """
+    Initialize a Paystack transaction through the "paystack" circuit breaker.
+
+    Returns:
+        dict: Paystack's transaction data, with authorization_url and access_code.
+        None: If Paystack declined the transaction.
+
+    Raises:
+        GatewayUnavailable: If the circuit is open, or the call failed or timed out.
+    """
+    paystack_url, headers, data = _initialize_request(email, amount, reference)
+    try:
+        with get_breaker("paystack").guard(), timed("paystack"):
+            response = requests.post(
+                paystack_url, headers=headers, json=data, timeout=settings.PAYSTACK_TIMEOUT
             )
-        else:
-            payment, created = EventPayment.objects.get_or_create(
-                reference=reference,
-                defaults={
-                    "attendee": attendee,
-                    "amount": amount,
-                    "status": "initialized",
-                },
+            if response.status_code >= 500:
+                response.raise_for_status()
+            response_data = response.json()
+    except (CircuitOpen, requests.RequestException, ValueError) as e:
+        raise GatewayUnavailable(str(e) or type(e).__name__) from e
+    return _transaction_data(response_data)
+
+
+# Under ASGI async views run on the server's event loop, but under WSGI, and in the
+# test client, Django calls them through async_to_sync, on an event loop of its own per
+# request. An httpx client's connections belong to the loop that opened them, so
+# Paystack is called from one long-lived loop per process, where the client and its
+# pool live, whichever loop the view runs on.
+_gateway_loop = None
+_gateway_client = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway_loop():
+    """
+    Returns the event loop Paystack calls run on, started in a daemon thread on first use.
+    """
+    global _gateway_loop
+    with _gateway_lock:
+        if _gateway_loop is None:
+            _gateway_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_gateway_loop.run_forever, name="paystack-gateway", daemon=True
+            ).start()
+    return _gateway_loop
+
+
+def get_async_client():
+    """
+    Returns the gateway loop's Paystack client; call it on that loop. Its connections
+    are kept alive and shared by every request of the process, at most
+    PAYSTACK_MAX_CONNECTIONS at once; further calls wait for a free connection,
+    within PAYSTACK_TIMEOUT.
+    """
+    global _gateway_client
+    if _gateway_client is None:
+        _gateway_client = httpx.AsyncClient(
+            timeout=settings.PAYSTACK_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+            ),
+        )
+    return _gateway_client
+
+
+async def _post(url, headers, data):
+    response = await get_async_client().post(url, headers=headers, json=data)
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return response.json()
+
+
+async def ainitialize_transaction(email, amount, reference):
+    """
+    initialize_transaction() for async code: the call runs on the gateway loop, with
+    get_async_client(), and is awaited from the caller's loop.
+
+    Returns:
+        dict: Paystack's transaction data, with authorization_url and access_code.
+        None: If Paystack declined the transaction.
+
+    Raises:
+        GatewayUnavailable: If the circuit is open, or the call failed or timed out.
+    """
+    paystack_url, headers, data = _initialize_request(email, amount, reference)
+    try:
+        with get_breaker("paystack").guard(), timed("paystack"):
+            future = asyncio.run_coroutine_threadsafe(
+                _post(paystack_url, headers, data), get_gateway_loop()
             )
+            response_data = await asyncio.wrap_future(future)
+    except (CircuitOpen, httpx.HTTPError, ValueError) as e:
+        raise GatewayUnavailable(str(e) or type(e).__name__) from e
+    return _transaction_data(response_data)
+
+
+def save_authorization(payment, data):
+    """
+    Saves Paystack's checkout on an event payment and marks it 'initialized', expiring
+    the attendee's stale initialized and deferred payments for the amount. Their
+    references stay, so a late webhook still finds them.
+    """
+    now = timezone.now()
+    stale = Q(status="deferred") | Q(
+        Q(expires_at__lte=now) | Q(expires_at__isnull=True), status="initialized"
+    )
+    EventPayment.objects.filter(
+        stale, attendee_id=payment.attendee_id, amount=payment.amount
+    ).exclude(pk=payment.pk).update(status="expired")
+    payment.status = "initialized"
+    payment.authorization_url = data["authorization_url"]
+    payment.access_code = data.get("access_code")
+    payment.expires_at = now + timedelta(minutes=settings.PAYSTACK_AUTHORIZATION_MINUTES)
+    payment.save()
+
+
+def init_payment(email, amount, donation=False, defer=False):
+    """
+    Initialize a Paystack payment for the given email and amount.
+
+    Args:
+        email (str): Email of the attendee or donor initiating the payment.
+        amount (int): Payment amount in kobo (smallest currency unit).
+        donation (bool): Whether the payment is a donation rather than an event payment.
+        defer (bool): Whether to queue an event payment when Paystack is unavailable.
+
+    Returns:
+        str: The Paystack authorization URL for completing the payment if successful.
+        None: If Paystack declined the payment.
+
+    Raises:
+        GatewayUnavailable: If Paystack is unavailable, see initialize_transaction().
+        PaymentDeferred: Instead, for event payments with defer=True.
+
+    Notes:
+        - An event payment initialized for the same attendee and amount less than
+          PAYSTACK_AUTHORIZATION_MINUTES ago is reused: its authorization URL is
+          returned without calling Paystack.
+        - Otherwise the payment is recorded in the database with 'initialized' status,
+          see save_authorization().
+        - Expects the email to match an attendee, or a donor for donations.
+    """
+    payer, authorization_url = _find_payer(email, amount, donation)
+    if authorization_url:
+        return authorization_url
+
+    reference = new_reference()
+    try:
+        data = initialize_transaction(email, amount, reference)
+    except GatewayUnavailable:
+        if donation or not defer:
+            raise
+        raise PaymentDeferred(_defer_payment(payer, amount, reference))
+
+    if data is None:
+        return None
+    _record_transaction(payer, reference, amount, data, donation)
+    return data["authorization_url"]
+
+
+async def ainit_payment(email, amount, donation=False, defer=False):
+    """
+    init_payment() for async views. Paystack is called on the event loop and the
+    queries run in short sync_to_async steps, so neither a thread nor a transaction is
+    held while Paystack answers. Takes the same arguments, and returns and raises the same.
+    """
+    payer, authorization_url = await sync_to_async(_find_payer)(email, amount, donation)
+    if authorization_url:
+        return authorization_url
+
+    reference = new_reference()
+    try:
+        data = await ainitialize_transaction(email, amount, reference)
+    except GatewayUnavailable:
+        if donation or not defer:
+            raise
+        raise PaymentDeferred(await sync_to_async(_defer_payment)(payer, amount, reference))
+
+    if data is None:
+        return None
+    await sync_to_async(transaction.atomic(_record_transaction))(
+        payer, reference, amount, data, donation
+    )
+    return data["authorization_url"]
+
+
+def _find_payer(email, amount, donation):
+    """
+    Returns:
+        tuple: The attendee, or donor, and the authorization URL of the attendee's
+            outstanding payment for the amount, if any.
+    """
+    if donation:
+        payer = Donor.objects.filter(email=email).order_by("-date_created").first()
+        if not payer:
+            raise ValueError("Donor not found for the provided email.")
+        return payer, None
+    payer = Attendee.objects.filter(email=email).first()
+    if not payer:
+        raise ValueError("Attendee not found for the provided email.")
+    payment = outstanding_payment(payer, amount)
+    return payer, payment.authorization_url if payment else None
+
+
+def _defer_payment(attendee, amount, reference):
+    return EventPayment.objects.filter(
+        attendee=attendee, amount=amount, status="deferred"
+    ).first() or EventPayment.objects.create(
+        attendee=attendee, reference=reference, amount=amount, status="deferred"
+    )
 
-        if not created:
-            payment.status = "initialized"
+
+def _record_transaction(payer, reference, amount, data, donation):
+    if donation:
+        Donation.objects.create(
+            donor=payer, reference=reference, amount=amount, status="initialized"
+        )
+    else:
+        save_authorization(EventPayment(attendee=payer, reference=reference, amount=amount), data)
+
+
+def send_deferred_payment_links():
+    """
+    Initializes deferred event payments with Paystack, oldest first, holds the
+    attendees' places again and emails them their payment links. Stops at the first
+    Paystack failure, leaving the rest for the next run.
+
+    Returns:
+        int: The number of links sent.
+    """
+    sent = 0
+    deferred = EventPayment.objects.filter(status="deferred").select_related("attendee")
+    for payment in deferred.order_by("paid_at"):
+        attendee = payment.attendee
+        try:
+            hold_places(attendee)
+        except CapacityFull as e:
+            logger.warning("Deferred payment %s dropped: %s", payment.reference, e)
+            payment.status = "failed"
+            payment.message = str(e)
+            payment.save()
+            continue
+
+        # A fresh reference, in case an earlier attempt reached Paystack but timed out.
+        payment.reference = new_reference()
+        try:
+            data = initialize_transaction(attendee.email, int(payment.amount), payment.reference)
+        except GatewayUnavailable as e:
+            logger.warning("Deferred payments left for later: %s", e)
+            break
+        if data is None:
+            payment.status = "failed"
+            payment.message = "Declined by Paystack"
             payment.save()
+            continue
 
-        return response_data["data"]["authorization_url"]
-    return None
+        save_authorization(payment, data)
+        send_payment_link_email(attendee, data["authorization_url"])
+        sent += 1
+    return sent
+
+
+def send_payment_link_email(attendee, payment_url):
+    with timed("smtp"):
+        send_mail(
+            subject="Dawrah - Complete Your Payment",
+            message=f"Your registration is saved. Complete your payment by clicking the link below:\n{payment_url}",
+            from_email="MSSNUI DAWRAH",
+            recipient_list=[attendee.email],
+            fail_silently=False,
+        )
 
 
 def send_payment_retry_email(attendee, reference, request):
     # retry_url = request.build_absolute_uri(reverse("payments:payment-retry", kwargs={"reference": reference}))
     retry_url = f"{settings.FE_URL}/retry-payment?reference={reference}"
-    send_mail(
-        subject="Dawrah - Payment Retry Link",
-        message=f"You can retry your payment by clicking the link below:\n{retry_url}",
-        from_email="MSSNUI DAWRAH",
-        recipient_list=[attendee.email],
-        fail_silently=False,
-    )
+    with timed("smtp"):
+        send_mail(
+            subject="Dawrah - Payment Retry Link",
+            message=f"You can retry your payment by clicking the link below:\n{retry_url}",
+            from_email="MSSNUI DAWRAH",
+            recipient_list=[attendee.email],
+            fail_silently=False,
+        )
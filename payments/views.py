@@ -1,3 +1,6 @@
+import logging
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.db import transaction
 
@@ -7,19 +10,49 @@ from rest_framework import generics
 from rest_framework.response import Response
 from rest_framework import permissions
 
-from drf_spectacular.utils import extend_schema
-
-from payments.utils import init_payment, send_payment_retry_email
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+
+from checkin.tickets import ticket_url
+from core.admission import admit_as
+from core.async_views import AsyncAPIView
+from core.cache import cache_response
+from core.coalesce import single_flight
+from core.db_router import ReplicaReadMixin
+from core.query_budget import limit_queries
+from core.serializers import RowSerializer
+from payments.utils import (
+    GatewayUnavailable,
+    PaymentDeferred,
+    ainit_payment,
+    init_payment,
+    send_payment_retry_email,
+    verify_webhook_signature,
+)
+from registration.capacity import CapacityFull, confirm_places, hold_places, release_places
 from registration.models import Attendee
 
 from .models import Donor, EventPayment, Donation
 from .serializers import DonorSerializer, EventPaymentSerializer, DonationSerializer
+from .status import (
+    PENDING,
+    get_payment_status,
+    mark_payment_pending,
+    publish_payment_status,
+    wait_for_payment_status,
+)
 from registration.utils import generate_unique_id, send_confirmation_email
 
+logger = logging.getLogger(__name__)
+
 
 @extend_schema(tags=["Webhook"])
 class PaystackWebhookView(APIView):
-    @transaction.atomic
+    # Paystack authenticates with the payload signature, not a user token.
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    admission_class = "webhook"
+    query_budget = 5
+
     @extend_schema(
         request=None,
         responses={
@@ -38,6 +71,13 @@ class PaystackWebhookView(APIView):
                     "message": {"type": "string"},
                 },
             },
+            401: {
+                "type": "object",
+                "properties": {
+                    "success": {"type": "boolean"},
+                    "message": {"type": "string"},
+                },
+            },
             404: {
                 "type": "object",
                 "properties": {
@@ -55,9 +95,18 @@ class PaystackWebhookView(APIView):
         },
     )
     def post(self, request):
-        signature = request.headers.get("x-paystack-signature")
-        body = request.body
+        # Checked before the transaction, so a forged webhook never takes the write lock.
+        if not verify_webhook_signature(
+            request.body, request.headers.get("x-paystack-signature")
+        ):
+            return Response(
+                {"success": False, "message": "Invalid signature"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        return self.handle_event(request)
 
+    @transaction.atomic
+    def handle_event(self, request):
         # Ensure the payload is valid
         payload = request.data
         event = payload.get("event", "")
@@ -77,7 +126,19 @@ class PaystackWebhookView(APIView):
 
                 # Attempt to update EventPayment or Donation
                 try:
-                    payment = EventPayment.objects.get(reference=reference)
+                    payment = EventPayment.objects.select_related("attendee").get(
+                        reference=reference
+                    )
+                    if payment.status == status_text:
+                        # Paystack delivers some webhooks more than once.
+                        return Response(
+                            {
+                                "success": True,
+                                "message": "Payment already processed",
+                                "reference": reference,
+                            },
+                            status=status.HTTP_200_OK,
+                        )
                     payment.status = status_text
                     payment.amount = amount
                     payment.save()
@@ -86,7 +147,11 @@ class PaystackWebhookView(APIView):
                     attendee.paid = True
                     generate_unique_id(attendee)
                     attendee.save()
-                    send_confirmation_email(attendee)
+                    confirm_places(attendee)
+                    transaction.on_commit(
+                        lambda: publish_payment_status(reference, status_text, attendee.dawrah_id)
+                    )
+                    transaction.on_commit(lambda: send_confirmation_email(attendee))
 
                 except EventPayment.DoesNotExist:
                     # Handle Donation
@@ -116,16 +181,29 @@ class PaystackWebhookView(APIView):
 
                 # Update EventPayment or Donation
                 try:
-                    payment = EventPayment.objects.get(reference=reference)
+                    payment = EventPayment.objects.select_related("attendee").get(
+                        reference=reference
+                    )
                     payment.status = status_text
                     payment.save()
-                    send_payment_retry_email(payment.attendee, reference, request)
+                    release_places(payment.attendee)
+                    transaction.on_commit(lambda: publish_payment_status(reference, status_text))
+                    # After the commit: SMTP neither holds the write lock nor rolls back the status.
+                    transaction.on_commit(
+                        lambda: send_payment_retry_email(payment.attendee, reference, request),
+                        robust=True,
+                    )
                 except EventPayment.DoesNotExist:
                     try:
-                        donation = Donation.objects.get(reference=reference)
+                        donation = Donation.objects.select_related("donor").get(
+                            reference=reference
+                        )
                         donation.status = status_text
                         donation.save()
-                        send_payment_retry_email(donation.donor, reference, request)
+                        transaction.on_commit(
+                            lambda: send_payment_retry_email(donation.donor, reference, request),
+                            robust=True,
+                        )
                     except Donation.DoesNotExist:
                         return Response(
                             {"success": False, "message": "Invalid reference"},
@@ -138,7 +216,7 @@ class PaystackWebhookView(APIView):
                 )
 
         except Exception as e:
-            print(str(e))
+            logger.exception("Paystack webhook failed: %s", e)
             return Response(
                 {"success": False, "message": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -146,7 +224,7 @@ class PaystackWebhookView(APIView):
 
 
 @extend_schema(tags=["Payment"])
-class EventPaymentListView(generics.ListAPIView):
+class EventPaymentListView(ReplicaReadMixin, generics.ListAPIView):
     """
     EventPaymentListView is a view that handles the retrieval of event payments.
     Attributes:
@@ -162,24 +240,112 @@ class EventPaymentListView(generics.ListAPIView):
 
     serializer_class = EventPaymentSerializer
     queryset = EventPayment.objects.all()
+    row_serializer = RowSerializer(EventPaymentSerializer)
+    admission_class = "organizer"
+    query_budget = 2
 
     @extend_schema(tags=["Payment"])
+    @single_flight()
+    @cache_response("payments")
     def get(self, request, *args, **kwargs):
         payment_status = kwargs.get("status", None)
         if payment_status is not None:
             payments = self.queryset.filter(status=payment_status)
         else:
             payments = self.get_queryset()
-        serializer = self.get_serializer(payments, many=True)
+        rows = self.row_serializer.values(payments)
         context = {
             "message": "Payments retrieved successfully",
-            "data": serializer.data,
+            "data": self.row_serializer.to_representation(rows),
         }
         return Response(context, status=status.HTTP_200_OK)
 
 
+class PaymentStatusView(APIView):
+    """
+    PaymentStatusView lets the payment-success page wait for the webhook to confirm a payment.
+    Attributes:
+        MAX_WAIT (int): The longest, in seconds, a request waits for the outcome.
+    Methods:
+        get(request, reference):
+            Handles GET requests for the status of the event payment with the given reference.
+            Waits up to `wait` seconds (default and at most MAX_WAIT) while the payment is
+            pending, answering as soon as the webhook publishes its outcome, then returns the
+            status ("pending", "success" or "failed") and the attendee's Dawrah ID and signed
+            QR ticket URL once paid.
+            Pending payments are read from the cache, see payments/status.py; the database
+            is only queried when the cache has no status for the reference, at most twice.
+    """
+
+    MAX_WAIT = 20
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    admission_class = "payment_status"
+    query_budget = 2
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "wait", int, description="Seconds to wait for the payment to leave the pending state"
+            )
+        ],
+        tags=["Payment"],
+    )
+    def get(self, request, reference):
+        try:
+            wait = min(max(int(request.query_params.get("wait", self.MAX_WAIT)), 0), self.MAX_WAIT)
+        except ValueError:
+            wait = self.MAX_WAIT
+
+        result = get_payment_status(reference) or self.read_status(reference)
+        if result is None:
+            return Response(
+                {"success": False, "message": "Payment not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if result["status"] == PENDING and wait:
+            # The pending status expires during a long wait; ask the database once more then.
+            result = wait_for_payment_status(reference, wait) or self.read_status(reference) or result
+
+        data = {"reference": reference, **result}
+        if result["dawrah_id"]:
+            data["ticket_url"] = request.build_absolute_uri(ticket_url(result["dawrah_id"]))
+        return Response(
+            {
+                "success": True,
+                "message": "Payment status retrieved successfully",
+                "data": data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    @staticmethod
+    def read_status(reference):
+        """
+        Reads the payment's status from the database, when the cache has none, and caches it.
+
+        Returns:
+            dict or None: The {"status", "dawrah_id"} of the payment, None if there is none.
+        """
+        row = (
+            EventPayment.objects.filter(reference=reference)
+            .values_list("status", "attendee__dawrah_id")
+            .first()
+        )
+        if row is None:
+            return None
+        payment_status, dawrah_id = row
+        if payment_status in ("success", "failed"):
+            publish_payment_status(reference, payment_status, dawrah_id)
+            return {"status": payment_status, "dawrah_id": dawrah_id}
+        mark_payment_pending(reference)
+        return {"status": PENDING, "dawrah_id": None}
+
+
 @extend_schema(tags=["Payment"])
-class EventPaymentDetailView(generics.RetrieveAPIView):
+class EventPaymentDetailView(ReplicaReadMixin, generics.RetrieveAPIView):
     """
     EventPaymentDetailView is a view that handles the retrieval of a specific event payment.
     Attributes:
@@ -193,8 +359,11 @@ class EventPaymentDetailView(generics.RetrieveAPIView):
 
     serializer_class = EventPaymentSerializer
     queryset = EventPayment.objects.all()
+    admission_class = "organizer"
+    query_budget = 2
 
     @extend_schema(tags=["Payment"])
+    @cache_response("payments")
     def get(self, request, *args, **kwargs):
         payment = self.get_object()
         serializer = self.get_serializer(payment)
@@ -207,7 +376,7 @@ class EventPaymentDetailView(generics.RetrieveAPIView):
 
 
 @extend_schema(tags=["Donation"])
-class DonorCreateListView(generics.ListCreateAPIView):
+class DonorCreateListView(ReplicaReadMixin, generics.ListCreateAPIView):
     """
     API endpoint that allows donors to donate to the event.
 
@@ -229,6 +398,9 @@ class DonorCreateListView(generics.ListCreateAPIView):
 
     serializer_class = DonorSerializer
     queryset = Attendee.objects.all()
+    row_serializer = RowSerializer(DonorSerializer)
+    admission_class = "organizer"
+    query_budget = 4
 
     def get_permissions(self):
         if self.request.method == "POST":
@@ -238,22 +410,39 @@ class DonorCreateListView(generics.ListCreateAPIView):
         return super(DonorCreateListView, self).get_permissions()
 
     @extend_schema(tags=["Donation"])
+    @single_flight()
+    @cache_response("donors")
     def get(self, request, *args, **kwargs):
-        donors = Donor.objects.all()
-        serializer = self.get_serializer(donors, many=True)
-        context = {"message": "Donors retrieved successfully", "data": serializer.data}
+        rows = self.row_serializer.values(Donor.objects.all())
+        context = {
+            "message": "Donors retrieved successfully",
+            "data": self.row_serializer.to_representation(rows),
+        }
         return Response(context, status=status.HTTP_200_OK)
 
     @extend_schema(tags=["Donation"])
+    @admit_as("registration")
     def post(self, request, *args, **kwargs):
         serializer = DonorSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         headers = self.get_success_headers(serializer.data)
 
-        payment_url = init_payment(
-            dict(serializer.data).get("email"), dict(serializer.data).get("amount"), donation=True
-        )
+        try:
+            payment_url = init_payment(
+                dict(serializer.data).get("email"), dict(serializer.data).get("amount"), donation=True
+            )
+        except GatewayUnavailable as e:
+            logger.warning("Donation not initialized: %s", e)
+            # Nothing to pay yet: a retry registers the donor again.
+            serializer.instance.delete()
+            return Response(
+                {
+                    "success": False,
+                    "message": "The payment service is unavailable, please try again shortly",
+                },
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
         context = {
             "success": True,
             "message": "Donation successful. Thank you for your support",
@@ -264,7 +453,7 @@ class DonorCreateListView(generics.ListCreateAPIView):
 
 
 @extend_schema(tags=["Donation"])
-class DonorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DonorDetailView(ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     API endpoint that allows donors to donate to the event.
 
@@ -288,12 +477,16 @@ class DonorDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     serializer_class = DonorSerializer
     queryset = Donor.objects.all()
+    admission_class = "organizer"
+    query_budget = 5
 
     def get_permissions(self):
         self.permission_classes = [permissions.IsAdminUser]
         return super(DonorDetailView, self).get_permissions()
 
     @extend_schema(tags=["Donation"])
+    @limit_queries(2)
+    @cache_response("donors")
     def get(self, request, *args, **kwargs):
         donor = self.get_object()
         serializer = self.get_serializer(donor)
@@ -322,7 +515,7 @@ class DonorDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 @extend_schema(tags=["Donation"])
-class DonationListView(generics.ListAPIView):
+class DonationListView(ReplicaReadMixin, generics.ListAPIView):
     """
     DonorListView is a view that handles the retrieval of donors.
     Attributes:
@@ -336,20 +529,99 @@ class DonationListView(generics.ListAPIView):
 
     serializer_class = DonationSerializer
     queryset = Donation.objects.all()
+    row_serializer = RowSerializer(DonationSerializer)
+    admission_class = "organizer"
+    query_budget = 2
 
     @extend_schema(tags=["Donation"])
+    @single_flight()
+    @cache_response("donations")
     def get(self, request, *args, **kwargs):
-        donations = Donation.objects.all()
-        serializer = self.get_serializer(donations, many=True)
+        rows = self.row_serializer.values(Donation.objects.all())
         context = {
             "success": True,
             "message": "Donors retrieved successfully",
-            "data": serializer.data,
+            "data": self.row_serializer.to_representation(rows),
         }
         return Response(context, status=status.HTTP_200_OK)
 
 
-class PaymentRetryView(APIView):
+class PaymentRetryMixin:
+    """
+    The steps of a payment retry shared by PaymentRetryView and AsyncPaymentRetryView,
+    around the call to Paystack.
+    """
+
+    def prepare_retry(self, reference):
+        """
+        Finds the payment to retry and, for event payments, holds the attendee's places again.
+
+        Returns:
+            tuple: The payer's email, the amount and whether it is a donation.
+            Response: If the payment cannot be retried.
+        """
+        if not reference:
+            return Response(
+                {"status": "error", "message": "Reference not provided"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Look for the payment in both models
+        payment = EventPayment.objects.filter(reference=reference).first()
+        if not payment:
+            payment = Donation.objects.filter(reference=reference).first()
+
+        if not payment:
+            return Response(
+                {"status": "error", "message": "Payment not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if payment.status == "success":
+            return Response(
+                {"status": "error", "message": "Payment already completed"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        donation = isinstance(payment, Donation)
+        if not donation:
+            # A failed payment released the attendee's places; hold them again.
+            try:
+                hold_places(payment.attendee)
+            except CapacityFull as exc:
+                return Response(
+                    {"status": "error", "message": f"No places left in {exc.capacity.name}"},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+        # Paystack refuses a used reference, so the retry is a new transaction for the
+        # same amount, or the attendee's outstanding one if its checkout is still valid.
+        email = payment.donor.email if donation else payment.attendee.email
+        return email, int(payment.amount), donation
+
+    def deferred_response(self):
+        return Response(
+            {"status": "deferred", "message": "Your payment link will be emailed to you shortly"},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    def retry_response(self, authorization_url):
+        if authorization_url:
+            return Response(
+                {"status": "success", "authorization_url": authorization_url},
+                status=status.HTTP_200_OK,
+            )
+
+        return Response(
+            {"status": "error", "message": "Failed to initialize payment"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+class PaymentRetryView(PaymentRetryMixin, APIView):
+    admission_class = "registration"
+    query_budget = 6
+
     @extend_schema(
         request={
             "application/json": {
@@ -394,41 +666,42 @@ class PaymentRetryView(APIView):
     )
     def post(self, request):
         reference = request.data.get("reference")
-        if not reference:
-            return Response(
-                {"status": "error", "message": "Reference not provided"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
-        # Look for the payment in both models
-        payment = EventPayment.objects.filter(reference=reference).first()
-        if not payment:
-            payment = Donation.objects.filter(reference=reference).first()
+        result = self.prepare_retry(reference)
+        if isinstance(result, Response):
+            return result
+        email, amount, donation = result
+        try:
+            authorization_url = init_payment(email, amount, donation=donation, defer=not donation)
+        except PaymentDeferred:
+            return self.deferred_response()
+        except Exception:
+            logger.exception("Payment retry failed for %s", reference)
+            authorization_url = None
+        return self.retry_response(authorization_url)
 
-        if not payment:
-            return Response(
-                {"status": "error", "message": "Payment not found"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
 
-        # Extract email, amount, and callback URL
-        email = payment.attendee.email if isinstance(payment, EventPayment) else payment.donor.email
-        amount = payment.amount
-        callback_url = f"https://{settings.FE_URL}/payment-success"
+class AsyncPaymentRetryView(PaymentRetryMixin, AsyncAPIView):
+    """
+    PaymentRetryView for ASGI workers: Paystack is called on the event loop, see
+    AsyncRegistrationView.
+    """
 
-        # Reinitialize payment using the utility function
-        response_data = init_payment(email, amount, reference, callback_url)
+    admission_class = "async_registration"
+    query_budget = 6
 
-        if response_data and response_data.get("status"):
-            return Response(
-                {
-                    "status": "success",
-                    "authorization_url": response_data["data"]["authorization_url"],
-                },
-                status=status.HTTP_200_OK,
+    async def post(self, request, *args, **kwargs):
+        reference = request.data.get("reference")
+        result = await sync_to_async(self.prepare_retry)(reference)
+        if isinstance(result, Response):
+            return result
+        email, amount, donation = result
+        try:
+            authorization_url = await ainit_payment(
+                email, amount, donation=donation, defer=not donation
             )
-
-        return Response(
-            {"status": "error", "message": "Failed to initialize payment"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+        except PaymentDeferred:
+            return self.deferred_response()
+        except Exception:
+            logger.exception("Payment retry failed for %s", reference)
+            authorization_url = None
+        return self.retry_response(authorization_url)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class RegistrationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "registration"
+
+    def ready(self):
+        from core.cache import invalidate_on_save
+
+        from .models import Attendee
+
+        invalidate_on_save(Attendee, "attendees")
@@ -0,0 +1,145 @@
+"""
+Seat capacity with reservation holds.
+
+Registering holds a place in every Capacity that applies to the attendee: the ones
+without a level (venue seats, meal tickets) and the one for their level, if any. A
+place is taken with a single conditional UPDATE:
+
+    UPDATE capacity SET held = held + 1 WHERE id = %s AND "limit" > held + confirmed
+
+so concurrent registrations can never take more places than the limit, and checking
+availability never counts rows. A successful payment confirms the holds, a failed one
+releases them, and holds that expire unpaid are released by
+`python manage.py release_expired_holds` (every minute, see CRONJOBS) or, when a
+capacity looks full, by the registration that needs the place.
+
+Without any Capacity rows registration is unlimited.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Capacity, Hold
+
+logger = logging.getLogger(__name__)
+
+class CapacityFull(Exception):
+    def __init__(self, capacity):
+        self.capacity = capacity
+        super().__init__(f"No places left in {capacity.name}")
+
+
+def _take_place(capacity_id):
+    return Capacity.objects.filter(
+        pk=capacity_id, limit__gt=F("held") + F("confirmed")
+    ).update(held=F("held") + 1)
+
+
+def _take_or_sweep(capacity, now):
+    if _take_place(capacity.pk):
+        return
+    # Full, unless unpaid holds expired and were not swept yet.
+    if release_expired_holds(now=now, capacity_id=capacity.pk) and _take_place(capacity.pk):
+        return
+    raise CapacityFull(capacity)
+
+
+def hold_places(attendee, now=None):
+    """
+    Holds a place for the attendee in every capacity that applies to them, or renews
+    the holds they already have, until REGISTRATION_HOLD_MINUTES from now.
+
+    Raises:
+        CapacityFull: When any capacity is full. No place is taken then.
+    """
+    now = now or timezone.now()
+    expires_at = now + timedelta(minutes=settings.REGISTRATION_HOLD_MINUTES)
+    capacities = list(Capacity.objects.filter(Q(level="") | Q(level=attendee.level)))
+    if not capacities:
+        return
+    try:
+        _hold(attendee, capacities, now, expires_at)
+    except IntegrityError:
+        # A concurrent hold_places() for the attendee created one of the holds after
+        # they were read; this attempt was rolled back, and holding again renews it.
+        _hold(attendee, capacities, now, expires_at)
+
+
+def _hold(attendee, capacities, now, expires_at):
+    holds = {hold.capacity_id: hold for hold in Hold.objects.filter(attendee=attendee)}
+
+    with transaction.atomic():
+        for capacity in capacities:
+            hold = holds.get(capacity.pk)
+            if hold is None:
+                Hold.objects.create(attendee=attendee, capacity=capacity, expires_at=expires_at)
+                _take_or_sweep(capacity, now)
+            elif hold.status == Hold.HELD and Hold.objects.filter(
+                pk=hold.pk, status=Hold.HELD
+            ).update(expires_at=expires_at):
+                continue
+            elif Hold.objects.filter(pk=hold.pk, status=Hold.RELEASED).update(
+                status=Hold.HELD, expires_at=expires_at
+            ):
+                _take_or_sweep(capacity, now)
+            # Otherwise the hold is confirmed: the attendee already has the place.
+
+
+def confirm_places(attendee):
+    """
+    Confirms the attendee's holds after a successful payment. A hold that was released
+    before the payment arrived is confirmed anyway, since the attendee has paid, even if
+    that takes its capacity over the limit.
+    """
+    for hold in Hold.objects.filter(attendee=attendee).exclude(status=Hold.CONFIRMED):
+        if Hold.objects.filter(pk=hold.pk, status=Hold.HELD).update(status=Hold.CONFIRMED):
+            Capacity.objects.filter(pk=hold.capacity_id).update(
+                held=F("held") - 1, confirmed=F("confirmed") + 1
+            )
+        elif Hold.objects.filter(pk=hold.pk, status=Hold.RELEASED).update(status=Hold.CONFIRMED):
+            Capacity.objects.filter(pk=hold.capacity_id).update(confirmed=F("confirmed") + 1)
+            logger.warning(
+                "Confirmed a released hold of attendee %s in capacity %s after a late payment",
+                attendee.pk,
+                hold.capacity_id,
+            )
+
+
+def release_places(attendee):
+    """
+    Releases the attendee's unconfirmed holds, e.g. after a failed payment.
+    """
+    _release(Hold.objects.filter(attendee=attendee, status=Hold.HELD))
+
+
+def release_expired_holds(now=None, capacity_id=None):
+    """
+    Releases unconfirmed holds whose time is up.
+
+    Returns:
+        int: The number of holds released.
+    """
+    holds = Hold.objects.filter(status=Hold.HELD, expires_at__lte=now or timezone.now())
+    if capacity_id is not None:
+        holds = holds.filter(capacity_id=capacity_id)
+    return _release(holds)
+
+
+def _release(holds):
+    released = 0
+    by_capacity = {}
+    for pk, capacity_id in holds.values_list("pk", "capacity_id"):
+        by_capacity.setdefault(capacity_id, []).append(pk)
+    with transaction.atomic():
+        for capacity_id, pks in by_capacity.items():
+            # Only holds still held are counted, so a hold confirmed meanwhile is left alone.
+            count = Hold.objects.filter(pk__in=pks, status=Hold.HELD).update(status=Hold.RELEASED)
+            if count:
+                Capacity.objects.filter(pk=capacity_id).update(held=F("held") - count)
+                released += count
+    return released
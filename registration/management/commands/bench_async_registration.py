@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import httpx
+import uvicorn
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.asgi import AsyncViewsHandler
+from core.management.commands.load_test import free_port
+from payments.emulator import run_paystack_emulator
+from registration.views import AsyncRegistrationView, RegistrationView
+
+from .bench_registration_concurrency import percentile
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    wsgiref's server handing connections to a fixed pool of threads, as a threaded
+    WSGI worker such as gunicorn's gthread does.
+    """
+
+    request_queue_size = 2048
+
+    def __init__(self, server_address, handler_class, threads):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many registrations one worker keeps in flight while Paystack is slow: "
+        "the sync view on a threaded WSGI server against the async view on uvicorn, over "
+        "HTTP, with a throwaway file-based database and a Paystack emulator. Throttles and "
+        "admission control are off, so the servers themselves are measured"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--registrations", type=int, default=400, help="Per server")
+        parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight")
+        parser.add_argument("--threads", type=int, default=16, help="Threads of the WSGI worker")
+        parser.add_argument("--paystack-latency", default="0.5", help="e.g. lognormal:0.3:0.6")
+        parser.add_argument(
+            "--servers", nargs="+", choices=["wsgi", "asgi"], default=["wsgi", "asgi"]
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "bench.sqlite3")
+            old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+            try:
+                with override_settings(
+                    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                    ADMISSION_CLASSES={},
+                ), run_paystack_emulator(
+                    latency=options["paystack_latency"], seed=0
+                ) as paystack, mock.patch.object(
+                    RegistrationView, "throttle_classes", []
+                ), mock.patch.object(
+                    AsyncRegistrationView, "throttle_classes", []
+                ):
+                    results = []
+                    for offset, server in enumerate(options["servers"]):
+                        run = self.run_wsgi if server == "wsgi" else self.run_asgi
+                        results.append(run(paystack, offset * options["registrations"], options))
+                    self.stdout.write(json.dumps(results, indent=2))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_wsgi(self, paystack, offset, options):
+        server = PooledWSGIServer(("127.0.0.1", 0), QuietHandler, options["threads"])
+        server.set_app(get_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+        thread.start()
+        host, port = server.server_address[:2]
+        try:
+            result = self.load(f"http://{host}:{port}{reverse('register')}", paystack, offset, options)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        return {"server": "wsgi", "threads": options["threads"], **result}
+
+    def run_asgi(self, paystack, offset, options):
+        host, port = "127.0.0.1", free_port()
+        server = uvicorn.Server(
+            uvicorn.Config(
+                AsyncViewsHandler(),
+                host=host,
+                port=port,
+                lifespan="off",
+                log_level="warning",
+                backlog=2048,
+            )
+        )
+        thread = threading.Thread(target=server.run)
+        thread.start()
+        while not server.started and thread.is_alive():
+            time.sleep(0.05)
+        try:
+            result = self.load(
+                f"http://{host}:{port}{reverse('register-async')}", paystack, offset, options
+            )
+        finally:
+            server.should_exit = True
+            thread.join()
+        return {"server": "asgi", **result}
+
+    def load(self, url, paystack, offset, options):
+        """
+        Posts the registrations with at most --concurrency in flight.
+
+        Returns:
+            dict: Throughput, latency percentiles, status codes and the most Paystack
+                calls the server had in flight at once.
+        """
+        with paystack._lock:
+            paystack.stats["peak_in_flight"] = 0
+        latencies, statuses = [], Counter()
+        concurrency = options["concurrency"]
+
+        async def register(client, semaphore, i):
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=self.attendee(i))
+                    statuses[str(response.status_code)] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - start)
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            limits = httpx.Limits(max_connections=concurrency)
+            async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+                await asyncio.gather(
+                    *(register(client, semaphore, offset + i) for i in range(options["registrations"]))
+                )
+
+        start = time.perf_counter()
+        asyncio.run(run())
+        wall = time.perf_counter() - start
+        return {
+            "concurrency": concurrency,
+            "requests": len(latencies),
+            "status_codes": dict(statuses),
+            "throughput_rps": round(len(latencies) / wall, 1),
+            "latency_ms": {
+                "p50": round(percentile(latencies, 0.5) * 1000, 2),
+                "p95": round(percentile(latencies, 0.95) * 1000, 2),
+                "p99": round(percentile(latencies, 0.99) * 1000, 2),
+            },
+            "paystack_peak_in_flight": paystack.stats["peak_in_flight"],
+        }
+
+    @staticmethod
+    def attendee(i):
+        return {
+            "first_name": "Bench",
+            "last_name": "Attendee",
+            "email": f"bench{i}@example.com",
+            "phone": "08012345678",
+            "department": "Computer Science",
+            "level_of_study": 200,
+            "hall_off_residence": "Mellanby",
+            "level": "beginner",
+        }
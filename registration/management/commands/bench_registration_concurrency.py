@@ -0,0 +1,192 @@
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from core.sqlite_backend import lock_wait
+from payments.emulator import run_paystack_emulator
+from payments.models import EventPayment
+from payments.views import PaystackWebhookView
+from registration.models import Attendee, Capacity, Hold
+from registration.views import RegistrationView
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent registrations and Paystack webhooks against a throwaway "
+        "file-based copy of the database and a Paystack emulator"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--registrations", type=int, default=300)
+        parser.add_argument(
+            "--capacity",
+            type=int,
+            default=None,
+            help="Limit the venue to this many places and check none is oversold",
+        )
+        parser.add_argument(
+            "--paystack-latency", default="0", help="Paystack emulator latency, e.g. lognormal:0.3:0.6"
+        )
+        parser.add_argument("--paystack-error-rate", type=float, default=0.0)
+        parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Webhooks sent twice")
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        total = options["registrations"]
+
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(
+                directory, "bench.sqlite3"
+            )
+            old_name = connection.creation.create_test_db(verbosity=0, serialize=False)
+            try:
+                with override_settings(
+                    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend"
+                ), run_paystack_emulator(
+                    deliver=self.deliver_webhook,
+                    latency=options["paystack_latency"],
+                    error_rate=options["paystack_error_rate"],
+                    duplicate_rate=options["duplicate_rate"],
+                    seed=0,
+                ) as paystack, mock.patch.object(
+                    # Every request comes from one client; measure the database, not the throttles.
+                    RegistrationView, "throttle_classes", []
+                ):
+                    self.paystack = paystack
+                    if options["capacity"] is not None:
+                        Capacity.objects.create(name="venue", limit=options["capacity"])
+                    self.run_phase("register", threads, self.register, range(total))
+                    if options["capacity"] is not None:
+                        self.check_capacity()
+                    references = list(
+                        EventPayment.objects.filter(status="initialized").values_list(
+                            "reference", flat=True
+                        )
+                    )
+                    self.run_phase("webhook", threads, self.webhook, references)
+                    self.stdout.write(json.dumps({"paystack": paystack.stats}, indent=2))
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_phase(self, name, threads, func, items):
+        lock_wait.histogram.reset()
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(item):
+            start = time.perf_counter()
+            try:
+                status_code = func(item)
+                error = None if status_code < 400 else f"HTTP {status_code}"
+            except Exception as e:
+                error = type(e).__name__ + ": " + str(e)
+            finally:
+                connections.close_all()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if error:
+                    errors.append(error)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(worker, items))
+        wall = time.perf_counter() - start
+
+        lock_stats = lock_wait.histogram.snapshot()
+        self.stdout.write(
+            json.dumps(
+                {
+                    "phase": name,
+                    "engine": settings.DATABASES["default"]["ENGINE"],
+                    "threads": threads,
+                    "requests": len(latencies),
+                    "errors": len(errors),
+                    "error_samples": sorted(set(errors))[:5],
+                    "throughput_rps": round(len(latencies) / wall, 1),
+                    "latency_ms": {
+                        "mean": round(statistics.mean(latencies) * 1000, 2),
+                        "p50": round(percentile(latencies, 0.5) * 1000, 2),
+                        "p95": round(percentile(latencies, 0.95) * 1000, 2),
+                        "p99": round(percentile(latencies, 0.99) * 1000, 2),
+                    },
+                    "lock_wait": {
+                        key: lock_stats[key] for key in ("count", "sum", "p50", "p95", "p99")
+                    },
+                },
+                indent=2,
+            )
+        )
+
+    def check_capacity(self):
+        venue = Capacity.objects.get(name="venue")
+        holds = Hold.objects.filter(capacity=venue, status=Hold.HELD).count()
+        self.stdout.write(
+            json.dumps(
+                {
+                    "capacity": venue.limit,
+                    "held": venue.held,
+                    "hold_rows": holds,
+                    "attendees": Attendee.objects.count(),
+                    "oversold": venue.held > venue.limit or holds != venue.held,
+                },
+                indent=2,
+            )
+        )
+
+    def register(self, i):
+        factory = RequestFactory()
+        request = factory.post(
+            "/dawrah/api/event/register/",
+            {
+                "first_name": "Bench",
+                "last_name": "Attendee",
+                "email": f"bench{i}@example.com",
+                "phone": "08012345678",
+                "department": "Computer Science",
+                "level_of_study": 200,
+                "hall_off_residence": "Mellanby",
+                "level": "beginner",
+            },
+            content_type="application/json",
+        )
+        return self.dispatch(RegistrationView.as_view(), request)
+
+    def webhook(self, reference):
+        # The customer pays; the emulator delivers the signed webhook, maybe twice.
+        return max(code or 599 for code in self.paystack.pay(reference))
+
+    def deliver_webhook(self, body, headers):
+        factory = RequestFactory()
+        request = factory.post(
+            "/dawrah/api/payments/webhook/paystack/",
+            body,
+            content_type="application/json",
+            HTTP_X_PAYSTACK_SIGNATURE=headers["X-Paystack-Signature"],
+        )
+        return self.dispatch(PaystackWebhookView.as_view(), request)
+
+    def dispatch(self, view, request):
+        # Run the view through the lock-wait middleware so each request is observed.
+        middleware = lock_wait.LockWaitMiddleware(view)
+        return middleware(request).status_code
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from registration.capacity import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Release the capacity held by registrations that were not paid in time"
+
+    def handle(self, *args, **options):
+        count = release_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f"{count} holds released!"))
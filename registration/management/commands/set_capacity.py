@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from registration.models import Attendee, Capacity
+
+
+class Command(BaseCommand):
+    help = "Create or resize a registration capacity, e.g. the venue seats or a level's places"
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", help="Capacity name, e.g. venue or meal tickets")
+        parser.add_argument("limit", type=int, help="Number of places")
+        parser.add_argument(
+            "--level",
+            default="",
+            choices=[level for level, _ in Attendee.LEVEL_CHOICES],
+            help="Only attendees of this level take a place. All attendees do by default.",
+        )
+
+    def handle(self, *args, **options):
+        if options["limit"] < 0:
+            raise CommandError("The limit cannot be negative")
+        capacity, created = Capacity.objects.update_or_create(
+            name=options["name"],
+            defaults={"limit": options["limit"], "level": options["level"]},
+        )
+        action = "created" if created else "updated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{capacity.name} {action}: {capacity.limit} places, "
+                f"{capacity.held} held, {capacity.confirmed} confirmed"
+            )
+        )
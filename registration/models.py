@@ -28,5 +28,63 @@ class Attendee(models.Model):
         ordering = ["dawrah_id"]
 
 
+class Capacity(models.Model):
+    """
+    A finite pool of places, such as venue seats or meal tickets.
+
+    A capacity with a blank level applies to every attendee; one with a level only to
+    attendees of that level. held and confirmed are counters kept by
+    registration.capacity with conditional UPDATEs, so checking availability never
+    counts Hold rows.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    level = models.CharField(max_length=100, choices=Attendee.LEVEL_CHOICES, blank=True)
+    limit = models.PositiveIntegerField()
+    held = models.PositiveIntegerField(default=0)
+    confirmed = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def remaining(self):
+        return max(0, self.limit - self.held - self.confirmed)
+
+    class Meta:
+        verbose_name_plural = "capacities"
+
+
+class Hold(models.Model):
+    """
+    An attendee's place in a Capacity: held from registration until it expires or the
+    payment fails, then either confirmed by a successful payment or released.
+    """
+
+    HELD = "held"
+    CONFIRMED = "confirmed"
+    RELEASED = "released"
+    STATUS_CHOICES = (
+        (HELD, "Held"),
+        (CONFIRMED, "Confirmed"),
+        (RELEASED, "Released"),
+    )
+
+    attendee = models.ForeignKey(Attendee, on_delete=models.CASCADE, related_name="holds")
+    capacity = models.ForeignKey(Capacity, on_delete=models.CASCADE, related_name="holds")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.attendee_id} - {self.capacity} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["attendee", "capacity"], name="unique_hold_per_capacity"),
+        ]
+        indexes = [models.Index(fields=["status", "expires_at"])]
+
+
 # class Volunteer(models.Model):
 #     pass
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 from django.core import validators
 
-from .models import Attendee
+from .models import Attendee, Capacity
 
 
 class AttendeeSerializer(serializers.ModelSerializer):
@@ -134,3 +134,15 @@ class ExistingEmailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attendee
         fields = ("email",)
+
+
+class CapacitySerializer(serializers.ModelSerializer):
+    """
+    Serializer for Capacity model, exposing the places left rather than the counters.
+    """
+
+    remaining = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Capacity
+        fields = ("name", "level", "limit", "remaining")
@@ -1,3 +1,253 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .capacity import CapacityFull, confirm_places, hold_places, release_expired_holds, release_places
+from .models import Attendee, Capacity, Hold
+from .serializers import AttendeeSerializer
+
+
+def make_attendee(i, level="beginner"):
+    return Attendee.objects.create(
+        first_name="Aisha",
+        last_name="Bello",
+        email=f"attendee{i}@example.com",
+        phone="08012345678",
+        department="Computer Science",
+        level_of_study=200,
+        hall_off_residence="Mellanby",
+        level=level,
+    )
+
+
+class CapacityTests(TestCase):
+    def setUp(self):
+        self.venue = Capacity.objects.create(name="venue", limit=2)
+        self.advanced = Capacity.objects.create(name="advanced class", level="advanced", limit=1)
+
+    def assertCounters(self, capacity, held, confirmed):
+        capacity.refresh_from_db()
+        self.assertEqual((capacity.held, capacity.confirmed), (held, confirmed))
+
+    def test_hold_takes_a_place_in_the_capacities_that_apply(self):
+        hold_places(make_attendee(1))
+        hold_places(make_attendee(2, level="advanced"))
+        self.assertCounters(self.venue, 2, 0)
+        self.assertCounters(self.advanced, 1, 0)
+
+    def test_full_capacity_takes_no_place(self):
+        hold_places(make_attendee(1, level="advanced"))
+        with self.assertRaises(CapacityFull) as raised:
+            hold_places(make_attendee(2, level="advanced"))
+        self.assertEqual(raised.exception.capacity, self.advanced)
+        # The venue place taken before the advanced class was found full is given back.
+        self.assertCounters(self.venue, 1, 0)
+        self.assertEqual(Hold.objects.count(), 2)
+
+    def test_holding_again_renews_instead_of_taking_another_place(self):
+        attendee = make_attendee(1)
+        hold_places(attendee)
+        hold_places(attendee, now=timezone.now() + timedelta(minutes=20))
+        self.assertCounters(self.venue, 1, 0)
+        self.assertEqual(release_expired_holds(now=timezone.now() + timedelta(minutes=35)), 0)
+
+    def test_concurrent_first_holds_renew_instead_of_failing(self):
+        attendee = make_attendee(1)
+        # The concurrent hold_places() that created the hold first.
+        hold_places(attendee)
+        filter_holds = Hold.objects.filter
+        reads = []
+
+        def missed_first_read(*args, **kwargs):
+            reads.append(kwargs)
+            return Hold.objects.none() if len(reads) == 1 else filter_holds(*args, **kwargs)
+
+        with mock.patch.object(Hold.objects, "filter", side_effect=missed_first_read):
+            hold_places(attendee)
+        self.assertCounters(self.venue, 1, 0)
+        self.assertEqual(Hold.objects.filter(attendee=attendee).count(), 1)
+
+    def test_confirm_and_release(self):
+        paid, failed = make_attendee(1), make_attendee(2)
+        hold_places(paid)
+        hold_places(failed)
+        confirm_places(paid)
+        release_places(failed)
+        self.assertCounters(self.venue, 0, 1)
+        self.assertEqual(Hold.objects.get(attendee=failed).status, Hold.RELEASED)
+
+        # Retrying the failed payment holds the place again.
+        hold_places(failed)
+        self.assertCounters(self.venue, 1, 1)
+
+    def test_expired_holds_are_released(self):
+        hold_places(make_attendee(1))
+        hold_places(make_attendee(2))
+        later = timezone.now() + timedelta(minutes=31)
+        self.assertEqual(release_expired_holds(now=later), 2)
+        self.assertCounters(self.venue, 0, 0)
+
+    @override_settings(REGISTRATION_HOLD_MINUTES=5)
+    def test_hold_length_is_read_from_settings_when_holding(self):
+        now = timezone.now()
+        hold_places(make_attendee(1), now=now)
+        self.assertEqual(Hold.objects.get().expires_at, now + timedelta(minutes=5))
+
+    def test_full_capacity_sweeps_expired_holds(self):
+        hold_places(make_attendee(1))
+        hold_places(make_attendee(2))
+        hold_places(make_attendee(3), now=timezone.now() + timedelta(minutes=31))
+        self.assertCounters(self.venue, 1, 0)
+        self.assertEqual(Hold.objects.filter(status=Hold.RELEASED).count(), 2)
+
+    def test_late_payment_confirms_a_released_hold(self):
+        attendee = make_attendee(1)
+        hold_places(attendee)
+        release_expired_holds(now=timezone.now() + timedelta(minutes=31))
+        confirm_places(attendee)
+        self.assertCounters(self.venue, 0, 1)
+
+    @mock.patch("registration.views.init_payment", return_value="https://checkout.paystack.com/x")
+    def test_registration_is_refused_when_full(self, init_payment):
+        self.venue.limit = 0
+        self.venue.save()
+        response = self.client.post(
+            reverse("register"),
+            {
+                "first_name": "Aisha",
+                "last_name": "Bello",
+                "email": "aisha@example.com",
+                "phone": "08012345678",
+                "department": "Computer Science",
+                "level_of_study": 200,
+                "hall_off_residence": "Mellanby",
+                "level": "beginner",
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Attendee.objects.exists())
+        init_payment.assert_not_called()
+
+    def test_paystack_is_called_outside_the_registration_transaction(self):
+        # TestCase runs each test in transactions of its own; the view must add none.
+        depth = len(connection.atomic_blocks)
+        depths = []
+
+        def init_payment(*args, **kwargs):
+            depths.append(len(connection.atomic_blocks))
+            return "https://checkout.paystack.com/x"
+
+        with mock.patch("registration.views.init_payment", side_effect=init_payment):
+            response = self.client.post(
+                reverse("register"),
+                {
+                    "first_name": "Aisha",
+                    "last_name": "Bello",
+                    "email": "aisha@example.com",
+                    "phone": "08012345678",
+                    "department": "Computer Science",
+                    "level_of_study": 200,
+                    "hall_off_residence": "Mellanby",
+                    "level": "beginner",
+                },
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(depths, [depth])
+        self.assertCounters(self.venue, 1, 0)
+
+    def test_validation_runs_outside_the_registration_transaction(self):
+        depth = len(connection.atomic_blocks)
+        depths = []
+        is_valid = AttendeeSerializer.is_valid
+
+        def record_depth(serializer, *args, **kwargs):
+            depths.append(len(connection.atomic_blocks))
+            return is_valid(serializer, *args, **kwargs)
+
+        with mock.patch.object(AttendeeSerializer, "is_valid", record_depth), mock.patch(
+            "registration.views.init_payment", return_value="https://checkout.paystack.com/x"
+        ), mock.patch(
+            "registration.views.ainit_payment", return_value="https://checkout.paystack.com/y"
+        ):
+            for i, route in enumerate(["register", "register-async"]):
+                response = self.client.post(
+                    reverse(route),
+                    {
+                        "first_name": "Aisha",
+                        "last_name": "Bello",
+                        "email": f"aisha{i}@example.com",
+                        "phone": "08012345678",
+                        "department": "Computer Science",
+                        "level_of_study": 200,
+                        "hall_off_residence": "Mellanby",
+                        "level": "beginner",
+                    },
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 201)
+        self.assertEqual(depths, [depth, depth])
+        self.assertCounters(self.venue, 2, 0)
+
+    def test_capacity_view_reports_places_left(self):
+        hold_places(make_attendee(1))
+        response = self.client.get(reverse("capacity"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["data"],
+            [
+                {"name": "advanced class", "level": "advanced", "limit": 1, "remaining": 1},
+                {"name": "venue", "level": "", "limit": 2, "remaining": 1},
+            ],
+        )
+
+
+class CapacityConcurrencyTests(TransactionTestCase):
+    def test_concurrent_holds_never_oversell(self):
+        limit, attendees = 10, 40
+        venue = Capacity.objects.create(name="venue", limit=limit)
+        beginners = Capacity.objects.create(name="beginner class", level="beginner", limit=limit + 5)
+        people = [make_attendee(i) for i in range(attendees)]
+        results = []
+        barrier = threading.Barrier(attendees)
+
+        def register(attendee):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        hold_places(attendee)
+                        results.append(True)
+                        return
+                    except CapacityFull:
+                        results.append(False)
+                        return
+                    except OperationalError:
+                        # SQLite's shared in-memory test database reports lock
+                        # contention instead of waiting; the attempt was rolled back.
+                        time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=register, args=(person,)) for person in people]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), limit)
+        self.assertEqual(len(results), attendees)
+        venue.refresh_from_db()
+        beginners.refresh_from_db()
+        self.assertEqual(venue.held, limit)
+        self.assertEqual(Hold.objects.filter(capacity=venue, status=Hold.HELD).count(), limit)
+        # Beginner places taken by registrations that then found the venue full were given back.
+        self.assertEqual(beginners.held, limit)
+        self.assertEqual(Hold.objects.filter(capacity=beginners, status=Hold.HELD).count(), limit)
@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path("register/", views.RegistrationView.as_view(), name="register"),
+    path("register/async/", views.AsyncRegistrationView.as_view(), name="register-async"),
+    path("register/capacity/", views.CapacityView.as_view(), name="capacity"),
 ]
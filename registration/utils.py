@@ -1,22 +1,51 @@
 import threading
+from email.mime.image import MIMEImage
 
 from django.db.models.signals import pre_save, post_save
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, send_mail
 from django.conf import settings
+from django.utils.module_loading import import_string
 
 from datetime import datetime
+from functools import partial
+
+from core.timing import timed
 
 from .models import Attendee
 
 class EmailThread(threading.Thread):
-    def __init__(self, subject: str, message: str, html_message: str, recipients: list):
+    def __init__(self, subject: str, message: str, html_message: str, recipients: list, images: dict = None):
         self.subject = subject
         self.message = message
         self.html_message = html_message
         self.recipients = recipients
+        # Content-ID -> PNG bytes, or a callable rendering them in this thread; referenced as cid: in the HTML
+        self.images = images or {}
         threading.Thread.__init__(self)
 
     def run(self):
+        with timed("smtp"):
+            self.send()
+
+    def send(self):
+        if self.images:
+            email = EmailMultiAlternatives(
+                subject=self.subject,
+                body=self.message,
+                from_email=f"MSSNUI DAWRAH",
+                to=self.recipients,
+            )
+            email.attach_alternative(self.html_message, "text/html")
+            email.mixed_subtype = "related"
+            for content_id, png in self.images.items():
+                if callable(png):
+                    png = png()
+                image = MIMEImage(png, "png")
+                image.add_header("Content-ID", f"<{content_id}>")
+                image.add_header("Content-Disposition", "inline", filename=f"{content_id}.png")
+                email.attach(image)
+            email.send(fail_silently=False)
+            return
         send_mail(
             subject=self.subject,
             message=self.message,
@@ -35,9 +64,20 @@ def get_last_id():
     return last_attendee.dawrah_id if last_attendee else None
 
 
-def send_confirmation_email(instance, **kwargs):
+def get_ticket_renderer():
+    """
+    Returns settings.TICKET_RENDERER, the callable taking a Dawrah ID and an image format
+    and returning the attendee's QR ticket.
+    """
+    return import_string(settings.TICKET_RENDERER)
+
+
+def send_confirmation_email(instance, render_ticket=None, **kwargs):
     """
     Sends a confirmation email to the attendee after they have registered.
+
+    The QR ticket is rendered by the email thread with render_ticket, by default
+    get_ticket_renderer(), so neither the caller nor its transaction waits for it.
     """
     if instance.dawrah_id is not None:
         subject="Dawrah Registration Confirmation"
@@ -49,13 +89,16 @@ def send_confirmation_email(instance, **kwargs):
                 <p>Assalamu 'alaykum wa rahmatullahi wa barakatuhu, <strong>{instance.first_name} {instance.last_name}</strong>.</p>
                 <p>Thank you for registering for the Dawrah program.</p>
                 <p>Your Dawrah ID is <strong>{instance.dawrah_id}</strong>.</p>
-                <p>Kindly keep this ID safe as you will need it to access the program.</p>
+                <p>Kindly keep this ID safe as you will need it to access the program. You can also show the QR ticket below at the check-in desk.</p>
+                <p><img src="cid:dawrah-ticket" alt="Dawrah ticket {instance.dawrah_id}" width="200" height="200"></p>
                 <p>Kindly join the WhatsApp group for the Dawrah here: <a href="https://chat.whatsapp.com/DrePaR6GU6BIUZTMz1poHn?mode=ac_t">Join WhatsApp Group</a></p>
                 <p>We look forward to seeing you at the Dawrah, inshaAllah.</p>
             </body>
         </html>
         """
-        EmailThread(subject, message, html_message, recipients).start()
+        render_ticket = render_ticket or get_ticket_renderer()
+        images = {"dawrah-ticket": partial(render_ticket, instance.dawrah_id, "png")}
+        EmailThread(subject, message, html_message, recipients, images=images).start()
         
         # send_mail(
         #     subject="Dawrah Registration Confirmation",
@@ -1,22 +1,96 @@
+from asgiref.sync import sync_to_async
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
-from django.core.cache import cache
 from django.db import transaction
 
 from drf_spectacular.utils import extend_schema
 
-from payments.utils import init_payment
+from core.async_views import AsyncAPIView
+from core.throttling import EmailTokenBucketThrottle, IPTokenBucketThrottle
+from payments.utils import PaymentDeferred, ainit_payment, init_payment
 
-from .serializers import AttendeeSerializer
-from .models import Attendee
+from .capacity import CapacityFull, hold_places
+from .serializers import AttendeeSerializer, CapacitySerializer
+from .models import Attendee, Capacity
+
+
+REGISTRATION_AMOUNT = 2100 * 100
+REREGISTRATION_AMOUNT = 2030 * 100
+
+
+def capacity_full_response(exc):
+    return Response({
+        "success": False,
+        "message": f"Sorry, there are no places left in {exc.capacity.name}.",
+    }, status=status.HTTP_409_CONFLICT)
+
+
+def already_registered_response(attendee):
+    return Response({
+        "success": False,
+        "message": "You have already registered for this event.",
+        "paid": attendee.paid,
+        "data": {"email": attendee.email}
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def unpaid_response(attendee, payment_url, deferred=False):
+    if deferred:
+        message = "You have already registered but not paid yet. Your payment link will be emailed to you shortly."
+    else:
+        message = "You have already registered but not paid yet. Please proceed to make your payment."
+    return Response({
+        "success": False,
+        "message": message,
+        "paid": attendee.paid,
+        "payment_url": payment_url,
+        "data": {
+            "email": attendee.email,
+        }
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+def registered_response(data, payment_url, deferred=False, headers=None):
+    if deferred:
+        # Paystack is down: keep the registration and email the link once it recovers.
+        return Response({
+            "success": True,
+            "message": "Registration successful. Your payment link will be emailed to you shortly.",
+            "payment_url": None,
+            "data": data,
+        }, status=status.HTTP_202_ACCEPTED, headers=headers)
+    return Response({
+        "success": True,
+        "message": "Registration successful. Please proceed to make your payment.",
+        "payment_url": payment_url,
+        "data": data,
+    }, status=status.HTTP_201_CREATED, headers=headers)
+
+
+def payment_failed_response():
+    return Response({
+        "success": False,
+        "message": "Failed to initialize payment. Please try again later."
+    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class RegistrationView(generics.CreateAPIView):
+    """
+    Registers an attendee and hands out their Paystack payment link.
+
+    Only saving the attendee and holding their places run in a transaction, which the
+    production SQLite profile opens with BEGIN IMMEDIATE: validation and the Paystack
+    call come before and after it, so neither holds the database's write lock.
+    """
+
     serializer_class = AttendeeSerializer
     queryset = Attendee.objects.all()
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = "registration"
+    admission_class = "registration"
+    query_budget = 9
 
     @extend_schema(tags=["Registration"])
-    @transaction.atomic()
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -25,39 +99,128 @@ class RegistrationView(generics.CreateAPIView):
 
         if attendee:
             if attendee.dawrah_id:
-                return Response({
-                    "success": False,
-                    "message": "You have already registered for this event.",
-                    "paid": attendee.paid,
-                    "data": {"email": attendee.email}
-                }, status=status.HTTP_400_BAD_REQUEST)
+                return already_registered_response(attendee)
 
             if not attendee.paid:
-                payment_url = init_payment(attendee.email, 2030 * 100)
-                return Response({
-                    "success": False,
-                    "message": "You have already registered but not paid yet. Please proceed to make your payment.",
-                    "paid": attendee.paid,
-                    "payment_url": payment_url,
-                    "data": {
-                        "email": attendee.email,
-                    }
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-        self.perform_create(serializer)
+                try:
+                    # hold_places() takes the places in a transaction of its own.
+                    hold_places(attendee)
+                except CapacityFull as exc:
+                    return capacity_full_response(exc)
+                try:
+                    payment_url = init_payment(attendee.email, REREGISTRATION_AMOUNT, defer=True)
+                except PaymentDeferred:
+                    return unpaid_response(attendee, None, deferred=True)
+                return unpaid_response(attendee, payment_url)
+
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer)
+                hold_places(serializer.instance)
+        except CapacityFull as exc:
+            # The attendee is rolled back along with the holds.
+            return capacity_full_response(exc)
         headers = self.get_success_headers(serializer.data)
 
         try:
-            payment_url = init_payment(serializer.validated_data["email"], 2100 * 100)
+            payment_url = init_payment(serializer.validated_data["email"], REGISTRATION_AMOUNT, defer=True)
+        except PaymentDeferred:
+            return registered_response(serializer.data, None, deferred=True, headers=headers)
         except Exception:
-            return Response({
-                "success": False,
-                "message": "Failed to initialize payment. Please try again later."
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return payment_failed_response()
+
+        return registered_response(serializer.data, payment_url, headers=headers)
+
+
+class AsyncRegistrationView(AsyncAPIView):
+    """
+    RegistrationView for ASGI workers, with the same responses. The attendee is
+    validated first, then saved and their places held in one short transaction, and
+    Paystack is called once it has committed, without a transaction: a slow Paystack
+    holds neither a thread of a bounded pool nor the database's write lock. When the
+    payment then fails, the registration stays and registering again hands out a
+    payment link.
+    """
 
+    throttle_classes = [IPTokenBucketThrottle, EmailTokenBucketThrottle]
+    throttle_scope = "registration"
+    admission_class = "async_registration"
+    query_budget = 9
+
+    async def post(self, request, *args, **kwargs):
+        result = await sync_to_async(self.register)(request.data)
+        if isinstance(result, Response):
+            return result
+        attendee, data = result
+
+        if data is None:
+            try:
+                payment_url = await ainit_payment(attendee.email, REREGISTRATION_AMOUNT, defer=True)
+            except PaymentDeferred:
+                return unpaid_response(attendee, None, deferred=True)
+            return unpaid_response(attendee, payment_url)
+
+        try:
+            payment_url = await ainit_payment(attendee.email, REGISTRATION_AMOUNT, defer=True)
+        except PaymentDeferred:
+            return registered_response(data, None, deferred=True)
+        except Exception:
+            return payment_failed_response()
+        return registered_response(data, payment_url)
+
+    def register(self, request_data):
+        """
+        Saves a new attendee, or finds the unpaid one, and holds their places. As in
+        RegistrationView, only saving and holding run in a transaction.
+
+        Returns:
+            tuple: The attendee and their serialized data, None if they had registered already.
+            Response: If they cannot register.
+        """
+        serializer = AttendeeSerializer(data=request_data)
+        serializer.is_valid(raise_exception=True)
+        attendee = Attendee.objects.filter(email=serializer.validated_data["email"]).first()
+
+        if attendee:
+            if attendee.dawrah_id:
+                return already_registered_response(attendee)
+
+            if not attendee.paid:
+                try:
+                    # hold_places() takes the places in a transaction of its own.
+                    hold_places(attendee)
+                except CapacityFull as exc:
+                    return capacity_full_response(exc)
+                return attendee, None
+
+        try:
+            with transaction.atomic():
+                attendee = serializer.save()
+                hold_places(attendee)
+        except CapacityFull as exc:
+            # The attendee is rolled back along with the holds.
+            return capacity_full_response(exc)
+        return attendee, serializer.data
+
+
+class CapacityView(generics.ListAPIView):
+    """
+    Lists the places left in every capacity, read from its counters.
+    """
+
+    serializer_class = CapacitySerializer
+    queryset = Capacity.objects.order_by("name")
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+    admission_class = "registration"
+    query_budget = 1
+
+    @extend_schema(tags=["Registration"])
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
         return Response({
             "success": True,
-            "message": "Registration successful. Please proceed to make your payment.",
-            "payment_url": payment_url,
+            "message": "Capacities retrieved successfully",
             "data": serializer.data,
-        }, status=status.HTTP_201_CREATED, headers=headers)
+        }, status=status.HTTP_200_OK)